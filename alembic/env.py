@@ -8,15 +8,19 @@ from sqlalchemy.ext.asyncio import async_engine_from_config
 from alembic import context
 
 
-from app.config import POSTGRES_URI
+from app.config import DATABASE_URL
+from app.database.dialect import is_sqlite_url
 from app.database.base import Base
-from app.database.models import Admin, CurrencyPair, Divergence, BotSettings
+from app.database.models import Admin, CurrencyPair, Divergence, DivergenceHourly, FsmState, BotSettings, Subscription
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
 
-config.set_main_option('sqlalchemy.url', POSTGRES_URI)
+config.set_main_option('sqlalchemy.url', DATABASE_URL)
+
+# SQLite не поддерживает большинство ALTER TABLE, изменения выполняются пересозданием таблицы
+RENDER_AS_BATCH = is_sqlite_url(DATABASE_URL)
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
@@ -53,6 +57,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        render_as_batch=RENDER_AS_BATCH,
     )
 
     with context.begin_transaction():
@@ -60,7 +65,7 @@ def run_migrations_offline() -> None:
 
 
 def do_run_migrations(connection: Connection) -> None:
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=RENDER_AS_BATCH)
 
     with context.begin_transaction():
         context.run_migrations()
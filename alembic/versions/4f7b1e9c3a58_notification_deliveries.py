@@ -0,0 +1,35 @@
+"""Notification deliveries
+
+Revision ID: 4f7b1e9c3a58
+Revises: 8b4e1f6a2c53
+Create Date: 2026-10-20 03:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f7b1e9c3a58'
+down_revision: Union[str, None] = '8b4e1f6a2c53'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('notification_deliveries',
+    sa.Column('divergence_id', sa.Integer(), nullable=False),
+    sa.Column('chat_id', sa.String(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('divergence_id', 'chat_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('notification_deliveries')
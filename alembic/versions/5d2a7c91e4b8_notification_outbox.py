@@ -0,0 +1,40 @@
+"""Notification outbox
+
+Revision ID: 5d2a7c91e4b8
+Revises: 3c38913eb14f
+Create Date: 2026-10-19 14:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2a7c91e4b8'
+down_revision: Union[str, None] = '3c38913eb14f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('divergences', sa.Column('notified_at', sa.DateTime(timezone=True), nullable=True))
+
+    # Индекс строится без блокировки записи в таблицу
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_divergences_pending',
+            'divergences',
+            ['id'],
+            postgresql_where=sa.text('notification_sent = false'),
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_divergences_pending', table_name='divergences', postgresql_concurrently=True)
+    op.drop_column('divergences', 'notified_at')
@@ -0,0 +1,55 @@
+"""Default partition for divergences
+
+Revision ID: 6a3d8c2f5e71
+Revises: c7d3e9a1b5f2
+Create Date: 2026-10-20 04:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a3d8c2f5e71'
+down_revision: Union[str, None] = 'c7d3e9a1b5f2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    # Строки без месячной секции (обслуживание секций отстало) попадают сюда,
+    # а не обрывают вставку дивергенций
+    op.execute('CREATE TABLE IF NOT EXISTS divergences_default PARTITION OF divergences DEFAULT')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    # Строки секции по умолчанию переносятся в месячные секции
+    op.execute('ALTER TABLE divergences DETACH PARTITION divergences_default')
+    op.execute("""
+        DO $$
+        DECLARE
+            month TIMESTAMP;
+        BEGIN
+            FOR month IN
+                SELECT DISTINCT date_trunc('month', detected_at AT TIME ZONE 'UTC') FROM divergences_default
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF divergences FOR VALUES FROM (%L) TO (%L)',
+                    'divergences_p' || to_char(month, 'YYYYMM'),
+                    month AT TIME ZONE 'UTC',
+                    (month + interval '1 month') AT TIME ZONE 'UTC'
+                );
+            END LOOP;
+        END $$
+    """)
+    op.execute('INSERT INTO divergences SELECT * FROM divergences_default')
+    op.execute('DROP TABLE divergences_default')
@@ -0,0 +1,40 @@
+"""Subscriptions
+
+Revision ID: 8b4e1f6a2c53
+Revises: 9e4c2a7b1d36
+Create Date: 2026-10-19 14:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b4e1f6a2c53'
+down_revision: Union[str, None] = '9e4c2a7b1d36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('subscriptions',
+    sa.Column('chat_id', sa.BigInteger(), nullable=False),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('symbols', sa.String(), nullable=True),
+    sa.Column('min_divergence', sa.Float(), nullable=True),
+    sa.Column('quiet_hours_start', sa.Integer(), nullable=True),
+    sa.Column('quiet_hours_end', sa.Integer(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('subscriptions')
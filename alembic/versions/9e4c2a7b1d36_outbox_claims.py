@@ -0,0 +1,30 @@
+"""Outbox claims
+
+Revision ID: 9e4c2a7b1d36
+Revises: 5d2a7c91e4b8
+Create Date: 2026-10-20 03:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e4c2a7b1d36'
+down_revision: Union[str, None] = '5d2a7c91e4b8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('divergences', sa.Column('claimed_until', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('divergences', sa.Column('claimed_by', sa.String(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('divergences', 'claimed_by')
+    op.drop_column('divergences', 'claimed_until')
@@ -0,0 +1,51 @@
+"""Hot query indexes
+
+Revision ID: a41c9e7d2f10
+Revises: 4f7b1e9c3a58
+Create Date: 2026-10-19 18:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41c9e7d2f10'
+down_revision: Union[str, None] = '4f7b1e9c3a58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Индексы строятся без блокировки записи в таблицы
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_divergences_pair_detected',
+            'divergences',
+            ['pair1_id', 'pair2_id', 'detected_at'],
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_divergences_detected_at',
+            'divergences',
+            ['detected_at', 'id'],
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_currency_pairs_active',
+            'currency_pairs',
+            ['id'],
+            postgresql_where=sa.text('is_active = true'),
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_currency_pairs_active', table_name='currency_pairs', postgresql_concurrently=True)
+        op.drop_index('ix_divergences_detected_at', table_name='divergences', postgresql_concurrently=True)
+        op.drop_index('ix_divergences_pair_detected', table_name='divergences', postgresql_concurrently=True)
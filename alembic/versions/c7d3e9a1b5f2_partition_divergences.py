@@ -0,0 +1,201 @@
+"""Partition divergences by month, hourly rollups
+
+Revision ID: c7d3e9a1b5f2
+Revises: a41c9e7d2f10
+Create Date: 2026-10-19 20:15:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d3e9a1b5f2'
+down_revision: Union[str, None] = 'a41c9e7d2f10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Секции создаются на столько месяцев вперед (дальше их создает PartitionManager)
+PARTITIONS_AHEAD = 2
+
+COLUMNS = (
+    'id, pair1_id, pair2_id, pair1_symbol, pair2_symbol, pair1_price, pair2_price, '
+    'divergence_percent, detected_at, notification_sent, notified_at, claimed_until, claimed_by, '
+    'created_at, updated_at'
+)
+
+
+def create_divergence_indexes() -> None:
+    op.create_index(
+        'ix_divergences_pending',
+        'divergences',
+        ['id'],
+        postgresql_where=sa.text('notification_sent = false')
+    )
+    op.create_index('ix_divergences_pair_detected', 'divergences', ['pair1_id', 'pair2_id', 'detected_at'])
+    op.create_index('ix_divergences_detected_at', 'divergences', ['detected_at', 'id'])
+
+
+def rename_old_table() -> None:
+    """Переименовывает текущую таблицу вместе с индексами, освобождая имена"""
+    op.execute('ALTER TABLE divergences RENAME TO divergences_old')
+    for index in ('ix_divergences_pending', 'ix_divergences_pair_detected', 'ix_divergences_detected_at'):
+        op.execute(f'ALTER INDEX IF EXISTS {index} RENAME TO {index}_old')
+    op.execute('ALTER TABLE divergences_old RENAME CONSTRAINT divergences_pkey TO divergences_old_pkey')
+    # Последовательность id переходит к новой таблице
+    op.execute('ALTER SEQUENCE divergences_id_seq OWNED BY NONE')
+
+
+def create_rollup_table() -> None:
+    op.create_table('divergence_hourly',
+    sa.Column('pair1_id', sa.Integer(), nullable=False),
+    sa.Column('pair2_id', sa.Integer(), nullable=False),
+    sa.Column('hour', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('pair1_symbol', sa.String(), nullable=False),
+    sa.Column('pair2_symbol', sa.String(), nullable=False),
+    sa.Column('divergences_count', sa.Integer(), nullable=False),
+    sa.Column('max_divergence', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('pair1_id', 'pair2_id', 'hour')
+    )
+    op.create_index('ix_divergence_hourly_hour', 'divergence_hourly', ['hour'])
+
+
+def fill_rollup_table(hour_expression: str) -> None:
+    """Сводка по уже накопленным дивергенциям"""
+    op.execute(f"""
+        INSERT INTO divergence_hourly
+            (pair1_id, pair2_id, hour, pair1_symbol, pair2_symbol, divergences_count, max_divergence)
+        SELECT pair1_id, pair2_id, {hour_expression},
+               min(pair1_symbol), min(pair2_symbol), count(*), max(abs(divergence_percent))
+        FROM divergences
+        WHERE pair1_id IS NOT NULL AND pair2_id IS NOT NULL
+        GROUP BY 1, 2, 3
+    """)
+
+
+def upgrade_sqlite() -> None:
+    """Без секционирования: только удаление описания и сводка"""
+    op.execute('UPDATE divergences SET detected_at = coalesce(created_at, CURRENT_TIMESTAMP) WHERE detected_at IS NULL')
+    with op.batch_alter_table('divergences') as batch_op:
+        batch_op.drop_column('description')
+        batch_op.alter_column('detected_at', existing_type=sa.DateTime(timezone=True), nullable=False)
+
+    create_rollup_table()
+    fill_rollup_table("strftime('%Y-%m-%d %H:00:00.000000', detected_at)")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        upgrade_sqlite()
+        return
+
+    rename_old_table()
+
+    # Первичный ключ секционированной таблицы обязан включать ключ секционирования
+    op.execute("""
+        CREATE TABLE divergences (
+            id INTEGER NOT NULL DEFAULT nextval('divergences_id_seq'),
+            pair1_id INTEGER REFERENCES currency_pairs (id),
+            pair2_id INTEGER REFERENCES currency_pairs (id),
+            pair1_symbol VARCHAR NOT NULL,
+            pair2_symbol VARCHAR NOT NULL,
+            pair1_price FLOAT NOT NULL,
+            pair2_price FLOAT NOT NULL,
+            divergence_percent FLOAT NOT NULL,
+            detected_at TIMESTAMP WITH TIME ZONE NOT NULL,
+            notification_sent BOOLEAN,
+            notified_at TIMESTAMP WITH TIME ZONE,
+            claimed_until TIMESTAMP WITH TIME ZONE,
+            claimed_by VARCHAR(32),
+            created_at TIMESTAMP WITH TIME ZONE,
+            updated_at TIMESTAMP WITH TIME ZONE,
+            PRIMARY KEY (id, detected_at)
+        ) PARTITION BY RANGE (detected_at)
+    """)
+
+    # Месячные секции (UTC) от первой записи до PARTITIONS_AHEAD месяцев вперед
+    op.execute(f"""
+        DO $$
+        DECLARE
+            current_month TIMESTAMP;
+            last_month TIMESTAMP;
+        BEGIN
+            SELECT date_trunc('month', coalesce(min(detected_at), min(created_at), now()) AT TIME ZONE 'UTC')
+            INTO current_month FROM divergences_old;
+            last_month := date_trunc('month', now() AT TIME ZONE 'UTC') + interval '{PARTITIONS_AHEAD} months';
+            WHILE current_month <= last_month LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF divergences FOR VALUES FROM (%L) TO (%L)',
+                    'divergences_p' || to_char(current_month, 'YYYYMM'),
+                    current_month AT TIME ZONE 'UTC',
+                    (current_month + interval '1 month') AT TIME ZONE 'UTC'
+                );
+                current_month := current_month + interval '1 month';
+            END LOOP;
+        END $$
+    """)
+
+    # Текст описания больше не хранится
+    op.execute(f"""
+        INSERT INTO divergences ({COLUMNS})
+        SELECT id, pair1_id, pair2_id, pair1_symbol, pair2_symbol, pair1_price, pair2_price,
+               divergence_percent, coalesce(detected_at, created_at, now()), notification_sent,
+               notified_at, claimed_until, claimed_by, created_at, updated_at
+        FROM divergences_old
+    """)
+    create_divergence_indexes()
+
+    op.drop_table('divergences_old')
+    op.execute('ALTER SEQUENCE divergences_id_seq OWNED BY divergences.id')
+
+    create_rollup_table()
+    fill_rollup_table("date_trunc('hour', detected_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_divergence_hourly_hour', table_name='divergence_hourly')
+    op.drop_table('divergence_hourly')
+
+    if op.get_bind().dialect.name != 'postgresql':
+        with op.batch_alter_table('divergences') as batch_op:
+            batch_op.add_column(sa.Column('description', sa.Text(), nullable=True))
+            batch_op.alter_column('detected_at', existing_type=sa.DateTime(timezone=True), nullable=True)
+        return
+
+    op.execute('ALTER TABLE divergences RENAME TO divergences_old')
+    for index in ('ix_divergences_pending', 'ix_divergences_pair_detected', 'ix_divergences_detected_at'):
+        op.execute(f'ALTER INDEX {index} RENAME TO {index}_old')
+    op.execute('ALTER TABLE divergences_old RENAME CONSTRAINT divergences_pkey TO divergences_old_pkey')
+    op.execute('ALTER SEQUENCE divergences_id_seq OWNED BY NONE')
+
+    op.execute("""
+        CREATE TABLE divergences (
+            pair1_id INTEGER REFERENCES currency_pairs (id),
+            pair2_id INTEGER REFERENCES currency_pairs (id),
+            pair1_symbol VARCHAR NOT NULL,
+            pair2_symbol VARCHAR NOT NULL,
+            pair1_price FLOAT NOT NULL,
+            pair2_price FLOAT NOT NULL,
+            divergence_percent FLOAT NOT NULL,
+            detected_at TIMESTAMP WITH TIME ZONE,
+            notification_sent BOOLEAN,
+            notified_at TIMESTAMP WITH TIME ZONE,
+            description TEXT,
+            id INTEGER NOT NULL DEFAULT nextval('divergences_id_seq'),
+            created_at TIMESTAMP WITH TIME ZONE,
+            updated_at TIMESTAMP WITH TIME ZONE,
+            claimed_until TIMESTAMP WITH TIME ZONE,
+            claimed_by VARCHAR(32),
+            PRIMARY KEY (id)
+        )
+    """)
+    op.execute(f'INSERT INTO divergences ({COLUMNS}) SELECT {COLUMNS} FROM divergences_old')
+    create_divergence_indexes()
+
+    # Удаляет и все секции
+    op.execute('DROP TABLE divergences_old')
+    op.execute('ALTER SEQUENCE divergences_id_seq OWNED BY divergences.id')
@@ -0,0 +1,41 @@
+"""Admins user_id bigint
+
+Revision ID: e2b8f4c6a9d1
+Revises: 6a3d8c2f5e71
+Create Date: 2026-10-19 23:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2b8f4c6a9d1'
+down_revision: Union[str, None] = '6a3d8c2f5e71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ID пользователей Telegram не помещаются в INTEGER
+    with op.batch_alter_table('admins') as batch_op:
+        batch_op.alter_column(
+            'user_id',
+            existing_type=sa.Integer(),
+            type_=sa.BigInteger(),
+            existing_nullable=False
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('admins') as batch_op:
+        batch_op.alter_column(
+            'user_id',
+            existing_type=sa.BigInteger(),
+            type_=sa.Integer(),
+            existing_nullable=False
+        )
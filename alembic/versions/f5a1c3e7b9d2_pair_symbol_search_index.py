@@ -0,0 +1,37 @@
+"""Pair symbol search index
+
+Revision ID: f5a1c3e7b9d2
+Revises: e2b8f4c6a9d1
+Create Date: 2026-10-20 00:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f5a1c3e7b9d2'
+down_revision: Union[str, None] = 'e2b8f4c6a9d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Уникальный индекс по symbol не подходит для LIKE 'BTC%' при локали, отличной от C
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_currency_pairs_symbol_pattern',
+            'currency_pairs',
+            ['symbol'],
+            postgresql_ops={'symbol': 'varchar_pattern_ops'},
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_currency_pairs_symbol_pattern', table_name='currency_pairs', postgresql_concurrently=True)
@@ -1,18 +1,41 @@
 import asyncio
 import logging
+from typing import Optional
 from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.base import BaseStorage
 from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 
-from app.config import BOT_TOKEN, CHECK_INTERVAL
-from app.database.engine import get_session
-from app.database.models import BotSettings
+from app.config import (
+    APP_ROLE,
+    BOT_TOKEN,
+    BOT_MODE,
+    WEBHOOK_BASE_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBHOOK_MAX_CONNECTIONS,
+    HTTP_SERVER_ENABLED,
+    MAX_CONCURRENT_UPDATES,
+    ADMINS_CHANNEL,
+    FSM_STORAGE,
+    FSM_CHANNEL
+)
+from app.database.engine import async_session, engine, get_session
+from app.detector import check_divergence_task, partition_maintenance_task, run_detector, warm_up
 from app.middlewares.admin_middleware import AdminMiddleware
-from app.services.binance_api import BinanceAPI
-from app.services.divergence import DivergenceAnalyzer
-from app.services.notifications import NotificationService
+from app.middlewares.concurrency import ConcurrencyLimitMiddleware
+from app.middlewares.session import AsyncSessionMiddleware
+from app.services.admin_cache import admin_cache
+from app.services.charts import chart_renderer
+from app.services.events import DivergenceEventListener
+from app.services.leader import LeaderElector
+from app.services.outbox import OutboxWorker
+from app.services.profiler import cycle_profiler
+from app.services.telegram_queue import TelegramSendQueue
+from app.utils.fsm_storage import SQLAlchemyStorage, parse_fsm_payload
+from app.utils.loop_monitor import loop_monitor
+from app.utils.startup import startup
+from app.web import create_web_app, start_web_app
 
 
 
@@ -24,11 +47,37 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Создадим экземпляр бота
-bot = Bot(token=BOT_TOKEN)
+# Экземпляр бота и очередь отправки создаются при первом обращении
+_bot: Optional[Bot] = None
+_send_queue: Optional[TelegramSendQueue] = None
+
+
+def create_fsm_storage() -> BaseStorage:
+    """Хранилище состояний диалогов: в БД (общее для реплик) или в памяти процесса"""
+    if FSM_STORAGE == 'memory':
+        return MemoryStorage()
+    return SQLAlchemyStorage(async_session)
+
 
 # Создадим диспетчер с хранилищем состояний
-dp = Dispatcher(storage=MemoryStorage())
+dp = Dispatcher(storage=create_fsm_storage())
+
+
+def get_bot() -> Bot:
+    """Возвращает экземпляр бота, создавая его при первом обращении"""
+    global _bot
+    if _bot is None:
+        _bot = Bot(token=BOT_TOKEN)
+    return _bot
+
+
+def get_send_queue() -> TelegramSendQueue:
+    """Возвращает общую очередь исходящих сообщений"""
+    global _send_queue
+    if _send_queue is None:
+        _send_queue = TelegramSendQueue(get_bot())
+    return _send_queue
+
 
 # Задаем команды бота
 async def set_bot_commands():
@@ -37,70 +86,30 @@ async def set_bot_commands():
         BotCommand(command='help', description='Помощь'),
         BotCommand(command='admin', description='Панель администратора')
     ]
-    await bot.set_my_commands(commands)
+    await get_bot().set_my_commands(commands)
 
 
-async def check_divergence_task():
-    """Фоновая задача для проверки дивергенций между валютными парами"""
-    logger.info('Запуск фоновой задачи проверки дивергенций')
+async def load_admins():
+    """Загружает администраторов в кэш"""
+    async for session in get_session():
+        await admin_cache.load(session)
 
-    while True:
-        try:
-            # Создаем новую сессию для каждой итерации
-            async for session in get_session():
-                # Получаем текущий интервал проверки из настроек
-                query = select(BotSettings).where(BotSettings.key == 'check_interval')
-                result = await session.execute(query)
-                setting = result.scalar_one_or_none()
-
-                interval = CHECK_INTERVAL
-                if setting and setting.value_int:
-                    interval = setting.value_int
-
-                # Проверяем статус бота
-                status_query = select(BotSettings).where(BotSettings.key == 'bot_active')
-                status_result = await session.execute(status_query)
-                status_setting = status_result.scalar_one_or_none()
-
-                is_active = True
-                if status_setting is not None and status_setting.value_bool is not None:
-                    is_active = status_setting.value_bool
-                
-                if not is_active:
-                    logger.info('Бот не активен, пропускаем проверку дивергенций')
-                    break
-
-                # Создаем сервисы
-                binance_api = BinanceAPI()
-                divergence_analyzer = DivergenceAnalyzer(session, binance_api)
-                notification_service = NotificationService(bot, session)
-
-                # Проверяем дивергенции
-                logger.info('Проверка дивергенций...')
-                divergences = await divergence_analyzer.check_all_pairs()
-                
-                if divergences:
-                    logger.info(f"Обнаружено {len(divergences)} дивергенций")
-                    # Отправляем уведомления
-                    for divergence in divergences:
-                        success = await notification_service.send_divergence_notification(divergence)
-                        if success:
-                            await divergence_analyzer.mark_as_notified(divergence.id)
-                else:
-                    logger.info('Дивергенций не обнаружено')
-            
-                logger.info(f"Следующая проверка через {interval} секунд")
-                break
-                
-        except Exception as e:
-            logger.error(f"Ошибка при проверке дивергенций: {str(e)}")
-
-        await asyncio.sleep(interval)
 
-# Функция для запуска бота
-async def main():
+async def on_webhook_startup(bot: Bot):
+    """Регистрирует webhook в Telegram при запуске HTTP-сервера"""
+    await bot.set_webhook(
+        url=f"{WEBHOOK_BASE_URL.rstrip('/')}{WEBHOOK_PATH}",
+        secret_token=WEBHOOK_SECRET or None,
+        max_connections=WEBHOOK_MAX_CONNECTIONS,
+        allowed_updates=dp.resolve_used_update_types()
+    )
+    logger.info(f"Webhook установлен: {WEBHOOK_BASE_URL}{WEBHOOK_PATH}")
+
+
+def setup_dispatcher():
+    """Регистрирует обработчики и middleware диспетчера"""
     from app.handlers import common
-    from app.handlers.admin import admin_panel, pairs, settings
+    from app.handlers.admin import admin_panel, history, pairs, settings, subscriptions
 
     # Регистрация общие обработчики
     dp.include_router(common.router)
@@ -122,25 +131,108 @@ async def main():
     settings_router.callback_query.middleware(AdminMiddleware())
     dp.include_router(settings_router)
 
+    subscriptions_router = subscriptions.router
+    subscriptions_router.message.middleware(AdminMiddleware())
+    dp.include_router(subscriptions_router)
+
+    history_router = history.router
+    history_router.message.middleware(AdminMiddleware())
+    history_router.callback_query.middleware(AdminMiddleware())
+    dp.include_router(history_router)
+
+    # Ограничиваем количество одновременно обрабатываемых обновлений
+    dp.update.outer_middleware(ConcurrencyLimitMiddleware(MAX_CONCURRENT_UPDATES))
+
     # Регистрируем middleware для сессии БД для всех обработчиков
-    dp.update.middleware(AsyncSessionMiddleware(get_session))
+    # (соединение берется из пула только при первом обращении к сессии)
+    dp.update.middleware(AsyncSessionMiddleware(async_session))
 
-    # Устанавливаем комманды бота
-    await set_bot_commands()
 
-    # Запускаем фоновую задачу проверки дивергенций
-    asyncio.create_task(check_divergence_task())
+# Функция для запуска бота
+async def main(role: str = APP_ROLE):
+    """
+    Запускает приложение в одной из ролей:
+    all - бот и детектор в одном процессе,
+    detector - только анализ дивергенций,
+    bot - только Telegram-бот и отправка уведомлений от детектора
+    """
+    if role == 'detector':
+        await run_detector()
+        return
+
+    bot = get_bot()
+    with startup.phase('dispatcher'):
+        setup_dispatcher()
+
+    # Уведомления отправляет обработчик outbox, его будят новые дивергенции
+    outbox = OutboxWorker(bot, get_send_queue())
+    outbox.start()
+    loop_monitor.start()
+
+    # Изменения администраторов на других репликах сбрасывают кэш прав
+    admins_listener = DivergenceEventListener(engine, admin_cache.on_notify, channel=ADMINS_CHANNEL)
+    admins_listener.start()
+
+    # Диалоги, измененные на других репликах, сбрасываются из локального кэша
+    if isinstance(dp.storage, SQLAlchemyStorage):
+        fsm_listener = DivergenceEventListener(
+            engine, dp.storage.on_notify, channel=FSM_CHANNEL, parse_payload=parse_fsm_payload
+        )
+        fsm_listener.start()
+
+    elector = None
+    listener = None
+    if role == 'bot':
+        # О новых дивергенциях сообщает процесс детектора через NOTIFY
+        listener = DivergenceEventListener(engine, outbox.wake_async)
+        listener.start()
+    else:
+        # Запускаем выбор лидера и фоновую задачу проверки дивергенций
+        # (отчеты профилировщика уходят через общую очередь отправки)
+        cycle_profiler.attach_send_queue(get_send_queue())
+        elector = LeaderElector(engine)
+        elector.start()
+        asyncio.create_task(check_divergence_task(elector, on_divergences=outbox.wake_async))
+        asyncio.create_task(partition_maintenance_task(elector))
+
+    # Устанавливаем комманды бота параллельно с прогревом кэшей
+    await warm_up(
+        startup.run_phase('bot_commands', set_bot_commands()),
+        startup.run_phase('admins', load_admins())
+    )
+    if isinstance(dp.storage, SQLAlchemyStorage):
+        dp.storage.start_cleanup()
+
+    health_info = lambda: {
+        'role': role,
+        'mode': BOT_MODE,
+        'ready': startup.ready.is_set(),
+        'is_leader': elector.is_leader if elector else False
+    }
+
+    if BOT_MODE == 'webhook':
+        # Обновления приходят через встроенный aiohttp-сервер
+        dp.startup.register(on_webhook_startup)
+        app = create_web_app(dp, bot, webhook=True, health_info=health_info)
+        runner = await start_web_app(app)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            loop_monitor.stop()
+            await runner.cleanup()
+            chart_renderer.shutdown()
+        return
+
+    runner = None
+    if HTTP_SERVER_ENABLED:
+        app = create_web_app(dp, bot, webhook=False, health_info=health_info)
+        runner = await start_web_app(app)
 
     # Запуск бота
-    await dp.start_polling(bot)
-
-
-# Middleware для внедрения сессии БД
-class AsyncSessionMiddleware:
-    def __init__(self, session_pool):
-        self.session_pool = session_pool
-    
-    async def __call__(self, handler, event, data):
-        async for session in self.session_pool():
-            data['session'] = session
-            return await handler(event, data)
\ No newline at end of file
+    try:
+        await dp.start_polling(bot)
+    finally:
+        loop_monitor.stop()
+        if runner is not None:
+            await runner.cleanup()
+        chart_renderer.shutdown()
@@ -20,6 +20,21 @@ DB_NAME = os.getenv('DB_NAME')
 # Строка подключения к PostgreSQL
 POSTGRES_URI = f"postgresql+asyncpg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# Полный URL БД, переопределяет POSTGRES_URI. Для локального запуска, тестов и
+# бенчмарков подходит SQLite: sqlite+aiosqlite:///bot.db или sqlite+aiosqlite:// (в памяти)
+DATABASE_URL = os.getenv('DATABASE_URL') or POSTGRES_URI
+
+# Параметры подключения к БД
+DB_ECHO = os.getenv('DB_ECHO', 'false').lower() in ('1', 'true', 'yes')                      # логировать все запросы
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '10'))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '30'))                                  # ожидание соединения, с
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '1800'))                                  # пересоздание соединений, с
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+DB_STATEMENT_CACHE_SIZE = int(os.getenv('DB_STATEMENT_CACHE_SIZE', '100'))                   # 0 для pgbouncer
+DB_SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', '500'))                                # порог медленного запроса
+DB_REPEATED_QUERY_THRESHOLD = int(os.getenv('DB_REPEATED_QUERY_THRESHOLD', '10'))             # повторов запроса до N+1
+
 # API ключи Binance
 BINANCE_API_KEY = os.getenv("BINANCE_API_KEY")
 BINANCE_API_SECRET = os.getenv("BINANCE_API_SECRET")
@@ -31,4 +46,116 @@ SUPERADMIN_IDS = list(map(int, os.getenv('SUPERADMIN_IDS', '').split(',')))
 CHECK_INTERVAL = int(os.getenv('CHECK_INTERVAL', '3600'))
 
 # Порог дивергенции по умолчанию (в процентах)
-DEFAULT_DIVERGENCE_THRESHOLD = float(os.getenv('DEFAULT_DIVERGENCE_THRESHOLD', '5.0'))
\ No newline at end of file
+DEFAULT_DIVERGENCE_THRESHOLD = float(os.getenv('DEFAULT_DIVERGENCE_THRESHOLD', '5.0'))
+
+# Ключ advisory-lock для выбора лидера детектора дивергенций
+# (ключ DETECTOR_LOCK_ID + 1 занимают блокировки участия реплик)
+DETECTOR_LOCK_ID = int(os.getenv('DETECTOR_LOCK_ID', '715001'))
+
+# Количество шардов комбинаций пар (1 - без шардирования, работает один лидер)
+DETECTOR_SHARDS = int(os.getenv('DETECTOR_SHARDS', '1'))
+
+# Интервал продления аренды лидера и повторных попыток захвата (в секундах)
+LEADER_RENEW_INTERVAL = float(os.getenv('LEADER_RENEW_INTERVAL', '5'))
+LEADER_RETRY_INTERVAL = float(os.getenv('LEADER_RETRY_INTERVAL', '5'))
+
+# Режим получения обновлений: polling или webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+
+# Настройки webhook: внешний адрес, путь и секретный токен
+WEBHOOK_BASE_URL = os.getenv('WEBHOOK_BASE_URL', '')
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+
+# Адрес встроенного HTTP-сервера (webhook, health, metrics)
+WEBAPP_HOST = os.getenv('WEBAPP_HOST', '0.0.0.0')
+WEBAPP_PORT = int(os.getenv('WEBAPP_PORT', '8081'))
+
+# Запускать HTTP-сервер с health и metrics в режиме polling
+HTTP_SERVER_ENABLED = os.getenv('HTTP_SERVER_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+
+# Максимальное количество одновременно обрабатываемых обновлений
+MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', '50'))
+
+# Роль процесса: all (бот и детектор), detector или bot
+APP_ROLE = os.getenv('APP_ROLE', 'all').lower()
+
+# Канал LISTEN/NOTIFY для событий о новых дивергенциях
+DIVERGENCE_CHANNEL = os.getenv('DIVERGENCE_CHANNEL', 'divergences')
+
+# Время жизни кэша настроек бота (в секундах)
+SETTINGS_CACHE_TTL = float(os.getenv('SETTINGS_CACHE_TTL', '30'))
+
+# Время жизни кэша exchangeInfo Binance (в секундах)
+EXCHANGE_INFO_CACHE_TTL = float(os.getenv('EXCHANGE_INFO_CACHE_TTL', '3600'))
+
+# Режим уведомлений по умолчанию: single (по сообщению) или digest (сводка)
+NOTIFICATION_MODE = os.getenv('NOTIFICATION_MODE', 'single').lower()
+
+# Окно накопления дивергенций для сводки (в секундах)
+DIGEST_WINDOW = int(os.getenv('DIGEST_WINDOW', '60'))
+
+# Лимиты отправки сообщений Telegram
+TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '30'))                       # сообщений в секунду
+TELEGRAM_GROUP_RATE_PER_MINUTE = float(os.getenv('TELEGRAM_GROUP_RATE_PER_MINUTE', '20'))   # в одну группу в минуту
+TELEGRAM_PRIVATE_RATE = float(os.getenv('TELEGRAM_PRIVATE_RATE', '1'))                      # в один личный чат в секунду
+TELEGRAM_SEND_CONCURRENCY = int(os.getenv('TELEGRAM_SEND_CONCURRENCY', '10'))
+TELEGRAM_SEND_MAX_ATTEMPTS = int(os.getenv('TELEGRAM_SEND_MAX_ATTEMPTS', '5'))
+
+# Размер пачки уведомлений, захватываемой обработчиком outbox
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '100'))
+
+# Интервал опроса outbox без событий NOTIFY (в секундах)
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '30'))
+
+# Срок захвата пачки outbox обработчиком (в секундах): продлевается, пока пачка
+# отправляется, после падения обработчика пачку заберет другой
+OUTBOX_CLAIM_TIMEOUT = float(os.getenv('OUTBOX_CLAIM_TIMEOUT', '300'))
+
+# Пауза перед повторной отправкой неудавшихся уведомлений (в секундах)
+OUTBOX_RETRY_DELAY = float(os.getenv('OUTBOX_RETRY_DELAY', '60'))
+
+# Попытки доставки уведомления в чат, после которых чат пропускается
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_ATTEMPTS', '5'))
+
+# Время жизни кэша подписок на уведомления (в секундах)
+SUBSCRIPTIONS_CACHE_TTL = float(os.getenv('SUBSCRIPTIONS_CACHE_TTL', '60'))
+
+# Графики соотношения цен во вложении к уведомлениям
+ATTACH_CHARTS = os.getenv('ATTACH_CHARTS', 'false').lower() in ('1', 'true', 'yes')
+CHART_WINDOW_HOURS = int(os.getenv('CHART_WINDOW_HOURS', '24'))     # период графика по умолчанию
+CHART_WORKERS = int(os.getenv('CHART_WORKERS', '2'))                # процессы для отрисовки
+CHART_CACHE_SIZE = int(os.getenv('CHART_CACHE_SIZE', '256'))        # готовые изображения в памяти
+PRICE_HISTORY_HOURS = int(os.getenv('PRICE_HISTORY_HOURS', '48'))   # сколько хранить историю цен
+
+# Секционирование таблицы дивергенций по месяцам
+DIVERGENCE_RETENTION_DAYS = int(os.getenv('DIVERGENCE_RETENTION_DAYS', '90'))                 # хранение сырых записей
+PARTITIONS_AHEAD = int(os.getenv('PARTITIONS_AHEAD', '2'))                                     # секции на месяцы вперед
+PARTITION_MAINTENANCE_INTERVAL = float(os.getenv('PARTITION_MAINTENANCE_INTERVAL', '3600'))    # в секундах
+
+# Время жизни кэша статистики для админ-панели (в секундах)
+STATS_CACHE_TTL = float(os.getenv('STATS_CACHE_TTL', '30'))
+
+# Кэш администраторов: время жизни (в секундах) и канал NOTIFY для сброса на всех репликах
+ADMIN_CACHE_TTL = float(os.getenv('ADMIN_CACHE_TTL', '300'))
+ADMINS_CHANNEL = os.getenv('ADMINS_CHANNEL', 'admins')
+
+# Хранилище состояний диалогов (FSM): db - в таблице fsm_states, memory - в памяти процесса
+FSM_STORAGE = os.getenv('FSM_STORAGE', 'db')
+# Время жизни (в секундах) заброшенных диалогов и локального кэша состояний
+FSM_STATE_TTL = float(os.getenv('FSM_STATE_TTL', '86400'))
+FSM_CACHE_TTL = float(os.getenv('FSM_CACHE_TTL', '300'))
+# Канал NOTIFY для сброса кэша состояний на других репликах
+FSM_CHANNEL = os.getenv('FSM_CHANNEL', 'fsm_states')
+
+# Профилирование циклов проверки: каталог для профилей, число циклов и шаг сэмплирования (в секундах)
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+PROFILE_CYCLES = int(os.getenv('PROFILE_CYCLES', '3'))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0.005'))
+
+# Трассировка циклов проверки в JSONL: файл, доля записываемых циклов (0 - выключено)
+# и ограничение количества span в одной трассе
+TRACE_FILE = os.getenv('TRACE_FILE', 'traces/cycles.jsonl')
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '0'))
+TRACE_MAX_SPANS = int(os.getenv('TRACE_MAX_SPANS', '2000'))
@@ -0,0 +1,46 @@
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+
+
+def is_sqlite_url(url) -> bool:
+    """Указывает ли URL на SQLite"""
+    return make_url(url).get_backend_name() == 'sqlite'
+
+
+def is_memory_url(url) -> bool:
+    """Указывает ли URL на SQLite в памяти (sqlite+aiosqlite:// или :memory:)"""
+    url: URL = make_url(url)
+    return is_sqlite_url(url) and url.database in (None, '', ':memory:')
+
+
+def dialect_name(session: AsyncSession) -> str:
+    """Имя диалекта БД, к которой привязана сессия"""
+    return session.get_bind().dialect.name
+
+
+def upsert(session: AsyncSession, table):
+    """
+    INSERT с поддержкой on_conflict_do_update для текущей БД
+
+    Конструкции PostgreSQL и SQLite совместимы по API (on_conflict_do_update, excluded)
+    """
+    if dialect_name(session) == 'sqlite':
+        return sqlite.insert(table)
+    return postgresql.insert(table)
+
+
+def greatest(session: AsyncSession, *values) -> ColumnElement:
+    """Максимум из нескольких значений (в SQLite - многоаргументный max)"""
+    if dialect_name(session) == 'sqlite':
+        return func.max(*values)
+    return func.greatest(*values)
+
+
+def seconds_between(session: AsyncSession, start, end) -> ColumnElement:
+    """Разница двух моментов времени в секундах"""
+    if dialect_name(session) == 'sqlite':
+        return (func.julianday(end) - func.julianday(start)) * 86400
+    return func.extract('epoch', end - start)
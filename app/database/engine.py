@@ -1,17 +1,88 @@
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine,AsyncSession, async_sessionmaker
-from app.config import POSTGRES_URI
+from sqlalchemy.pool import StaticPool
+from app.config import (
+    DATABASE_URL,
+    DB_ECHO,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    DB_STATEMENT_CACHE_SIZE,
+    DB_SLOW_QUERY_MS
+)
+from app.database.base import Base
+from app.database.dialect import is_sqlite_url, is_memory_url
+from app.database.instrumentation import (
+    InstrumentedPool,
+    register_pool_metrics,
+    setup_query_counting,
+    setup_query_tracing,
+    setup_slow_query_log
+)
 from typing import AsyncGenerator
 
+IS_SQLITE = is_sqlite_url(DATABASE_URL)
+
+
+def create_engine_from_url(url, echo: bool = DB_ECHO):
+    """Создает движок с настройками пула для PostgreSQL или SQLite"""
+    if is_memory_url(url):
+        # База в памяти живет, пока открыто соединение, поэтому оно одно на процесс
+        return create_async_engine(
+            url,
+            echo=echo,
+            poolclass=StaticPool,
+            connect_args={'check_same_thread': False}
+        )
+    if is_sqlite_url(url):
+        return create_async_engine(url, echo=echo)
+
+    # Кэш подготовленных запросов asyncpg и SQLAlchemy (0 отключает, нужно для pgbouncer)
+    url = make_url(url).update_query_dict(
+        {'prepared_statement_cache_size': str(DB_STATEMENT_CACHE_SIZE)}
+    )
+    return create_async_engine(
+        url,
+        echo=echo,
+        poolclass=InstrumentedPool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        connect_args={'statement_cache_size': DB_STATEMENT_CACHE_SIZE}
+    )
+
+
 # Создание асинхронного движка
-engine = create_async_engine(POSTGRES_URI, echo=True)
+engine = create_engine_from_url(DATABASE_URL)
+register_pool_metrics(engine)
+setup_slow_query_log(engine, DB_SLOW_QUERY_MS)
+setup_query_tracing(engine)
+setup_query_counting(engine)
 
 # Асинхронная фабрика сессий (новая форма с SQLAlchemy 2.0)
 async_session = async_sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
+
+
+async def create_schema() -> None:
+    """
+    Создает отсутствующие таблицы по моделям
+
+    Используется для SQLite (в том числе базы в памяти), в PostgreSQL схему
+    создают миграции Alembic.
+    """
+    import app.database.models  # noqa: F401 - регистрирует модели в metadata
+
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
  
 
 # Зависимость для FastAPI или просто генератор сессии
 async def get_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session() as session:
-        yield session
\ No newline at end of file
+        yield session
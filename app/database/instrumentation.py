@@ -0,0 +1,117 @@
+import logging
+import time
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.database.query_counter import current_counter
+from app.utils.metrics import REGISTRY
+from app.utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+POOL_SIZE = REGISTRY.gauge('db_pool_size', 'Размер пула соединений')
+POOL_CHECKED_OUT = REGISTRY.gauge('db_pool_checked_out', 'Выданные из пула соединения')
+POOL_OVERFLOW = REGISTRY.gauge('db_pool_overflow', 'Соединения сверх размера пула')
+POOL_CHECKOUTS = REGISTRY.counter('db_pool_checkouts_total', 'Получения соединения из пула')
+POOL_WAIT_SECONDS = REGISTRY.counter('db_pool_wait_seconds_total', 'Суммарное ожидание соединения из пула')
+POOL_TIMEOUTS = REGISTRY.counter('db_pool_timeouts_total', 'Превышения времени ожидания соединения')
+QUERIES = REGISTRY.counter('db_queries_total', 'Выполненные SQL-запросы')
+SLOW_QUERIES = REGISTRY.counter('db_slow_queries_total', 'Запросы дольше порога DB_SLOW_QUERY_MS')
+QUERY_SECONDS = REGISTRY.histogram('db_query_seconds', 'Длительность SQL-запросов')
+
+# Длина текста запроса в логе медленных запросов
+STATEMENT_LOG_LIMIT = 500
+
+# Длина текста запроса в атрибуте span трассы
+TRACE_STATEMENT_LIMIT = 200
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Пул соединений, замеряющий время ожидания свободного соединения"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            POOL_CHECKOUTS.inc()
+            POOL_WAIT_SECONDS.inc(time.perf_counter() - started)
+
+
+def register_pool_metrics(engine: AsyncEngine) -> None:
+    """Экспортирует состояние пула соединений в метрики"""
+    pool = engine.sync_engine.pool
+    if not isinstance(pool, AsyncAdaptedQueuePool):
+        return
+    POOL_SIZE.set_function(pool.size)
+    POOL_CHECKED_OUT.set_function(pool.checkedout)
+    # overflow() отрицателен, пока пул не заполнен
+    POOL_OVERFLOW.set_function(lambda: max(0, pool.overflow()))
+
+
+def setup_slow_query_log(engine: AsyncEngine, threshold_ms: float) -> None:
+    """
+    Логирует запросы дольше порога вместо логирования всех запросов (echo)
+
+    Время измеряется от отправки запроса драйверу до получения результата.
+    """
+    threshold = threshold_ms / 1000
+
+    @event.listens_for(engine.sync_engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started_at', []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started_at'].pop()
+        QUERIES.inc()
+        QUERY_SECONDS.observe(elapsed)
+        if threshold > 0 and elapsed >= threshold:
+            SLOW_QUERIES.inc()
+            logger.warning(f"Медленный запрос ({elapsed * 1000:.0f} мс): {statement[:STATEMENT_LOG_LIMIT]}")
+
+    @event.listens_for(engine.sync_engine, 'handle_error')
+    def handle_error(exception_context):
+        # Снимаем отметку времени запроса, завершившегося ошибкой
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('query_started_at'):
+            connection.info['query_started_at'].pop()
+
+
+def setup_query_tracing(engine: AsyncEngine) -> None:
+    """Добавляет SQL-запросы в текущую трассу (вне выбранной трассы - ничего не делает)"""
+
+    @event.listens_for(engine.sync_engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        span = tracer.start_span(
+            'db.query',
+            operation=(statement.split(None, 1) or [''])[0].upper(),
+            statement=statement[:TRACE_STATEMENT_LIMIT]
+        )
+        conn.info.setdefault('query_spans', []).append(span)
+
+    @event.listens_for(engine.sync_engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        span = conn.info['query_spans'].pop()
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            span.set(rows=cursor.rowcount)
+        span.end()
+
+    @event.listens_for(engine.sync_engine, 'handle_error')
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('query_spans'):
+            connection.info['query_spans'].pop().end(exception_context.original_exception)
+
+
+def setup_query_counting(engine: AsyncEngine) -> None:
+    """Передает выполненные запросы в текущий QueryCounter (если он есть)"""
+
+    @event.listens_for(engine.sync_engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        counter = current_counter()
+        if counter is not None:
+            counter.record(statement, parameters, cursor.rowcount, executemany)
@@ -1,11 +1,19 @@
 from .admin import Admin
 from .currency_pair import CurrencyPair
 from .divergence import Divergence
+from .divergence_rollup import DivergenceHourly
+from .fsm_state import FsmState
+from .notification_delivery import NotificationDelivery
 from .settings import BotSettings
+from .subscription import Subscription
 
 __all__ = [
     'Admin',
     'CurrencyPair',
     'Divergence',
-    'BotSettings'
+    'DivergenceHourly',
+    'FsmState',
+    'NotificationDelivery',
+    'BotSettings',
+    'Subscription'
 ]
\ No newline at end of file
@@ -1,10 +1,11 @@
-from sqlalchemy import Column, Integer, String, Boolean
+from sqlalchemy import Column, BigInteger, String, Boolean
 from app.database.base import BaseModel
 
 class Admin(BaseModel):
     __tablename__ = 'admins'
 
-    user_id = Column(Integer, unique=True, nullable=False)
+    # ID пользователей Telegram не помещаются в 32 бита
+    user_id = Column(BigInteger, unique=True, nullable=False)
     username = Column(String, nullable=True)
     is_superadmin = Column(Boolean, default=False)
     is_active = Column(Boolean, default=True)
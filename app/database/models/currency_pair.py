@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, Float, Integer, ForeignKey
+from sqlalchemy import Column, String, Boolean, Float, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from app.database.base import BaseModel
 
@@ -11,5 +11,12 @@ class CurrencyPair(BaseModel):
     is_active = Column(Boolean, default=True)
     devergence_threshold = Column(Float, default=5.0)       # Порог дивергенции в процентах
 
+    __table_args__ = (
+        # Детектор каждый цикл выбирает только активные пары
+        Index('ix_currency_pairs_active', 'id', postgresql_where=is_active == True, sqlite_where=is_active == True),
+        # Поиск пар по началу символа (LIKE 'BTC%') в админ-панели
+        Index('ix_currency_pairs_symbol_pattern', 'symbol', postgresql_ops={'symbol': 'varchar_pattern_ops'}),
+    )
+
     def __repr__(self):
         return f"<CurrencyPair(symbol={self.symbol}, active={self.is_active})>"
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Text, Integer, Boolean
+from sqlalchemy import Column, String, Float, DateTime, ForeignKey, Integer, Boolean, Index
 from sqlalchemy.orm import relationship 
 from app.database.base import BaseModel
 from datetime import datetime, timezone
@@ -7,6 +7,13 @@ def utcnow():
     return datetime.now(timezone.utc)
 
 class Divergence(BaseModel):
+    """
+    Обнаруженная дивергенция
+
+    В PostgreSQL таблица секционирована по месяцам detected_at, поэтому
+    первичный ключ в БД - (id, detected_at). Для ORM достаточно id: он
+    уникален, так как все секции используют одну последовательность.
+    """
     __tablename__ = 'divergences'
 
     pair1_id = Column(Integer, ForeignKey('currency_pairs.id'))
@@ -16,12 +23,29 @@ class Divergence(BaseModel):
     pair1_price = Column(Float, nullable=False)
     pair2_price = Column(Float, nullable=False)
     divergence_percent = Column(Float, nullable=False)
-    detected_at = Column(DateTime(timezone=True), default=utcnow)
+    detected_at = Column(DateTime(timezone=True), default=utcnow, nullable=False)
     notification_sent = Column(Boolean, default=False)
-    description = Column(Text, nullable=True)
+    notified_at = Column(DateTime(timezone=True), nullable=True)
+    # Захват обработчиком outbox: до claimed_until строку не берут другие
+    claimed_until = Column(DateTime(timezone=True), nullable=True)
+    claimed_by = Column(String(32), nullable=True)
 
     pair1 = relationship('CurrencyPair', foreign_keys=[pair1_id])
     pair2 = relationship('CurrencyPair', foreign_keys=[pair2_id])
 
+    __table_args__ = (
+        # Частичный индекс для outbox: содержит только неотправленные уведомления
+        Index(
+            'ix_divergences_pending',
+            'id',
+            postgresql_where=notification_sent == False,
+            sqlite_where=notification_sent == False
+        ),
+        # Проверка повторной дивергенции между парами за последний час
+        Index('ix_divergences_pair_detected', 'pair1_id', 'pair2_id', 'detected_at'),
+        # Выборки за период: история, статистика, очистка старых записей
+        Index('ix_divergences_detected_at', 'detected_at', 'id'),
+    )
+
     def __repr__(self):
         return f"<Divergence(pair1={self.pair1_symbol}, pair2={self.pair2_symbol}, percent={self.divergence_percent})>"
\ No newline at end of file
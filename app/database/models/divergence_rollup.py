@@ -0,0 +1,22 @@
+from sqlalchemy import Column, String, Float, DateTime, Integer, Index
+from app.database.base import Base
+
+
+class DivergenceHourly(Base):
+    """Почасовая сводка дивергенций по паре для статистики за длинные периоды"""
+    __tablename__ = 'divergence_hourly'
+
+    pair1_id = Column(Integer, primary_key=True)
+    pair2_id = Column(Integer, primary_key=True)
+    hour = Column(DateTime(timezone=True), primary_key=True)    # Начало часа (UTC)
+    pair1_symbol = Column(String, nullable=False)
+    pair2_symbol = Column(String, nullable=False)
+    divergences_count = Column(Integer, nullable=False, default=0)
+    max_divergence = Column(Float, nullable=False, default=0.0)  # Максимальная дивергенция по модулю
+
+    __table_args__ = (
+        Index('ix_divergence_hourly_hour', 'hour'),
+    )
+
+    def __repr__(self):
+        return f"<DivergenceHourly(pair1={self.pair1_symbol}, pair2={self.pair2_symbol}, hour={self.hour})>"
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, String, DateTime, JSON, Index
+from app.database.base import Base
+
+
+class FsmState(Base):
+    """Состояние и данные FSM диалога пользователя (хранилище aiogram)"""
+    __tablename__ = 'fsm_states'
+
+    key = Column(String, primary_key=True)                  # bot:chat:user:thread:business:destiny
+    state = Column(String, nullable=True)
+    data = Column(JSON, nullable=True)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+    __table_args__ = (
+        # Очистка заброшенных диалогов
+        Index('ix_fsm_states_updated_at', 'updated_at'),
+    )
+
+    def __repr__(self):
+        return f"<FsmState(key={self.key}, state={self.state})>"
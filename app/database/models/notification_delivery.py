@@ -0,0 +1,23 @@
+from sqlalchemy import Column, String, DateTime, Integer
+from app.database.base import Base
+
+
+class NotificationDelivery(Base):
+    """
+    Доставка уведомления о дивергенции в один чат
+
+    Строки живут, пока дивергенция не доставлена всем получателям: повторная
+    отправка пропускает чаты, уже получившие сообщение, и считает попытки
+    остальных. Удаляются вместе с отметкой дивергенции отправленной.
+    """
+    __tablename__ = 'notification_deliveries'
+
+    # Без внешнего ключа: таблица дивергенций секционирована
+    divergence_id = Column(Integer, primary_key=True)
+    chat_id = Column(String, primary_key=True)
+    status = Column(String, nullable=False, default='pending')  # pending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<NotificationDelivery(divergence={self.divergence_id}, chat={self.chat_id}, status={self.status})>"
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, String, Boolean, Float, Integer, BigInteger
+from app.database.base import BaseModel
+
+class Subscription(BaseModel):
+    __tablename__ = 'subscriptions'
+
+    chat_id = Column(BigInteger, nullable=False)                # Чат, куда отправляются уведомления
+    title = Column(String, nullable=True)                       # Название для админ-панели
+    symbols = Column(String, nullable=True)                     # Пары через запятую, пусто - все пары
+    min_divergence = Column(Float, default=0.0)                 # Минимальная дивергенция в процентах
+    quiet_hours_start = Column(Integer, nullable=True)          # Начало тихих часов (час UTC)
+    quiet_hours_end = Column(Integer, nullable=True)            # Конец тихих часов (час UTC)
+    is_active = Column(Boolean, default=True)
+
+    def __repr__(self):
+        return f"<Subscription(chat_id={self.chat_id}, symbols={self.symbols}, min={self.min_divergence})>"
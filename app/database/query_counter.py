@@ -0,0 +1,150 @@
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from app.config import DB_REPEATED_QUERY_THRESHOLD
+from app.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+QUERIES_PER_UNIT = REGISTRY.histogram(
+    'db_queries_per_unit',
+    'SQL-запросы за единицу работы (цикл детектора, обновление Telegram, пачка outbox)',
+    buckets=(1, 2, 5, 10, 20, 50, 100, 500, 1000, 5000)
+)
+REPEATED_QUERIES = REGISTRY.counter('db_repeated_queries_total', 'Единицы работы с повторяющимся запросом (N+1)')
+
+# Длина текста запроса в отчете о повторах
+REPORT_STATEMENT_LIMIT = 200
+
+# Текущий учет запросов задачи (задачи, созданные внутри, наследуют его)
+_current_counter: ContextVar[Optional['QueryCounter']] = ContextVar('query_counter', default=None)
+
+# Название блока, повторы запросов которого ожидаемы (см. allow_repeats)
+_allowed_repeats: ContextVar[Optional[str]] = ContextVar('allowed_repeats', default=None)
+
+
+class QueryCounter:
+    """
+    Учет SQL-запросов единицы работы: количество запросов, строк и повторов
+
+    Запросы считаются по событиям движка (setup_query_counting) внутри блока
+    with, включая вложенные задачи. Повтор - один и тот же текст запроса,
+    выполненный несколько раз с разными параметрами: так выглядит запрос на
+    каждый элемент в цикле (N+1). Повторное чтение с теми же параметрами
+    повтором не считается. Вложенный счетчик передает запросы и внешнему,
+    поэтому проверка части цикла не выпадает из учета всего цикла.
+
+    Запросы внутри allow_repeats и executemany считаются, но повтором не
+    бывают: для них не вычисляется хэш параметров.
+    """
+
+    def __init__(self, unit: str, repeat_threshold: int = DB_REPEATED_QUERY_THRESHOLD):
+        self.unit = unit
+        self.repeat_threshold = repeat_threshold
+        self.statements = 0
+        self.rows = 0
+        self.by_statement: Counter = Counter()
+        # Хэши различных наборов параметров каждого запроса
+        self.parameters: Dict[str, Set[int]] = {}
+        # Запросы с разрешенными повторами и название разрешившего блока
+        self.allowed: Dict[str, str] = {}
+        self._parent: Optional['QueryCounter'] = None
+        self._token = None
+
+    def record(self, statement: str, parameters: Any, rowcount: Optional[int], executemany: bool = False) -> None:
+        """Учитывает выполненный запрос (строки - по rowcount драйвера, если он известен)"""
+        allowed = _allowed_repeats.get()
+        # Хэш параметров считается один раз для всей цепочки счетчиков
+        parameters_hash = None if allowed or executemany else hash(repr(parameters))
+        counter = self
+        while counter is not None:
+            counter._record(statement, parameters_hash, rowcount, allowed)
+            counter = counter._parent
+
+    def _record(self, statement: str, parameters_hash: Optional[int], rowcount: Optional[int], allowed: Optional[str]) -> None:
+        self.statements += 1
+        if rowcount is not None and rowcount > 0:
+            self.rows += rowcount
+        self.by_statement[statement] += 1
+        if allowed:
+            self.allowed[statement] = allowed
+        elif parameters_hash is not None:
+            self.parameters.setdefault(statement, set()).add(parameters_hash)
+
+    @property
+    def repeated(self) -> List[Tuple[str, int, int]]:
+        """
+        Запросы, выполненные не меньше repeat_threshold раз с разными
+        параметрами: (текст, количество выполнений, различных наборов параметров)
+        """
+        return [
+            (statement, count, len(self.parameters[statement]))
+            for statement, count in self.by_statement.most_common()
+            if statement not in self.allowed and len(self.parameters.get(statement, ())) >= self.repeat_threshold
+        ]
+
+    def report(self) -> str:
+        lines = [f"{self.unit}: {self.statements} запросов, {self.rows} строк"]
+        for statement, count in self.by_statement.most_common():
+            if statement in self.allowed:
+                note = f"повторы разрешены: {self.allowed[statement]}"
+            else:
+                note = f"{len(self.parameters.get(statement, ()))} наборов параметров"
+            lines.append(f"  {count} x ({note}) {' '.join(statement.split())[:REPORT_STATEMENT_LIMIT]}")
+        return '\n'.join(lines)
+
+    def __enter__(self) -> 'QueryCounter':
+        self._parent = _current_counter.get()
+        self._token = _current_counter.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        _current_counter.reset(self._token)
+        QUERIES_PER_UNIT.observe(self.statements, unit=self.unit)
+        repeated = self.repeated
+        if repeated:
+            REPEATED_QUERIES.inc(unit=self.unit)
+            statement, count, distinct = repeated[0]
+            logger.warning(
+                f"Повторяющийся запрос (N+1) в {self.unit}: {count} раз из {self.statements} "
+                f"с {distinct} наборами параметров: "
+                f"{' '.join(statement.split())[:REPORT_STATEMENT_LIMIT]}"
+            )
+        return False
+
+
+def current_counter() -> Optional[QueryCounter]:
+    return _current_counter.get()
+
+
+@contextmanager
+def allow_repeats(name: str) -> Iterator[None]:
+    """
+    Помечает запросы блока как ожидаемо повторяющиеся
+
+    Для записей, которые намеренно выполняются по мере работы, а не одним
+    запросом в конце (например, результаты доставки уведомлений, чтобы после
+    сбоя не отправлять их повторно). Запросы блока учитываются в количестве,
+    но не считаются N+1; name показывается в отчете.
+    """
+    token = _allowed_repeats.set(name)
+    try:
+        yield
+    finally:
+        _allowed_repeats.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int, unit: str = 'assert_max_queries') -> Iterator[QueryCounter]:
+    """
+    Проверка для тестов и бенчмарков: блок выполняет не больше limit запросов
+
+        with assert_max_queries(3):
+            await analyzer.check_all_pairs()
+    """
+    with QueryCounter(unit) as counter:
+        yield counter
+    if counter.statements > limit:
+        raise AssertionError(f"Ожидалось не больше {limit} запросов\n{counter.report()}")
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import CHECK_INTERVAL, HTTP_SERVER_ENABLED, PARTITION_MAINTENANCE_INTERVAL
+from app.database.engine import IS_SQLITE, create_schema, engine, get_session
+from app.database.models import Divergence
+from app.database.query_counter import QueryCounter
+from app.services.binance_api import BinanceAPI
+from app.services.divergence import DivergenceAnalyzer
+from app.services.events import publish_divergences
+from app.services.leader import LeaderElector
+from app.services.partitions import PartitionManager
+from app.services.profiler import cycle_profiler
+from app.services.settings_cache import settings_cache
+from app.utils.loop_monitor import loop_monitor
+from app.utils.metrics import REGISTRY
+from app.utils.startup import startup
+from app.utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+CYCLE_SECONDS = REGISTRY.histogram('detector_cycle_seconds', 'Длительность цикла проверки дивергенций')
+CYCLE_ERRORS = REGISTRY.counter('detector_cycle_errors_total', 'Циклы проверки, завершившиеся ошибкой')
+
+# Обработчик найденных дивергенций (например, отправка уведомлений в том же процессе)
+DivergenceHandler = Callable[[AsyncSession, List[Divergence]], Awaitable[None]]
+
+
+async def ping_database():
+    """Проверяет соединение с БД и заодно открывает первое соединение пула"""
+    async with engine.connect() as connection:
+        await connection.execute(text('SELECT 1'))
+
+
+async def load_settings():
+    """Загружает настройки бота в кэш"""
+    async for session in get_session():
+        await settings_cache.load(session)
+
+
+async def load_exchange_info():
+    """Загружает exchangeInfo Binance в кэш"""
+    try:
+        await BinanceAPI().get_exchange_info()
+    except Exception as e:
+        # Кэш заполнится при первом обращении, запуск не прерываем
+        logger.warning(f"Не удалось загрузить exchangeInfo при запуске: {str(e)}")
+
+
+async def warm_up(*extra_steps: Awaitable):
+    """Параллельно выполняет независимые шаги инициализации и прогревает кэши"""
+    if IS_SQLITE:
+        # Для SQLite (в том числе в памяти) схема создается по моделям
+        await startup.run_phase('create_schema', create_schema())
+
+    with startup.phase('warm_up'):
+        await asyncio.gather(
+            startup.run_phase('db_ping', ping_database()),
+            startup.run_phase('settings', load_settings()),
+            startup.run_phase('exchange_info', load_exchange_info()),
+            *extra_steps
+        )
+    startup.mark_ready()
+
+
+async def check_divergence_task(elector: LeaderElector, on_divergences: Optional[DivergenceHandler] = None):
+    """
+    Фоновая задача для проверки дивергенций между валютными парами
+
+    Проверку выполняет только реплика, удерживающая блокировку лидера
+    (или блокировки своих шардов комбинаций пар); перед записью результатов
+    блокировки проверяются повторно. Если обработчик не передан,
+    уведомления отправляет отдельный процесс бота, а детектор только
+    публикует события через NOTIFY.
+    """
+    logger.info('Запуск фоновой задачи проверки дивергенций')
+
+    # Профилирование следующих циклов по сигналу SIGUSR1
+    cycle_profiler.install_signal_handler()
+
+    # Первая проверка начинается только после прогрева кэшей
+    await startup.ready.wait()
+
+    while True:
+        interval = CHECK_INTERVAL
+
+        if not elector.is_leader:
+            logger.info('Реплика не является лидером, ожидаем захвата блокировки')
+            await elector.wait_for_leadership()
+
+        started = time.perf_counter()
+        shards = elector.shards
+        confirm = lambda: elector.confirm(shards)
+        # Трасса цикла записывается в TRACE_FILE для доли TRACE_SAMPLE_RATE циклов,
+        # повторяющиеся в цикле запросы (N+1) попадают в лог
+        with tracer.trace('detector.cycle', shards=shards and sorted(shards[0])) as cycle_span, QueryCounter('detector.cycle') as queries:
+            try:
+                # Создаем новую сессию для каждой итерации
+                async for session in get_session():
+                    with tracer.span('settings.load'):
+                        # Получаем текущий интервал проверки из настроек
+                        interval = await settings_cache.get_int(session, 'check_interval', CHECK_INTERVAL)
+
+                        # Проверяем статус бота
+                        is_active = await settings_cache.get_bool(session, 'bot_active', True)
+                    if not is_active:
+                        cycle_span.set(skipped='bot_inactive')
+                        logger.info('Бот не активен, пропускаем проверку дивергенций')
+                        break
+
+                    # Создаем сервисы
+                    binance_api = BinanceAPI()
+                    divergence_analyzer = DivergenceAnalyzer(session, binance_api)
+
+                    # Проверяем дивергенции (под профилировщиком, если его запросили)
+                    logger.info('Проверка дивергенций...')
+                    await cycle_profiler.poll_request(session)
+                    if cycle_profiler.active:
+                        divergences = await cycle_profiler.run(divergence_analyzer.check_all_pairs(shards, confirm))
+                    else:
+                        divergences = await divergence_analyzer.check_all_pairs(shards, confirm)
+
+                    cycle_span.set(divergences=len(divergences))
+                    if divergences:
+                        logger.info(f"Обнаружено {len(divergences)} дивергенций")
+                        with tracer.span('divergences.handle', divergences=len(divergences)):
+                            if on_divergences is not None:
+                                await on_divergences(session, divergences)
+                            else:
+                                # Уведомления отправит процесс бота
+                                await publish_divergences(session, [divergence.id for divergence in divergences])
+                    else:
+                        logger.info('Дивергенций не обнаружено')
+
+                    cycle_span.set(queries=queries.statements)
+                    startup.mark_first_check()
+                    CYCLE_SECONDS.observe(time.perf_counter() - started)
+                    logger.info(f"Следующая проверка через {interval} секунд")
+                    break
+
+            except Exception as e:
+                cycle_span.record_error(e)
+                CYCLE_ERRORS.inc()
+                logger.error(f"Ошибка при проверке дивергенций: {str(e)}")
+
+        await asyncio.sleep(interval)
+
+
+async def partition_maintenance_task(elector: LeaderElector):
+    """
+    Фоновая задача обслуживания секций таблицы дивергенций
+
+    Выполняется только лидером первого шарда, чтобы реплики не конкурировали
+    за DDL-блокировки. Шард без владельца забирает другая реплика, поэтому
+    обслуживание не останавливается вместе с ней.
+    """
+    manager = PartitionManager(engine)
+    await startup.ready.wait()
+
+    while True:
+        if not elector.is_leader:
+            await elector.wait_for_leadership()
+
+        if 0 in elector.shard_indexes:
+            try:
+                await manager.run()
+            except Exception as e:
+                logger.error(f"Ошибка при обслуживании секций дивергенций: {str(e)}")
+
+        await asyncio.sleep(PARTITION_MAINTENANCE_INTERVAL)
+
+
+async def run_detector():
+    """
+    Процесс детектора: только анализ дивергенций и публикация событий
+
+    Модуль не импортирует aiogram, поэтому детектор запускается быстрее бота
+    """
+    elector = LeaderElector(engine)
+    elector.start()
+    loop_monitor.start()
+
+    await warm_up()
+    maintenance = asyncio.create_task(partition_maintenance_task(elector))
+
+    runner = None
+    if HTTP_SERVER_ENABLED:
+        from app.web import create_web_app, start_web_app
+
+        health_info = lambda: {
+            'role': 'detector',
+            'ready': startup.ready.is_set(),
+            'is_leader': elector.is_leader
+        }
+        runner = await start_web_app(create_web_app(health_info=health_info))
+
+    try:
+        await check_divergence_task(elector)
+    finally:
+        maintenance.cancel()
+        loop_monitor.stop()
+        await elector.stop()
+        if runner is not None:
+            await runner.cleanup()
@@ -6,15 +6,20 @@ from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import default_state
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.database.models import Admin, CurrencyPair, BotSettings, Divergence
+from app.database.models import Admin, BotSettings
 from app.keyboards.admin_kb import (
     get_admin_main_menu,
     get_bot_control_kb,
+    get_profiling_kb,
     get_pairs_menu_kb,
     get_settings_menu_kb,
     get_back_kb
 )
-from app.config import SUPERADMIN_IDS
+from app.config import SUPERADMIN_IDS, PROFILE_CYCLES
+from app.services.admin_cache import admin_cache, publish_admins_changed
+from app.services.profiler import PROFILE_REQUEST_KEY
+from app.services.settings_cache import settings_cache
+from app.services.stats import stats_service, TOP_PAIRS_DAYS
 
 logger = logging.getLogger(__name__)
 
@@ -24,9 +29,7 @@ async def process_admin_panel(message: Message, session: AsyncSession):
     user_id = message.from_user.id
     
     # Проверяем пользователя на администратов
-    query = select(Admin).where(Admin.user_id == user_id)
-    result = await session.execute(query) # type: ignore
-    admin = result.scalar_one_or_none()
+    admin = await admin_cache.get(session, user_id)
     
     # Если пользователь не админ, но он в списке суперадминов, добавляем его
     if admin is None and user_id in SUPERADMIN_IDS:
@@ -37,7 +40,9 @@ async def process_admin_panel(message: Message, session: AsyncSession):
             is_active=True
         )
         session.add(admin)
+        await publish_admins_changed(session, user_id)
         await session.commit()
+        admin_cache.put(admin)
 
         await message.answer(
             "👋 Добро пожаловать в админ-панель! Вы добавлены как суперадмин."
@@ -116,6 +121,7 @@ async def cb_bot_active(callback: CallbackQuery, session: AsyncSession):
         setting.value_bool = True
 
     await session.commit()
+    settings_cache.invalidate()
 
     await callback.message.edit_text(
         "⚙️ <b>Управление ботом</b>\n\n"
@@ -142,6 +148,7 @@ async def cb_bot_deactivate(callback: CallbackQuery, session: AsyncSession):
         setting.value_bool = False
 
     await session.commit()
+    settings_cache.invalidate()
 
     await callback.message.edit_text(
         "⚙️ <b>Управление ботом</b>\n\n"
@@ -152,42 +159,80 @@ async def cb_bot_deactivate(callback: CallbackQuery, session: AsyncSession):
     )
     await callback.answer('✅ Бот остановлен')
 
+@router.callback_query(F.data == 'profiling')
+async def cb_profiling(callback: CallbackQuery):
+    """Выбор режима профилирования циклов проверки"""
+    await callback.message.edit_text(
+        "🔬 <b>Профилирование циклов проверки</b>\n\n"
+        f"Следующие {PROFILE_CYCLES} цикла проверки дивергенций будут выполнены под профилировщиком, "
+        "сводка по самым затратным функциям придет в этот чат, а полный профиль сохранится на диск.\n\n"
+        "cProfile считает все вызовы (заметно замедляет цикл), сэмплирование почти не влияет "
+        "на скорость и показывает и время ожидания Binance и БД.",
+        reply_markup=get_profiling_kb(),
+        parse_mode='HTML'
+    )
+    await callback.answer()
+
+@router.callback_query(F.data.in_({'profile_cprofile', 'profile_sampling'}))
+async def cb_start_profiling(callback: CallbackQuery, session: AsyncSession):
+    """Запрос профилирования (детектор заберет его из настроек в начале цикла)"""
+    request = {
+        'cycles': PROFILE_CYCLES,
+        'mode': callback.data.removeprefix('profile_'),
+        'chat_id': callback.from_user.id
+    }
+
+    query = select(BotSettings).where(BotSettings.key == PROFILE_REQUEST_KEY)
+    result = await session.execute(query)
+    setting = result.scalar_one_or_none()
+
+    if setting is None:
+        setting = BotSettings(key=PROFILE_REQUEST_KEY, value_json=request)
+        session.add(setting)
+    else:
+        setting.value_json = request
+
+    await session.commit()
+    settings_cache.invalidate()
+
+    await callback.message.edit_text(
+        "🔬 <b>Профилирование циклов проверки</b>\n\n"
+        "✅ Запрос отправлен детектору. Сводка придет после "
+        f"{PROFILE_CYCLES} циклов проверки.",
+        reply_markup=get_back_kb('bot_control'),
+        parse_mode='HTML'
+    )
+    await callback.answer()
+
 @router.callback_query(F.data == 'show_stats')
 async def cb_show_stats(callback: CallbackQuery, session: AsyncSession):
     """Показать статистику бота"""
-    # Получаем количество активных пар
-    pairs_query = select(CurrencyPair).where(CurrencyPair.is_active == True)
-    pairs_result = await session.execute(pairs_query)
-    active_pairs_count = len(pairs_result.scalars().all())
-
-    # Получаем общее количество пар
-    all_pairs_query = select(CurrencyPair)
-    all_pairs_result = await session.execute(all_pairs_query)
-    all_pairs_count = len(all_pairs_result.scalars().all())
-
-    # Получаем количество обнаруженных дивергенций
-    divergence_query = select(Divergence)
-    divergence_result = await session.execute(divergence_query)
-    divergence_count = len(divergence_result.scalars().all())
-
-    # Получаем статус бота
-    status_query = select(BotSettings).where(BotSettings.key == 'bot_active')
-    status_result = await session.execute(status_query)
-    status_setting = status_result.scalar_one_or_none()
-
-    is_active = True
-    if status_setting is not None and status_setting.value_bool is not None:
-        is_active = status_setting.value_bool
+    stats = await stats_service.get(session)
+    is_active = await settings_cache.get_bool(session, 'bot_active', True)
 
     status_text = "🟢 Активен" if is_active else "🔴 Остановлен"
+    latency_text = f"{stats.avg_latency_24h:.1f} с" if stats.avg_latency_24h is not None else 'нет данных'
+    last_text = (
+        stats.last_divergence_at.strftime('%d.%m.%Y %H:%M') + ' UTC'
+        if stats.last_divergence_at is not None else 'нет'
+    )
 
     stats_message = (
         "📊 <b>Статистика бота</b>\n\n"
         f"Статус бота: {status_text}\n"
-        f"Активных валютных пар: {active_pairs_count}/{all_pairs_count}\n"
-        f"Обнаружено дивергенций: {divergence_count}\n\n"
+        f"Активных валютных пар: {stats.active_pairs}/{stats.total_pairs}\n"
+        f"Обнаружено дивергенций: {stats.total_divergences}\n"
+        f"За последние 24 часа: {stats.divergences_24h}\n"
+        f"Последняя дивергенция: {last_text}\n"
+        f"Ожидают отправки: {stats.pending_notifications}\n"
+        f"Средняя задержка уведомления (24 ч): {latency_text}\n"
     )
 
+    if stats.top_pairs:
+        stats_message += f"\n<b>Чаще всего за {TOP_PAIRS_DAYS} дней:</b>\n"
+        for pair1, pair2, count, max_divergence in stats.top_pairs:
+            stats_message += f"• {pair1}/{pair2}: {count} (макс. {max_divergence:.2f}%)\n"
+
     await callback.message.edit_text(
         stats_message,
         reply_markup=get_back_kb('admin_main_menu'),
@@ -0,0 +1,160 @@
+import os
+import html
+import logging
+import tempfile
+from typing import Optional
+from aiogram import Router, F
+from aiogram.types import Message, CallbackQuery, FSInputFile
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.keyboards.admin_kb import get_history_kb
+from app.services.history import (
+    HistoryCursor,
+    HistoryFilters,
+    HistoryPage,
+    cursor_from_data,
+    cursor_to_data,
+    export_history_csv,
+    get_history_page
+)
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+HISTORY_USAGE = (
+    "Фильтры: <code>/history [pair=BTCUSDT] [min=3] [hours=24] "
+    "[from=2026-10-01] [to=2026-10-19T12:00]</code>\n"
+    "Время - UTC, min - минимальная дивергенция по модулю в процентах."
+)
+
+
+def format_history_page(filters: HistoryFilters, page: HistoryPage) -> str:
+    """Текст страницы истории"""
+    lines = [
+        f"{divergence.detected_at:%d.%m %H:%M} {divergence.pair1_symbol}/{divergence.pair2_symbol} "
+        f"<b>{divergence.divergence_percent:+.2f}%</b>"
+        for divergence in page.divergences
+    ]
+    return (
+        "🗂 <b>История дивергенций</b>\n"
+        f"Фильтры: {filters.describe()}\n\n" +
+        '\n'.join(lines) +
+        f"\n\n{HISTORY_USAGE}"
+    )
+
+
+async def show_history_page(
+        message: Message,
+        state: FSMContext,
+        session: AsyncSession,
+        filters: HistoryFilters,
+        after: Optional[HistoryCursor] = None,
+        before: Optional[HistoryCursor] = None,
+        edit: bool = False
+):
+    """Показывает страницу истории и запоминает ее границы в данных FSM"""
+    page = await get_history_page(session, filters, after=after, before=before)
+    if not page.divergences and (after is not None or before is not None):
+        # Граничные записи могли удалить при очистке старых секций
+        page = await get_history_page(session, filters)
+
+    answer = message.edit_text if edit else message.answer
+    if not page.divergences:
+        await answer(
+            "🗂 <b>История дивергенций</b>\n"
+            f"Фильтры: {filters.describe()}\n\n"
+            f"Дивергенций не найдено.\n\n{HISTORY_USAGE}",
+            parse_mode='HTML'
+        )
+        return
+
+    await state.update_data(
+        history_filters=filters.to_dict(),
+        history_first=cursor_to_data(page.first),
+        history_last=cursor_to_data(page.last)
+    )
+    await answer(
+        format_history_page(filters, page),
+        reply_markup=get_history_kb(page.has_newer, page.has_older),
+        parse_mode='HTML'
+    )
+
+
+@router.message(Command('history'))
+async def cmd_history(
+        message: Message,
+        command: CommandObject,
+        state: FSMContext,
+        session: AsyncSession,
+        is_admin: bool = False
+):
+    """История дивергенций с фильтрами"""
+    if not is_admin:
+        await message.answer('⛔ У вас нет доступа к этой команде.')
+        return
+
+    try:
+        filters = HistoryFilters.parse(command.args)
+    except ValueError as e:
+        await message.answer(f'❌ Неверный формат фильтров: {html.escape(str(e))}\n\n' + HISTORY_USAGE, parse_mode='HTML')
+        return
+
+    await show_history_page(message, state, session, filters)
+
+
+@router.callback_query(F.data == 'divergence_history')
+async def cb_divergence_history(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    """История дивергенций без фильтров из главного меню"""
+    await show_history_page(callback.message, state, session, HistoryFilters(), edit=True)
+    await callback.answer()
+
+
+@router.callback_query(F.data.in_({'history_newer', 'history_older'}))
+async def cb_history_page(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    """Переход по страницам истории"""
+    data = await state.get_data()
+    if 'history_filters' not in data:
+        await callback.answer('Откройте историю заново командой /history', show_alert=True)
+        return
+
+    filters = HistoryFilters.from_dict(data['history_filters'])
+    if callback.data == 'history_older':
+        await show_history_page(
+            callback.message, state, session, filters,
+            after=cursor_from_data(data.get('history_last')), edit=True
+        )
+    else:
+        await show_history_page(
+            callback.message, state, session, filters,
+            before=cursor_from_data(data.get('history_first')), edit=True
+        )
+    await callback.answer()
+
+
+@router.callback_query(F.data == 'history_export')
+async def cb_history_export(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
+    """Выгрузка истории по текущим фильтрам в CSV"""
+    data = await state.get_data()
+    if 'history_filters' not in data:
+        await callback.answer('Откройте историю заново командой /history', show_alert=True)
+        return
+
+    await callback.answer('⏳ Готовлю файл...')
+    filters = HistoryFilters.from_dict(data['history_filters'])
+
+    # Файл пишется на диск по мере чтения строк из БД
+    fd, path = tempfile.mkstemp(suffix='.csv')
+    try:
+        with os.fdopen(fd, 'w', newline='', encoding='utf-8') as output:
+            rows = await export_history_csv(session, filters, output)
+        await callback.message.answer_document(
+            FSInputFile(path, filename='divergences.csv'),
+            caption=f"🗂 История дивергенций: {rows} строк\nФильтры: {filters.describe()}"
+        )
+    except Exception as e:
+        logger.error(f"Ошибка при выгрузке истории дивергенций: {str(e)}")
+        await callback.message.answer('❌ Не удалось выгрузить историю.')
+    finally:
+        os.remove(path)
@@ -1,4 +1,6 @@
+import html
 import logging
+from typing import List, Optional
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import StateFilter
@@ -16,9 +18,23 @@ from app.keyboards.admin_kb import (
 )
 from app.utils.states import AdminStates
 from app.services.binance_api import BinanceAPI
+from app.services.pair_import import (
+    ImportRequest,
+    ImportSummary,
+    parse_import_csv,
+    parse_import_text,
+    pair_importer
+)
+from app.services.pairs import get_pairs_page, normalize_prefix
 
 logger = logging.getLogger(__name__)
 
+# Максимальный размер CSV-файла для импорта пар
+MAX_IMPORT_FILE_SIZE = 1024 * 1024
+
+# Сколько символов каждой категории показывать в итоге импорта
+IMPORT_SUMMARY_SYMBOLS = 30
+
 router = Router()
 
 @router.callback_query(F.data == 'pairs_management')
@@ -149,32 +165,159 @@ async def process_add_pair_threshold(message: Message, state: FSMContext, sessio
 
     await state.clear()
 
-@router.callback_query(F.data == 'list_pairs')
-async def cb_list_pairs(callback: CallbackQuery, session: AsyncSession):
-    """Просмотр списка валютных пар"""
-    # Получаем все пары из базы
-    query = select(CurrencyPair)
-    result = await session.execute(query)
-    pairs = result.scalars().all()
+@router.callback_query(F.data == 'bulk_import_pairs')
+async def cb_bulk_import_pairs(callback: CallbackQuery, state: FSMContext):
+    """Массовый импорт валютных пар"""
+    await callback.message.edit_text(
+        "📥 <b>Массовый импорт валютных пар</b>\n\n"
+        "Отправьте список символов через пробел, запятую или с новой строки "
+        "(например: BTCUSDT ETHUSDT SOLUSDT) или CSV-файл с символами в первой колонке.\n\n"
+        "Шаблон <code>*USDT</code> добавит все торгуемые пары к USDT, "
+        "<code>*USDT &gt;10000000</code> - только с объемом за 24 часа больше 10 млн USDT.\n\n"
+        "Существующие неактивные пары будут включены.",
+        reply_markup=get_back_kb('pairs_management'),
+        parse_mode='HTML'
+    )
+    await state.set_state(AdminStates.bulk_import_pairs)
+    await callback.answer()
 
-    if not pairs:
-        await callback.message.edit_text(
-            "📊 <b>Список валютных пар</b>\n\n"
-            "Пока не добавлено ни одной валютной пары.",
-            reply_markup=get_back_kb('pairs_management'),
-            parse_mode='HTML'
+def format_import_summary(summary: ImportSummary) -> str:
+    """Текст итога импорта пар"""
+    def symbols_line(title: str, symbols: List[str]) -> str:
+        line = f"{title}: {len(symbols)}"
+        if symbols:
+            shown = ', '.join(symbols[:IMPORT_SUMMARY_SYMBOLS])
+            more = f" и еще {len(symbols) - IMPORT_SUMMARY_SYMBOLS}" if len(symbols) > IMPORT_SUMMARY_SYMBOLS else ''
+            line += f"\n<code>{html.escape(shown)}</code>{more}"
+        return line
+
+    lines = [
+        "📥 <b>Импорт завершен</b>",
+        symbols_line('✅ Добавлено', summary.added),
+        symbols_line('🟢 Включено', summary.activated),
+        symbols_line('⏭ Пропущено', summary.skipped),
+        symbols_line('❌ Не найдено на Binance', summary.invalid)
+    ]
+    if summary.errors:
+        lines.append(symbols_line('⚠️ Не удалось разобрать', summary.errors))
+    return '\n\n'.join(lines)
+
+@router.message(StateFilter(AdminStates.bulk_import_pairs))
+async def process_bulk_import_pairs(message: Message, state: FSMContext, session: AsyncSession):
+    """Обработка списка или CSV-файла для импорта пар"""
+    if message.document:
+        if message.document.file_size and message.document.file_size > MAX_IMPORT_FILE_SIZE:
+            await message.answer(
+                '❌ Файл слишком большой. Максимальный размер - 1 МБ.',
+                reply_markup=get_back_kb('pairs_management')
+            )
+            return
+        content = await message.bot.download(message.document)
+        request = parse_import_csv(content.read())
+    elif message.text:
+        request = parse_import_text(message.text)
+    else:
+        request = ImportRequest()
+
+    if not request.symbols and not request.patterns:
+        await message.answer(
+            '❌ Не найдено ни одного символа. Отправьте список пар или CSV-файл.',
+            reply_markup=get_back_kb('pairs_management')
         )
-        await callback.answer()
         return
-    
-    await callback.message.edit_text(
+
+    try:
+        summary = await pair_importer.import_pairs(session, request)
+    except Exception as e:
+        logger.error(f"Ошибка при импорте пар: {str(e)}")
+        await message.answer(
+            '❌ Не удалось получить данные Binance. Попробуйте позже.',
+            reply_markup=get_back_kb('pairs_management')
+        )
+        return
+
+    await message.answer(
+        format_import_summary(summary),
+        reply_markup=get_back_kb('pairs_management'),
+        parse_mode='HTML'
+    )
+    await state.clear()
+
+async def show_pairs_page(
+        message: Message,
+        session: AsyncSession,
+        prefix: str = '',
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+        edit: bool = True
+):
+    """Показывает страницу списка валютных пар"""
+    page = await get_pairs_page(session, prefix, after=after, before=before)
+    if not page.pairs and (after is not None or before is not None):
+        # Пары на границе страницы могли удалить, начинаем с первой страницы
+        page = await get_pairs_page(session, prefix)
+
+    answer = message.edit_text if edit else message.answer
+    if not page.pairs:
+        text = (
+            f"📊 <b>Список валютных пар</b>\n\nПары, начинающиеся на {prefix}, не найдены."
+            if prefix else
+            "📊 <b>Список валютных пар</b>\n\nПока не добавлено ни одной валютной пары."
+        )
+        await answer(text, reply_markup=get_back_kb('pairs_management'), parse_mode='HTML')
+        return
+
+    search = f"Поиск: {prefix}*\n" if prefix else ''
+    await answer(
         "📊 <b>Список валютных пар</b>\n\n"
+        f"{search}"
         "Выберите пару для управления:",
-        reply_markup=get_pairs_list_kb(pairs),
+        reply_markup=get_pairs_list_kb(page),
+        parse_mode='HTML'
+    )
+
+@router.callback_query(F.data == 'list_pairs')
+async def cb_list_pairs(callback: CallbackQuery, session: AsyncSession):
+    """Просмотр списка валютных пар"""
+    await show_pairs_page(callback.message, session)
+    await callback.answer()
+
+@router.callback_query(F.data.startswith('pairs_next_') | F.data.startswith('pairs_prev_'))
+async def cb_pairs_page(callback: CallbackQuery, session: AsyncSession):
+    """Переход по страницам списка валютных пар"""
+    _, direction, prefix, symbol = callback.data.split('_', 3)
+    if direction == 'next':
+        await show_pairs_page(callback.message, session, prefix, after=symbol)
+    else:
+        await show_pairs_page(callback.message, session, prefix, before=symbol)
+    await callback.answer()
+
+@router.callback_query(F.data == 'search_pairs')
+async def cb_search_pairs(callback: CallbackQuery, state: FSMContext):
+    """Поиск валютной пары по началу символа"""
+    await callback.message.edit_text(
+        "🔍 <b>Поиск валютной пары</b>\n\n"
+        "Введите начало символа (например, BTC или ETHU):",
+        reply_markup=get_back_kb('pairs_management'),
         parse_mode='HTML'
     )
+    await state.set_state(AdminStates.search_pairs)
     await callback.answer()
 
+@router.message(StateFilter(AdminStates.search_pairs))
+async def process_search_pairs(message: Message, state: FSMContext, session: AsyncSession):
+    """Обработка ввода префикса для поиска пар"""
+    prefix = normalize_prefix(message.text)
+    if not prefix:
+        await message.answer(
+            '❌ Введите латинские буквы или цифры из символа пары. Например, BTC',
+            reply_markup=get_back_kb('pairs_management')
+        )
+        return
+
+    await state.clear()
+    await show_pairs_page(message, session, prefix, edit=False)
+
 @router.callback_query(F.data.startswith('pair_'))
 async def cb_pair_details(callback: CallbackQuery, session: AsyncSession):
     """Показать детали и действия для выбранной валютной пары"""
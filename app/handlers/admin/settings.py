@@ -6,9 +6,18 @@ from aiogram.fsm.state import default_state
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.database.models.settings import BotSettings
-from app.keyboards.admin_kb import get_settings_menu_kb, get_back_kb
+from app.keyboards.admin_kb import get_settings_menu_kb, get_back_kb, get_notification_mode_kb
 from app.utils.states import AdminStates
-from app.config import DEFAULT_DIVERGENCE_THRESHOLD, CHECK_INTERVAL
+from app.services.settings_cache import settings_cache
+from app.config import (
+    DEFAULT_DIVERGENCE_THRESHOLD,
+    CHECK_INTERVAL,
+    NOTIFICATION_MODE,
+    DIGEST_WINDOW,
+    ATTACH_CHARTS,
+    CHART_WINDOW_HOURS,
+    PRICE_HISTORY_HOURS
+)
 import logging
 
 
@@ -77,6 +86,7 @@ async def process_set_group_id(message: Message, state: FSMContext, session: Asy
         setting.value = group_id
     
     await session.commit()
+    settings_cache.invalidate()
 
     await message.answer(
         f"✅ ID группы для уведомлений успешно установлен: <code>{group_id}</code>",
@@ -143,6 +153,7 @@ async def process_set_check_interval(message: Message, state: FSMContext, sessio
         setting.value_int = interval_seconds
     
     await session.commit()
+    settings_cache.invalidate()
     
     await message.answer(
         f"✅ Интервал проверки дивергенций успешно установлен: {interval_minutes} минут",
@@ -202,6 +213,7 @@ async def process_set_default_threshold(message: Message, state: FSMContext, ses
         setting.value_float = threshold
     
     await session.commit()
+    settings_cache.invalidate()
 
     await message.answer(
         f"✅ Порог дивергенции по умолчанию успешно установлен: {threshold}%",
@@ -210,3 +222,174 @@ async def process_set_default_threshold(message: Message, state: FSMContext, ses
     
     await state.clear()
 
+
+async def show_notification_mode(callback: CallbackQuery, session: AsyncSession):
+    """Показывает текущий режим уведомлений"""
+    mode = await settings_cache.get_str(session, 'notification_mode', NOTIFICATION_MODE)
+    window = await settings_cache.get_int(session, 'digest_window', DIGEST_WINDOW)
+    attach_charts = await settings_cache.get_bool(session, 'attach_charts', ATTACH_CHARTS)
+    chart_window = await settings_cache.get_int(session, 'chart_window_hours', CHART_WINDOW_HOURS)
+
+    mode_text = '🧾 Сводка за окно' if mode == 'digest' else '✉️ Отдельные сообщения'
+    charts_text = f"за {chart_window} ч" if attach_charts else 'не прикладываются'
+
+    await callback.message.edit_text(
+        "🧾 <b>Режим уведомлений</b>\n\n"
+        f"Текущий режим: {mode_text}\n"
+        f"Окно сводки: {window} секунд\n"
+        f"Графики: {charts_text}\n\n"
+        "В режиме сводки дивергенции, найденные в пределах окна, отправляются "
+        "одним сообщением в виде таблицы. Графики показывают цены пар и их "
+        "соотношение, в сводке - для крупнейшей дивергенции.",
+        reply_markup=get_notification_mode_kb(mode, attach_charts),
+        parse_mode='HTML'
+    )
+
+
+@router.callback_query(F.data == 'notification_mode')
+async def cb_notification_mode(callback: CallbackQuery, session: AsyncSession):
+    """Настройка режима уведомлений"""
+    await show_notification_mode(callback, session)
+    await callback.answer()
+
+
+@router.callback_query(F.data.startswith('set_notification_mode_'))
+async def cb_set_notification_mode(callback: CallbackQuery, session: AsyncSession):
+    """Переключение режима уведомлений"""
+    mode = callback.data.split('_')[-1]
+
+    query = select(BotSettings).where(BotSettings.key == 'notification_mode')
+    result = await session.execute(query)
+    setting = result.scalar_one_or_none()
+
+    if setting is None:
+        setting = BotSettings(key='notification_mode', value=mode)
+        session.add(setting)
+    else:
+        setting.value = mode
+
+    await session.commit()
+    settings_cache.invalidate()
+
+    await show_notification_mode(callback, session)
+    await callback.answer('✅ Режим уведомлений изменен')
+
+
+@router.callback_query(F.data == 'toggle_attach_charts')
+async def cb_toggle_attach_charts(callback: CallbackQuery, session: AsyncSession):
+    """Включение и отключение графиков в уведомлениях"""
+    attach_charts = not await settings_cache.get_bool(session, 'attach_charts', ATTACH_CHARTS)
+
+    query = select(BotSettings).where(BotSettings.key == 'attach_charts')
+    result = await session.execute(query)
+    setting = result.scalar_one_or_none()
+
+    if setting is None:
+        setting = BotSettings(key='attach_charts', value_bool=attach_charts)
+        session.add(setting)
+    else:
+        setting.value_bool = attach_charts
+
+    await session.commit()
+    settings_cache.invalidate()
+
+    await show_notification_mode(callback, session)
+    await callback.answer('✅ Графики включены' if attach_charts else '✅ Графики отключены')
+
+
+@router.callback_query(F.data == 'set_digest_window')
+async def cb_set_digest_window(callback: CallbackQuery, state: FSMContext):
+    """Настройка окна сводки"""
+    await callback.message.edit_text(
+        "⏳ <b>Настройка окна сводки</b>\n\n"
+        "Пожалуйста, введите окно накопления дивергенций в секундах (от 10 до 3600):",
+        reply_markup=get_back_kb('notification_mode'),
+        parse_mode='HTML'
+    )
+
+    await state.set_state(AdminStates.set_digest_window)
+    await callback.answer()
+
+
+@router.message(StateFilter(AdminStates.set_digest_window))
+async def process_set_digest_window(message: Message, state: FSMContext, session: AsyncSession):
+    """Обработка ввода окна сводки"""
+    try:
+        window = int(message.text.strip())
+        if window < 10 or window > 3600:
+            raise ValueError('Окно должно быть от 10 до 3600 секунд')
+    except ValueError:
+        await message.answer(
+            "❌ Пожалуйста, введите целое число от 10 до 3600.",
+            reply_markup=get_back_kb('notification_mode')
+        )
+        return
+
+    query = select(BotSettings).where(BotSettings.key == 'digest_window')
+    result = await session.execute(query)
+    setting = result.scalar_one_or_none()
+
+    if setting is None:
+        setting = BotSettings(key='digest_window', value_int=window)
+        session.add(setting)
+    else:
+        setting.value_int = window
+
+    await session.commit()
+    settings_cache.invalidate()
+
+    await message.answer(
+        f"✅ Окно сводки успешно установлено: {window} секунд",
+        reply_markup=get_back_kb('notification_mode')
+    )
+
+    await state.clear()
+
+
+@router.callback_query(F.data == 'set_chart_window')
+async def cb_set_chart_window(callback: CallbackQuery, state: FSMContext):
+    """Настройка периода графика"""
+    await callback.message.edit_text(
+        "🕒 <b>Настройка периода графика</b>\n\n"
+        f"Пожалуйста, введите период графика в часах (от 1 до {PRICE_HISTORY_HOURS}):",
+        reply_markup=get_back_kb('notification_mode'),
+        parse_mode='HTML'
+    )
+
+    await state.set_state(AdminStates.set_chart_window)
+    await callback.answer()
+
+
+@router.message(StateFilter(AdminStates.set_chart_window))
+async def process_set_chart_window(message: Message, state: FSMContext, session: AsyncSession):
+    """Обработка ввода периода графика"""
+    try:
+        hours = int(message.text.strip())
+        if hours < 1 or hours > PRICE_HISTORY_HOURS:
+            raise ValueError('Период не может превышать срок хранения истории цен')
+    except ValueError:
+        await message.answer(
+            f"❌ Пожалуйста, введите целое число от 1 до {PRICE_HISTORY_HOURS}.",
+            reply_markup=get_back_kb('notification_mode')
+        )
+        return
+
+    query = select(BotSettings).where(BotSettings.key == 'chart_window_hours')
+    result = await session.execute(query)
+    setting = result.scalar_one_or_none()
+
+    if setting is None:
+        setting = BotSettings(key='chart_window_hours', value_int=hours)
+        session.add(setting)
+    else:
+        setting.value_int = hours
+
+    await session.commit()
+    settings_cache.invalidate()
+
+    await message.answer(
+        f"✅ Период графика успешно установлен: {hours} ч",
+        reply_markup=get_back_kb('notification_mode')
+    )
+
+    await state.clear()
@@ -0,0 +1,133 @@
+import logging
+from aiogram import Router
+from aiogram.types import Message
+from aiogram.filters import Command, CommandObject
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.database.models import Subscription
+from app.services.subscriptions import subscription_registry
+
+logger = logging.getLogger(__name__)
+
+router = Router()
+
+SUBSCRIBE_USAGE = (
+    "Использование:\n"
+    "<code>/subscribe CHAT_ID [min=3.5] [pairs=BTCUSDT,ETHUSDT] [quiet=22-7]</code>\n\n"
+    "min - минимальная дивергенция в процентах, pairs - пары через запятую "
+    "(по умолчанию все), quiet - тихие часы по UTC."
+)
+
+
+def format_subscription(subscription: Subscription) -> str:
+    """Форматирует подписку для вывода в списке"""
+    pairs = subscription.symbols or 'все пары'
+    quiet = ''
+    if subscription.quiet_hours_start is not None and subscription.quiet_hours_end is not None:
+        quiet = f", тихие часы {subscription.quiet_hours_start}-{subscription.quiet_hours_end} UTC"
+    return (
+        f"#{subscription.id} чат <code>{subscription.chat_id}</code>: {pairs}, "
+        f"от {subscription.min_divergence or 0:g}%{quiet}"
+    )
+
+
+@router.message(Command('subscriptions'))
+async def cmd_subscriptions(message: Message, session: AsyncSession, is_admin: bool = False):
+    """Список подписок на уведомления"""
+    if not is_admin:
+        await message.answer('⛔ У вас нет доступа к этой команде.')
+        return
+
+    query = select(Subscription).where(Subscription.is_active == True).order_by(Subscription.id)
+    result = await session.execute(query)
+    subscriptions = result.scalars().all()
+
+    if not subscriptions:
+        await message.answer(
+            "📬 <b>Подписки на уведомления</b>\n\n"
+            "Подписок пока нет.\n\n" + SUBSCRIBE_USAGE,
+            parse_mode='HTML'
+        )
+        return
+
+    lines = [format_subscription(subscription) for subscription in subscriptions]
+    await message.answer(
+        "📬 <b>Подписки на уведомления</b>\n\n" + '\n'.join(lines) +
+        "\n\nУдалить подписку: <code>/unsubscribe ID</code>",
+        parse_mode='HTML'
+    )
+
+
+@router.message(Command('subscribe'))
+async def cmd_subscribe(message: Message, command: CommandObject, session: AsyncSession, is_admin: bool = False):
+    """Добавление подписки чата на уведомления"""
+    if not is_admin:
+        await message.answer('⛔ У вас нет доступа к этой команде.')
+        return
+
+    args = (command.args or '').split()
+    try:
+        chat_id = int(args[0])
+        options = dict(arg.split('=', 1) for arg in args[1:])
+
+        min_divergence = float(options.get('min', '0').replace(',', '.'))
+        if min_divergence < 0:
+            raise ValueError('Порог не может быть отрицательным')
+
+        symbols = None
+        if options.get('pairs'):
+            symbols = ','.join(symbol.strip().upper() for symbol in options['pairs'].split(',') if symbol.strip())
+
+        quiet_start = quiet_end = None
+        if options.get('quiet'):
+            quiet_start, quiet_end = (int(hour) for hour in options['quiet'].split('-'))
+            if not (0 <= quiet_start <= 23 and 0 <= quiet_end <= 23):
+                raise ValueError('Часы должны быть от 0 до 23')
+    except (IndexError, ValueError):
+        await message.answer('❌ Неверный формат команды.\n\n' + SUBSCRIBE_USAGE, parse_mode='HTML')
+        return
+
+    subscription = Subscription(
+        chat_id=chat_id,
+        symbols=symbols,
+        min_divergence=min_divergence,
+        quiet_hours_start=quiet_start,
+        quiet_hours_end=quiet_end,
+        is_active=True
+    )
+    session.add(subscription)
+    await session.commit()
+    subscription_registry.invalidate()
+
+    await message.answer(
+        f"✅ Подписка добавлена:\n{format_subscription(subscription)}",
+        parse_mode='HTML'
+    )
+
+
+@router.message(Command('unsubscribe'))
+async def cmd_unsubscribe(message: Message, command: CommandObject, session: AsyncSession, is_admin: bool = False):
+    """Удаление подписки"""
+    if not is_admin:
+        await message.answer('⛔ У вас нет доступа к этой команде.')
+        return
+
+    try:
+        subscription_id = int((command.args or '').strip().lstrip('#'))
+    except ValueError:
+        await message.answer('❌ Укажите ID подписки: <code>/unsubscribe ID</code>', parse_mode='HTML')
+        return
+
+    query = select(Subscription).where(Subscription.id == subscription_id)
+    result = await session.execute(query)
+    subscription = result.scalar_one_or_none()
+
+    if not subscription:
+        await message.answer('❌ Подписка не найдена.')
+        return
+
+    await session.delete(subscription)
+    await session.commit()
+    subscription_registry.invalidate()
+
+    await message.answer(f"✅ Подписка #{subscription_id} удалена.")
@@ -1,7 +1,7 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from typing import List, Union, Dict, Optional
-from app.database.models import CurrencyPair
+from app.services.pairs import PairsPage
 
 def get_admin_main_menu() -> InlineKeyboardMarkup:
     """Создает главное меню админ-панели"""
@@ -11,6 +11,7 @@ def get_admin_main_menu() -> InlineKeyboardMarkup:
     kb.button(text='📊 Управление валютными парами', callback_data='pairs_management')
     kb.button(text='⚙️ Настройки', callback_data='bot_settings')
     kb.button(text='📈 Статистика', callback_data='show_stats')
+    kb.button(text='🗂 История дивергенций', callback_data='divergence_history')
 
     # Располагаем кнопки в столбик
     kb.adjust(1)
@@ -28,6 +29,7 @@ def get_bot_control_kb(is_active: bool) -> InlineKeyboardMarkup:
         kb.button(text='🟢 Запустить бота', callback_data='bot_activate')
     
     kb.button(text='📈 Статистика', callback_data='show_stats')
+    kb.button(text='🔬 Профилирование циклов', callback_data='profiling')
     kb.button(text='🔙 Назад', callback_data='admin_main_menu')
 
     kb.adjust(1)
@@ -35,12 +37,27 @@ def get_bot_control_kb(is_active: bool) -> InlineKeyboardMarkup:
     return kb.as_markup()
 
 
+def get_profiling_kb() -> InlineKeyboardMarkup:
+    """Создает клавиатуру выбора режима профилирования"""
+    kb = InlineKeyboardBuilder()
+
+    kb.button(text='⏱ cProfile (все вызовы)', callback_data='profile_cprofile')
+    kb.button(text='📸 Сэмплирование (flamegraph)', callback_data='profile_sampling')
+    kb.button(text='🔙 Назад', callback_data='bot_control')
+
+    kb.adjust(1)
+
+    return kb.as_markup()
+
+
 def get_pairs_menu_kb() -> InlineKeyboardMarkup:
     """Создает клавиатуру для меню управления валютными парами"""
     kb = InlineKeyboardBuilder()
 
     kb.button(text='➕ Добавить валютную пару', callback_data='add_pair')
+    kb.button(text='📥 Массовый импорт', callback_data='bulk_import_pairs')
     kb.button(text='📋 Список валютных пар', callback_data='list_pairs')
+    kb.button(text='🔍 Поиск по символу', callback_data='search_pairs')
     kb.button(text='🔙 Назад', callback_data='admin_main_menu')
 
     kb.adjust(1)
@@ -55,6 +72,7 @@ def get_settings_menu_kb() -> InlineKeyboardMarkup:
     kb.button(text='📢 ID группы для уведомлений', callback_data='set_group_id')
     kb.button(text='⏱ Интервал проверки', callback_data='set_check_interval')
     kb.button(text='📊 Порог дивергенции по умолчанию', callback_data='set_default_threshold')
+    kb.button(text='🧾 Режим уведомлений', callback_data='notification_mode')
     kb.button(text='🔙 Назад', callback_data='admin_main_menu')
 
     kb.adjust(1)
@@ -62,6 +80,30 @@ def get_settings_menu_kb() -> InlineKeyboardMarkup:
     return kb.as_markup()
 
 
+def get_notification_mode_kb(mode: str, attach_charts: bool = False) -> InlineKeyboardMarkup:
+    """Создает клавиатуру для выбора режима уведомлений"""
+    kb = InlineKeyboardBuilder()
+
+    if mode == 'digest':
+        kb.button(text='✉️ Отдельные сообщения', callback_data='set_notification_mode_single')
+    else:
+        kb.button(text='🧾 Сводка за окно', callback_data='set_notification_mode_digest')
+
+    kb.button(text='⏳ Окно сводки', callback_data='set_digest_window')
+
+    if attach_charts:
+        kb.button(text='🖼 Отключить графики', callback_data='toggle_attach_charts')
+    else:
+        kb.button(text='🖼 Прикладывать графики', callback_data='toggle_attach_charts')
+
+    kb.button(text='🕒 Период графика', callback_data='set_chart_window')
+    kb.button(text='🔙 Назад', callback_data='bot_settings')
+
+    kb.adjust(1)
+
+    return kb.as_markup()
+
+
 def get_back_kb(callback_data: str) -> InlineKeyboardMarkup:
     """Создает клавиатуру с кнопкой 'Назад'"""
     kb = InlineKeyboardBuilder()
@@ -69,23 +111,56 @@ def get_back_kb(callback_data: str) -> InlineKeyboardMarkup:
     return kb.as_markup()
 
 
-def get_pairs_list_kb(pairs: List[CurrencyPair]) -> InlineKeyboardMarkup:
-    """Создает клавиатуру со списком валютных пар"""
+def get_pairs_list_kb(page: PairsPage) -> InlineKeyboardMarkup:
+    """Создает клавиатуру со страницей списка валютных пар"""
     kb = InlineKeyboardBuilder()
 
-    # Сортируем пары: сначала активные, потом неактивные
-    sorted_pairs = sorted(pairs, key=lambda p: (not p.is_active, p.symbol))
-
-    for pair in sorted_pairs:
+    for pair in page.pairs:
         status_emoji = '🟢' if pair.is_active else '🔴'
         kb.button(
             text=f'{status_emoji} {pair.symbol}',
             callback_data=f'pair_{pair.id}'
         )
-    
+
+    # Переходы по страницам хранят префикс поиска и граничный символ страницы
+    navigation = 0
+    if page.has_prev:
+        kb.button(text='⬅️ Назад', callback_data=f'pairs_prev_{page.prefix}_{page.first_symbol}')
+        navigation += 1
+    if page.has_next:
+        kb.button(text='Вперед ➡️', callback_data=f'pairs_next_{page.prefix}_{page.last_symbol}')
+        navigation += 1
+
+    kb.button(text='🔍 Поиск по символу', callback_data='search_pairs')
     kb.button(text='🔙 Назад', callback_data='pairs_management')
 
-    kb.adjust(1)
+    sizes = [1] * len(page.pairs)
+    if navigation:
+        sizes.append(navigation)
+    kb.adjust(*sizes, 1, 1)
+
+    return kb.as_markup()
+
+
+def get_history_kb(has_newer: bool, has_older: bool) -> InlineKeyboardMarkup:
+    """Создает клавиатуру страницы истории дивергенций"""
+    kb = InlineKeyboardBuilder()
+
+    navigation = 0
+    if has_newer:
+        kb.button(text='⬅️ Новее', callback_data='history_newer')
+        navigation += 1
+    if has_older:
+        kb.button(text='Старее ➡️', callback_data='history_older')
+        navigation += 1
+
+    kb.button(text='📄 Выгрузить в CSV', callback_data='history_export')
+    kb.button(text='🔙 Назад', callback_data='admin_main_menu')
+
+    if navigation:
+        kb.adjust(navigation, 1, 1)
+    else:
+        kb.adjust(1)
 
     return kb.as_markup()
 
@@ -2,9 +2,8 @@ from typing import Dict, Any, Callable, Awaitable
 from aiogram import BaseMiddleware
 from aiogram.types import Message, CallbackQuery
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
-from app.database.models import Admin
 from app.config import SUPERADMIN_IDS
+from app.services.admin_cache import admin_cache
 
 class AdminMiddleware(BaseMiddleware):
     """Middleware для проверки прав администратора"""
@@ -37,10 +36,8 @@ class AdminMiddleware(BaseMiddleware):
             data['is_superadmin'] = False
             return await handler(event, data)
 
-        # Проверяем, есть ли пользователь в базе админов
-        query = select(Admin).where(Admin.user_id == user_id)
-        result = await session.execute(query)
-        admin = result.scalar_one_or_none()
+        # Проверяем, есть ли пользователь в кэше админов (БД - только при обновлении кэша)
+        admin = await admin_cache.get(session, user_id)
 
         if admin and admin.is_active:
             data['is_admin'] = True
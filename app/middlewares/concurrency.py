@@ -0,0 +1,36 @@
+import asyncio
+from typing import Dict, Any, Callable, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from app.utils.metrics import REGISTRY
+
+UPDATES_TOTAL = REGISTRY.counter('telegram_updates_total', 'Обработанные обновления Telegram')
+UPDATES_IN_PROGRESS = REGISTRY.gauge('telegram_updates_in_progress', 'Обновления в обработке')
+UPDATES_WAITING = REGISTRY.gauge('telegram_updates_waiting', 'Обновления, ожидающие свободного слота')
+
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    """Middleware, ограничивающее количество одновременно обрабатываемых обновлений"""
+
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        UPDATES_WAITING.inc()
+        try:
+            await self.semaphore.acquire()
+        finally:
+            UPDATES_WAITING.dec()
+
+        UPDATES_IN_PROGRESS.inc()
+        try:
+            return await handler(event, data)
+        finally:
+            UPDATES_IN_PROGRESS.dec()
+            UPDATES_TOTAL.inc()
+            self.semaphore.release()
@@ -0,0 +1,78 @@
+from typing import Dict, Any, Callable, Awaitable, Optional
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.database.query_counter import QueryCounter
+from app.utils.metrics import REGISTRY
+
+UPDATES_WITH_DB = REGISTRY.counter('telegram_updates_with_db_total', 'Обновления, которым понадобилась сессия БД')
+UPDATES_WITHOUT_DB = REGISTRY.counter('telegram_updates_without_db_total', 'Обновления, обработанные без обращения к БД')
+
+
+class LazySession:
+    """
+    Ленивая сессия БД для обработчика
+
+    Настоящая AsyncSession создается при первом обращении к любому атрибуту,
+    поэтому обработчики, которые не работают с БД, не занимают соединение пула.
+    """
+
+    def __init__(self, session_factory: async_sessionmaker):
+        self._session_factory = session_factory
+        self._session: Optional[AsyncSession] = None
+
+    @property
+    def is_used(self) -> bool:
+        """Была ли сессия создана"""
+        return self._session is not None
+
+    def _get_session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._session_factory()
+        return self._session
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get_session(), name)
+
+    async def finish(self, success: bool) -> None:
+        """Завершает транзакцию (commit при успехе, иначе rollback) и закрывает сессию"""
+        session, self._session = self._session, None
+        if session is None:
+            return
+        try:
+            if session.in_transaction():
+                if success:
+                    await session.commit()
+                else:
+                    await session.rollback()
+        finally:
+            await session.close()
+
+
+class AsyncSessionMiddleware(BaseMiddleware):
+    """Middleware для внедрения ленивой сессии БД"""
+
+    def __init__(self, session_factory: async_sessionmaker):
+        self.session_factory = session_factory
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any]
+    ) -> Any:
+        session = LazySession(self.session_factory)
+        data['session'] = session
+        success = False
+        # Запросы считаются за все обновление, повторы (N+1) попадают в лог
+        with QueryCounter('update'):
+            try:
+                result = await handler(event, data)
+                success = True
+                return result
+            finally:
+                if session.is_used:
+                    UPDATES_WITH_DB.inc()
+                else:
+                    UPDATES_WITHOUT_DB.inc()
+                await session.finish(success)
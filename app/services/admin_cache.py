@@ -0,0 +1,81 @@
+import time
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.database.models import Admin
+from app.config import ADMIN_CACHE_TTL, ADMINS_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AdminRecord:
+    """Администратор в виде, не привязанном к сессии БД"""
+    user_id: int
+    username: Optional[str]
+    is_superadmin: bool
+    is_active: bool
+
+    @classmethod
+    def from_model(cls, admin: Admin) -> 'AdminRecord':
+        return cls(
+            user_id=admin.user_id,
+            username=admin.username,
+            is_superadmin=bool(admin.is_superadmin),
+            is_active=bool(admin.is_active)
+        )
+
+
+class AdminCache:
+    """
+    Кэш администраторов для проверки прав
+
+    Все администраторы загружаются одним запросом при запуске, после чего
+    проверка прав на каждое обновление - обращение к словарю. Кэш обновляется
+    по TTL, при изменениях в этом процессе и по NOTIFY от других реплик.
+    """
+
+    def __init__(self, ttl: float = ADMIN_CACHE_TTL):
+        self.ttl = ttl
+        self._admins: Dict[int, AdminRecord] = {}
+        self._loaded_at: Optional[float] = None
+
+    def invalidate(self) -> None:
+        """Сбрасывает кэш, следующее обращение загрузит администраторов заново"""
+        self._loaded_at = None
+
+    async def on_notify(self, user_ids: List[int]) -> None:
+        """Обработчик NOTIFY об изменении администраторов"""
+        self.invalidate()
+
+    async def load(self, session: AsyncSession) -> None:
+        """Загружает всех администраторов из БД"""
+        result = await session.execute(select(Admin))
+        self._admins = {admin.user_id: AdminRecord.from_model(admin) for admin in result.scalars().all()}
+        self._loaded_at = time.monotonic()
+
+    async def get(self, session: AsyncSession, user_id: int) -> Optional[AdminRecord]:
+        """Возвращает администратора по ID пользователя, при необходимости обновляя кэш"""
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            await self.load(session)
+        return self._admins.get(user_id)
+
+    def put(self, admin: Admin) -> None:
+        """Обновляет запись после изменения администратора в этом процессе"""
+        self._admins[admin.user_id] = AdminRecord.from_model(admin)
+
+
+async def publish_admins_changed(session: AsyncSession, user_id: int, channel: str = ADMINS_CHANNEL) -> None:
+    """Сообщает другим репликам об изменении администратора (доставляется после commit)"""
+    if session.get_bind().dialect.name != 'postgresql':
+        return
+    await session.execute(
+        text('SELECT pg_notify(:channel, :payload)'),
+        {'channel': channel, 'payload': str(user_id)}
+    )
+
+
+admin_cache = AdminCache()
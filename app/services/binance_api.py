@@ -2,16 +2,28 @@ import aiohttp
 import time
 import hmac
 import hashlib
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Set, Tuple, Any
 import logging
-from app.config import BINANCE_API_KEY, BINANCE_API_SECRET
+from app.config import BINANCE_API_KEY, BINANCE_API_SECRET, EXCHANGE_INFO_CACHE_TTL
+from app.utils.metrics import REGISTRY
+from app.utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
+REQUEST_SECONDS = REGISTRY.histogram('binance_request_seconds', 'Длительность запросов к Binance API')
+REQUESTS = REGISTRY.counter('binance_requests_total', 'Запросы к Binance API по кодам ответа')
+REQUEST_ERRORS = REGISTRY.counter('binance_request_errors_total', 'Ошибки запросов к Binance API')
+USED_WEIGHT = REGISTRY.gauge('binance_used_weight_1m', 'Использованный вес запросов за минуту (X-MBX-USED-WEIGHT-1M)')
+
 class BinanceAPI:
     '''Клас для работы с Binance API'''
     BASE_URL = 'https://api.binance.com'
 
+    # Кэш exchangeInfo общий для всех экземпляров клиента
+    _exchange_info: Optional[Dict] = None
+    _exchange_symbols: Set[str] = set()
+    _exchange_info_loaded_at: Optional[float] = None
+
     def __init__(self, api_key: str = BINANCE_API_KEY, api_secret: str = BINANCE_API_SECRET):
         self.api_key = api_key
         self.api_secret = api_secret
@@ -41,18 +53,32 @@ class BinanceAPI:
             ).hexdigest()
             params['signature'] = signature
 
+        started = time.perf_counter()
+        span = tracer.start_span('binance.request', method=method, endpoint=endpoint)
+        error_reason = None
         try:
             async with aiohttp.ClientSession() as session:
                 async with session.request(method=method, url=url, params=params, headers=headers, timeout=timeout) as response:
+                    REQUESTS.inc(endpoint=endpoint, status=response.status)
+                    span.set(http_status=response.status)
+                    used_weight = response.headers.get('X-MBX-USED-WEIGHT-1M')
+                    if used_weight is not None:
+                        USED_WEIGHT.set(float(used_weight))
                     if response.status == 200:
                         return await response.json()
                     else:
                         error_text = await response.text()
+                        error_reason = 'status'
                         logger.error(f' Binance API error: {response.status}, {error_text}')
                         raise Exception(f'Binance API error: {response.status}, {error_text}')
         except Exception as e:
+            REQUEST_ERRORS.inc(endpoint=endpoint, reason=error_reason or type(e).__name__)
+            span.record_error(e)
             logger.error(f'Error making request to Binance: {str(e)}')
             raise
+        finally:
+            REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+            span.end()
 
     async def get_ticker_price(self, symbol: str) -> Dict:
         '''Получает текущую цену для валютной парой'''
@@ -70,21 +96,59 @@ class BinanceAPI:
             return [item for item in result if item['symbol'] in symbols]
         return result
 
-    async def get_exchange_info(self) -> Dict:
-        """Получает информацию о доступных валютных парах"""
-        endpoint = "/api/v3/exchangeInfo"
+    async def get_24hr_tickers(self) -> List[Dict]:
+        """Получает статистику за 24 часа (объемы торгов) по всем валютным парам"""
+        endpoint = '/api/v3/ticker/24hr'
         return await self._make_request('GET', endpoint)
+
+    async def get_klines(
+        self,
+        symbol: str,
+        interval: str = '5m',
+        limit: int = 500,
+        end_time: Optional[int] = None
+    ) -> List[List[Any]]:
+        """Получает свечи валютной пары (время открытия, OHLC, объем, время закрытия, ...)"""
+        endpoint = '/api/v3/klines'
+        params = {'symbol': symbol, 'interval': interval, 'limit': limit}
+        if end_time is not None:
+            params['endTime'] = end_time
+        return await self._make_request('GET', endpoint, params)
+
+    async def get_exchange_info(self, use_cache: bool = True) -> Dict:
+        """
+        Получает информацию о доступных валютных парах
+
+        Ответ весит несколько мегабайт, поэтому он кэшируется на EXCHANGE_INFO_CACHE_TTL
+        """
+        cls = type(self)
+        loaded_at = cls._exchange_info_loaded_at
+        if use_cache and loaded_at is not None and time.monotonic() - loaded_at < EXCHANGE_INFO_CACHE_TTL:
+            return cls._exchange_info
+
+        endpoint = "/api/v3/exchangeInfo"
+        exchange_info = await self._make_request('GET', endpoint)
+
+        cls._exchange_info = exchange_info
+        cls._exchange_symbols = {pair['symbol'] for pair in exchange_info.get('symbols', [])}
+        cls._exchange_info_loaded_at = time.monotonic()
+        return exchange_info
     
     async def get_available_pairs(self) -> List[Dict]:
         """Возвращает список доступных валютных пар"""
         exchange_info = await self.get_exchange_info()
         return exchange_info.get('symbols', [])
 
+    async def get_available_symbols(self) -> Set[str]:
+        """Возвращает множество символов доступных валютных пар"""
+        await self.get_exchange_info()
+        return type(self)._exchange_symbols
+
     async def validate_pair(self, symbol: str) -> bool:
         """Проверяет существование валютной пары на бирже"""
         try:
-            pairs = await self.get_available_pairs()
-            return any(pair['symbol'] == symbol for pair in pairs)
+            symbols = await self.get_available_symbols()
+            return symbol in symbols
         except Exception as e:
             logger.error(f'Error validating pair {symbol}: {str(e)}')
             return False
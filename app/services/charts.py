@@ -0,0 +1,210 @@
+import asyncio
+import io
+import logging
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from importlib.util import find_spec
+from typing import Dict, List, Optional, Tuple
+from app.config import CHART_WORKERS, CHART_CACHE_SIZE
+from app.services.binance_api import BinanceAPI
+from app.services.price_history import PriceHistory, price_history, align_series
+from app.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CHARTS_RENDERED = REGISTRY.counter('charts_rendered_total', 'Отрисованные графики')
+CHART_CACHE_HITS = REGISTRY.counter('chart_cache_hits_total', 'Графики, взятые из кэша')
+CHART_ERRORS = REGISTRY.counter('chart_errors_total', 'Ошибки отрисовки графиков')
+
+# (пара 1, пара 2, период в часах, минута обнаружения)
+ChartKey = Tuple[str, str, int, int]
+
+
+def render_ratio_chart(
+        symbol1: str,
+        symbol2: str,
+        timestamps: List[float],
+        prices1: List[float],
+        prices2: List[float],
+        window_hours: int
+) -> bytes:
+    """
+    Рисует нормализованные цены двух пар и их соотношение, возвращает PNG
+
+    Выполняется в отдельном процессе, поэтому принимает только простые типы
+    и импортирует matplotlib внутри.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot as plt
+    from matplotlib import dates as mdates
+
+    times = [datetime.fromtimestamp(timestamp, tz=timezone.utc) for timestamp in timestamps]
+    normalized1 = [price / prices1[0] * 100 for price in prices1]
+    normalized2 = [price / prices2[0] * 100 for price in prices2]
+    ratio = [price1 / price2 for price1, price2 in zip(prices1, prices2)]
+
+    figure, (prices_ax, ratio_ax) = plt.subplots(
+        2, 1, figsize=(8, 5), dpi=100, sharex=True, gridspec_kw={'height_ratios': [3, 2]}
+    )
+    try:
+        prices_ax.plot(times, normalized1, label=symbol1, linewidth=1.2)
+        prices_ax.plot(times, normalized2, label=symbol2, linewidth=1.2)
+        prices_ax.set_title(f'{symbol1} / {symbol2}, {window_hours} ч (UTC)')
+        prices_ax.set_ylabel('Цена, % от начала')
+        prices_ax.legend(loc='upper left')
+        prices_ax.grid(alpha=0.3)
+
+        ratio_ax.plot(times, ratio, color='tab:purple', linewidth=1.2)
+        ratio_ax.set_ylabel('Соотношение')
+        ratio_ax.grid(alpha=0.3)
+        ratio_ax.xaxis.set_major_formatter(mdates.DateFormatter('%d.%m %H:%M'))
+
+        figure.autofmt_xdate()
+        figure.tight_layout()
+
+        buffer = io.BytesIO()
+        figure.savefig(buffer, format='png')
+        return buffer.getvalue()
+    finally:
+        plt.close(figure)
+
+
+class ChartRenderer:
+    """
+    Отрисовка графиков к уведомлениям о дивергенциях
+
+    Графики рисуются в пуле процессов, поэтому не блокируют цикл событий.
+    Готовые изображения кэшируются по (пара, период, минута обнаружения),
+    так что сводка и рассылка в несколько чатов используют один график, а
+    одновременные запросы одного графика ждут одну отрисовку.
+    """
+
+    def __init__(
+            self,
+            history: PriceHistory = price_history,
+            workers: int = CHART_WORKERS,
+            cache_size: int = CHART_CACHE_SIZE
+    ):
+        self.history = history
+        self.workers = workers
+        self.cache_size = cache_size
+        self.binance_api = BinanceAPI()
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cache: 'OrderedDict[ChartKey, bytes]' = OrderedDict()
+        self._pending: Dict[ChartKey, asyncio.Task] = {}
+        self._available: Optional[bool] = None
+
+    @property
+    def available(self) -> bool:
+        """Установлен ли matplotlib"""
+        if self._available is None:
+            self._available = find_spec('matplotlib') is not None
+            if not self._available:
+                logger.warning('matplotlib не установлен, графики к уведомлениям отключены')
+        return self._available
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn не копирует в дочерние процессы состояние цикла событий и потоков
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    async def get_chart(
+            self,
+            symbol1: str,
+            symbol2: str,
+            detected_at: datetime,
+            window_hours: int,
+            prices: Optional[Tuple[float, float]] = None
+    ) -> Optional[bytes]:
+        """
+        Возвращает PNG графика пар за window_hours до момента обнаружения
+
+        prices - цены пар в момент обнаружения, дополняют историю последней
+        точкой. Возвращает None, если график построить не удалось.
+        """
+        if not self.available:
+            return None
+
+        if detected_at.tzinfo is None:
+            detected_at = detected_at.replace(tzinfo=timezone.utc)
+        key = (symbol1, symbol2, window_hours, int(detected_at.timestamp() // 60))
+        chart = self._cache.get(key)
+        if chart is not None:
+            self._cache.move_to_end(key)
+            CHART_CACHE_HITS.inc()
+            return chart
+
+        task = self._pending.get(key)
+        if task is None:
+            task = asyncio.create_task(self._render(key, detected_at, prices))
+            self._pending[key] = task
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+        # shield - отмена одного ожидающего не отменяет отрисовку для остальных
+        return await asyncio.shield(task)
+
+    async def _render(
+            self,
+            key: ChartKey,
+            detected_at: datetime,
+            prices: Optional[Tuple[float, float]]
+    ) -> Optional[bytes]:
+        symbol1, symbol2, window_hours, minute = key
+        until = (minute + 1) * 60
+        since = until - window_hours * 3600
+
+        try:
+            await asyncio.gather(
+                self.history.backfill(self.binance_api, symbol1, window_hours, until),
+                self.history.backfill(self.binance_api, symbol2, window_hours, until)
+            )
+        except Exception as e:
+            # Рисуем по тому, что уже есть в истории
+            logger.warning(f"Не удалось догрузить историю цен {symbol1}/{symbol2}: {str(e)}")
+
+        first = self.history.get(symbol1, since, until)
+        second = self.history.get(symbol2, since, until)
+        if prices is not None:
+            first.append((detected_at.timestamp(), prices[0]))
+            second.append((detected_at.timestamp(), prices[1]))
+            first.sort()
+            second.sort()
+
+        timestamps, prices1, prices2 = align_series(first, second)
+        if len(timestamps) < 2:
+            logger.info(f"Недостаточно истории цен для графика {symbol1}/{symbol2}")
+            return None
+
+        try:
+            loop = asyncio.get_running_loop()
+            chart = await loop.run_in_executor(
+                self._get_executor(),
+                render_ratio_chart,
+                symbol1, symbol2, timestamps, prices1, prices2, window_hours
+            )
+        except Exception as e:
+            CHART_ERRORS.inc()
+            logger.error(f"Ошибка при отрисовке графика {symbol1}/{symbol2}: {str(e)}")
+            return None
+
+        CHARTS_RENDERED.inc()
+        self._cache[key] = chart
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return chart
+
+    def shutdown(self) -> None:
+        """Останавливает процессы отрисовки"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+chart_renderer = ChartRenderer()
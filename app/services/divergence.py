@@ -1,14 +1,67 @@
-from typing import List, Dict, Tuple, Optional
+from typing import Awaitable, Callable, FrozenSet, Iterable, List, Dict, Set, Tuple, Optional
 import logging
 from datetime import datetime, timedelta, timezone
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import and_, or_
+from sqlalchemy import Select, and_, insert, or_, update
 from app.database.models import CurrencyPair, Divergence
 from app.services.binance_api import BinanceAPI
+from app.services.leader import shard_of
+from app.services.price_history import price_history
+from app.services.rollups import update_hourly_rollup
+from app.utils.metrics import REGISTRY
+from app.utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
+PAIRS_EVALUATED = REGISTRY.counter('detector_pairs_evaluated_total', 'Проверенные комбинации валютных пар')
+DIVERGENCES_FOUND = REGISTRY.counter('detector_divergences_found_total', 'Обнаруженные дивергенции')
+
+
+def active_pairs_query() -> Select:
+    """Запрос активных валютных пар (частичный индекс ix_currency_pairs_active)"""
+    return select(CurrencyPair).where(CurrencyPair.is_active == True)
+
+
+def recent_divergence_query(pair1_id: int, pair2_id: int, since: datetime) -> Select:
+    """
+    Запрос дивергенции между парами в любом направлении после момента since
+
+    Обе ветки условия обслуживает индекс ix_divergences_pair_detected
+    """
+    return (
+        select(Divergence.id)
+        .where(
+            and_(
+                or_(
+                    and_(Divergence.pair1_id == pair1_id, Divergence.pair2_id == pair2_id),
+                    and_(Divergence.pair1_id == pair2_id, Divergence.pair2_id == pair1_id)
+                ),
+                Divergence.detected_at >= since
+            )
+        )
+        .limit(1)
+    )
+
+
+def recent_divergences_query(pair_ids: Iterable[int], since: datetime) -> Select:
+    """
+    Запрос комбинаций пар с дивергенцией после момента since одним запросом
+
+    Заменяет recent_divergence_query на каждую комбинацию в цикле проверки,
+    условие обслуживает тот же индекс ix_divergences_pair_detected
+    """
+    pair_ids = list(pair_ids)
+    return (
+        select(Divergence.pair1_id, Divergence.pair2_id)
+        .where(
+            Divergence.pair1_id.in_(pair_ids),
+            Divergence.pair2_id.in_(pair_ids),
+            Divergence.detected_at >= since
+        )
+        .distinct()
+    )
+
 
 class DivergenceAnalyzer:
     """Класс для анализа дивергенций между криптовалютными парами"""
@@ -19,8 +72,7 @@ class DivergenceAnalyzer:
 
     async def get_active_pairs(self) -> List[CurrencyPair]:
         """Получает список активных валютных пар для отслеживания"""
-        query = select(CurrencyPair).where(CurrencyPair.is_active == True)
-        result = await self.session.execute(query)
+        result = await self.session.execute(active_pairs_query())
         return result.scalars().all()
 
     async def get_current_prices(self, pairs: List[CurrencyPair]) -> Dict[str, float]:
@@ -41,11 +93,11 @@ class DivergenceAnalyzer:
             pair1: CurrencyPair,
             pair2: CurrencyPair,
             prices: Dict[str, float]
-    ) -> Optional[Tuple[float, str]]:
+    ) -> Optional[float]:
         """
         Рассчитывает дивергенцию между двумя валютными парами
         
-        Возвращает процент дивергенции и описание, если дивергенция превышает порог,
+        Возвращает процент дивергенции, если дивергенция превышает порог,
         иначе возвращает None
         """
         if pair1.symbol not in prices or pair2.symbol not in prices:
@@ -61,13 +113,7 @@ class DivergenceAnalyzer:
         # Проверяем, превышает ли дивергенция пороговое значение
         threshold = max(pair1.devergence_threshold, pair2.devergence_threshold)
         if abs(divergence_percent) >= threshold:
-            direction = 'расходятся' if divergence_percent > 0 else 'сходятся'
-            description = (
-                f"Обнаружена дивергенция {abs(divergence_percent):.2f}% между {pair1.symbol} "
-                f"и {pair2.symbol}. Пары {direction}.\n"
-                f"Текущие цены: {pair1.symbol} = {price1:.8f}, {pair2.symbol} = {price2:.8f}"
-            )
-            return divergence_percent, description
+            return divergence_percent
         
         return None
     
@@ -90,67 +136,148 @@ class DivergenceAnalyzer:
 
         return divergence_percent
     
-    async def record_divergence(
+    def _divergence_values(
             self,
             pair1: CurrencyPair,
             pair2: CurrencyPair,
             divergence_percent: float,
             prices: Dict[str, float],
-            description: str
+            detected_at: datetime
+    ) -> Dict:
+        """Значения полей новой дивергенции"""
+        return {
+            'pair1_id': pair1.id,
+            'pair2_id': pair2.id,
+            'pair1_symbol': pair1.symbol,
+            'pair2_symbol': pair2.symbol,
+            'pair1_price': prices[pair1.symbol],
+            'pair2_price': prices[pair2.symbol],
+            'divergence_percent': divergence_percent,
+            'detected_at': detected_at,
+            'notification_sent': False
+        }
+
+    async def record_divergence(
+            self,
+            pair1: CurrencyPair,
+            pair2: CurrencyPair,
+            divergence_percent: float,
+            prices: Dict[str, float]
     ) -> Divergence:
-        """Записывает найденную дивергенцию в базу данных"""
-        divergence = Divergence(
-            pair1_id=pair1.id,
-            pair2_id=pair2.id,
-            pair1_symbol=pair1.symbol,
-            pair2_symbol=pair2.symbol,
-            pair1_price=prices[pair1.symbol],
-            pair2_price=prices[pair2.symbol],
-            divergence_percent=divergence_percent,
-            description=description,
-            detected_at=datetime.now(timezone.utc),
-            notification_sent=False
-        )
+        """
+        Записывает найденную дивергенцию в базу данных
 
-        self.session.add(divergence)
-        await self.session.commit()
-        await self.session.refresh(divergence)
+        Текст описания не хранится: сообщение собирается из полей при отправке.
+        Почасовая сводка обновляется в той же транзакции, как в check_all_pairs.
+        """
+        divergence = Divergence(**self._divergence_values(
+            pair1, pair2, divergence_percent, prices, datetime.now(timezone.utc)
+        ))
+
+        with tracer.span('divergence.record', pair1=pair1.symbol, pair2=pair2.symbol):
+            self.session.add(divergence)
+            await self.session.flush()
+            await update_hourly_rollup(self.session, [divergence])
+            await self.session.commit()
+            await self.session.refresh(divergence)
         return divergence
     
-    async def check_all_pairs(self) -> List[Divergence]:
+    async def check_all_pairs(
+            self,
+            shards: Optional[Tuple[FrozenSet[int], int]] = None,
+            confirm: Optional[Callable[[], Awaitable[bool]]] = None
+    ) -> List[Divergence]:
         """
         Проверяет все возможные комбинации активных пар на наличие дивергенций
+
+        Если переданы шарды (номера, количество), проверяются только комбинации,
+        относящиеся к этим шардам. Число запросов к БД не зависит от количества
+        пар: повторы проверяются одним запросом, новые дивергенции и почасовая
+        сводка записываются в одной транзакции. Перед ее фиксацией вызывается
+        confirm (проверка, что реплика все еще лидер): если шарды потеряны во
+        время цикла, запись отменяется.
         
         Возвращает список обнаруженных дивергенций
         """
-        pairs = await self.get_active_pairs()
+        with tracer.span('pairs.load') as span:
+            pairs = await self.get_active_pairs()
+            span.set(pairs=len(pairs))
         if len(pairs) < 2:
             logger.info('Недостаточно активных пар для анализа дивергенций')
             return []
         
         # Получаем текущие цены для всех пар
-        prices = await self.get_current_prices(pairs)
+        with tracer.span('prices.fetch', pairs=len(pairs)) as span:
+            prices = await self.get_current_prices(pairs)
+            span.set(prices=len(prices))
         if not prices:
             logger.error('Не удалось получить цены')
             return []
+
+        # Сохраняем цены для графиков к уведомлениям
+        price_history.record(prices)
         
-        found_divergences = []
+        candidates = []
+        evaluated = 0
+
+        with tracer.span('pairs.analyze', pairs=len(pairs)) as span:
+            # Проверяем все возможные комбинации пар
+            for i, pair1 in enumerate(pairs):
+                for pair2 in pairs[i+1:]:
+                    # Пропускаем комбинации, которые обрабатывают другие реплики
+                    if shards and shard_of(pair1.symbol, pair2.symbol, shards[1]) not in shards[0]:
+                        continue
+                    evaluated += 1
 
-        # Проверяем все возможные комбинации пар
-        for i, pair1 in enumerate(pairs):
-            for pair2 in pairs[i+1:]:
-                # Проверяем дивергенцию
-                divergence_result = await self.calculate_divergence(pair1, pair2, prices)
-                if divergence_result:
-                    divergence_percent, description = divergence_result
+                    # Проверяем дивергенцию
+                    divergence_percent = await self.calculate_divergence(pair1, pair2, prices)
+                    if divergence_percent is not None:
+                        candidates.append((pair1, pair2, divergence_percent))
+            span.set(evaluated=evaluated, candidates=len(candidates))
 
-                    # Проверяем, не было ли недавно такой же дивергенции
-                    if not await self._is_recent_duplicate(pair1.id, pair2.id):
-                        # Записываем дивергенцию в базу данных
-                        divergence = await self.record_divergence(pair1, pair2, divergence_percent, prices, description)
-                        found_divergences.append(divergence)
+        rows = []
+        if candidates:
+            # Пропускаем комбинации, у которых недавно уже была дивергенция
+            recent = await self._recent_duplicates(candidates)
+            detected_at = datetime.now(timezone.utc)
+            rows = [
+                self._divergence_values(pair1, pair2, divergence_percent, prices, detected_at)
+                for pair1, pair2, divergence_percent in candidates
+                if (min(pair1.id, pair2.id), max(pair1.id, pair2.id)) not in recent
+            ]
+
+        found_divergences = []
+        if rows:
+            # Записываем дивергенции одним INSERT ... RETURNING (порядок строк не важен)
+            # и почасовую сводку для статистики в одной транзакции
+            with tracer.span('divergences.record', divergences=len(rows)):
+                result = await self.session.scalars(insert(Divergence).returning(Divergence), rows)
+                found_divergences = list(result.all())
+                await update_hourly_rollup(self.session, found_divergences)
+                if confirm is not None and not await confirm():
+                    logger.warning('Реплика потеряла лидерство во время проверки, дивергенции не записаны')
+                    await self.session.rollback()
+                    return []
+                await self.session.commit()
+
+        PAIRS_EVALUATED.inc(evaluated)
+        DIVERGENCES_FOUND.inc(len(found_divergences))
 
         return found_divergences
+
+    async def _recent_duplicates(
+            self,
+            candidates: List[Tuple[CurrencyPair, CurrencyPair, float]]
+    ) -> Set[Tuple[int, int]]:
+        """
+        Комбинации пар (меньший id, больший id) с дивергенцией за последний час
+
+        Один запрос на весь цикл вместо _is_recent_duplicate на каждую комбинацию
+        """
+        one_hour_ago = datetime.now(timezone.utc) - timedelta(hours=1)
+        pair_ids = {pair.id for pair1, pair2, _ in candidates for pair in (pair1, pair2)}
+        result = await self.session.execute(recent_divergences_query(pair_ids, one_hour_ago))
+        return {(min(pair1_id, pair2_id), max(pair1_id, pair2_id)) for pair1_id, pair2_id in result}
     
     async def _is_recent_duplicate(self, pair1_id: int, pair2_id: int) -> bool:
         """
@@ -158,27 +285,15 @@ class DivergenceAnalyzer:
         чтобы избежать частых дублирующих уведомлений
         """
         one_hour_ago = datetime.now(timezone.utc) - timedelta(hours=1)
-
-        # Проверяем в обоих направлениях (pair1-pair2 и pair2-pair1)
-        query = select(Divergence).where(
-            and_(
-                or_(
-                    and_(Divergence.pair1_id == pair1_id, Divergence.pair2_id == pair2_id),
-                    and_(Divergence.pair1_id == pair1_id, Divergence.pair2_id == pair2_id)
-                ),
-                Divergence.detected_at >= one_hour_ago
-            )
-        )
-
-        result = await self.session.execute(query)
+        result = await self.session.execute(recent_divergence_query(pair1_id, pair2_id, one_hour_ago))
         return result.first() is not None
     
     async def mark_as_notified(self, divergence_id: int) -> None:
-        """Отмечает дивергенцию как отправленную в уведомлении"""
-        query = select(Divergence).where(Divergence.id == divergence_id)
-        result = await self.session.execute(query)
-        divergence = result.scalar_one_or_none()
-
-        if divergence:
-            divergence.notification_sent = True
-            await self.session.commit()
+        """Отмечает дивергенцию как отправленную в уведомлении (одним UPDATE, без выборки)"""
+        await self.session.execute(
+            update(Divergence)
+            .where(Divergence.id == divergence_id)
+            .values(notification_sent=True, notified_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        )
+        await self.session.commit()
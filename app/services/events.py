@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Iterable, List, Optional
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+from app.config import DIVERGENCE_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+# Максимальный размер payload у NOTIFY - 8000 байт, оставляем запас
+MAX_PAYLOAD_SIZE = 7000
+
+
+def _chunk_ids(ids: Iterable[int]) -> List[str]:
+    """Разбивает список ID на строки payload допустимого размера"""
+    chunks = []
+    current = ''
+    for item in ids:
+        part = str(item)
+        if current and len(current) + len(part) + 1 > MAX_PAYLOAD_SIZE:
+            chunks.append(current)
+            current = part
+        else:
+            current = f'{current},{part}' if current else part
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def parse_ids(payload: str) -> List[int]:
+    """Разбирает payload со списком ID через запятую"""
+    return [int(item) for item in payload.split(',') if item]
+
+
+async def publish_divergences(
+        session: AsyncSession,
+        divergence_ids: Iterable[int],
+        channel: str = DIVERGENCE_CHANNEL
+) -> None:
+    """
+    Отправляет NOTIFY с ID новых дивергенций (доставляется после commit)
+
+    В БД без LISTEN/NOTIFY (SQLite) событие не отправляется, обработчик
+    outbox найдет дивергенции при периодическом опросе.
+    """
+    if session.get_bind().dialect.name != 'postgresql':
+        await session.commit()
+        return
+
+    for payload in _chunk_ids(divergence_ids):
+        await session.execute(
+            text('SELECT pg_notify(:channel, :payload)'),
+            {'channel': channel, 'payload': payload}
+        )
+    await session.commit()
+
+
+class DivergenceEventListener:
+    """
+    Подписчик на события о новых дивергенциях через LISTEN
+
+    Держит выделенное соединение с БД и переподключается при его обрыве.
+    Обработчик получает список ID из payload уведомления (ID дивергенций
+    или, на канале администраторов, ID пользователей). Для других форматов
+    payload передается свой parse_payload.
+    """
+
+    def __init__(
+            self,
+            engine: AsyncEngine,
+            handler: Callable[[List[Any]], Awaitable[None]],
+            channel: str = DIVERGENCE_CHANNEL,
+            reconnect_delay: float = 5.0,
+            parse_payload: Callable[[str], List[Any]] = parse_ids
+    ):
+        self.engine = engine
+        self.handler = handler
+        self.channel = channel
+        self.parse_payload = parse_payload
+        self.reconnect_delay = reconnect_delay
+
+        self._task: Optional[asyncio.Task] = None
+        self._handler_tasks: set = set()
+
+    def start(self) -> None:
+        """Запускает прослушивание канала в фоне"""
+        if self.engine.dialect.name != 'postgresql':
+            logger.warning(f"БД не поддерживает LISTEN/NOTIFY, канал {self.channel} не прослушивается")
+            return
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает прослушивание"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _on_notification(self, connection, pid, channel, payload) -> None:
+        try:
+            ids = self.parse_payload(payload)
+        except ValueError:
+            logger.error(f"Некорректный payload уведомления: {payload}")
+            return
+
+        task = asyncio.create_task(self._handle(ids))
+        self._handler_tasks.add(task)
+        task.add_done_callback(self._handler_tasks.discard)
+
+    async def _handle(self, ids: List[Any]) -> None:
+        try:
+            await self.handler(ids)
+        except Exception as e:
+            logger.error(f"Ошибка при обработке события из канала {self.channel}: {str(e)}")
+
+    async def _run(self) -> None:
+        while True:
+            connection: Optional[AsyncConnection] = None
+            try:
+                connection = await self.engine.connect()
+                raw_connection = await connection.get_raw_connection()
+                driver_connection = raw_connection.driver_connection
+
+                terminated = asyncio.Event()
+                driver_connection.add_termination_listener(lambda conn: terminated.set())
+                await driver_connection.add_listener(self.channel, self._on_notification)
+                logger.info(f"Подписка на канал {self.channel} установлена")
+
+                await terminated.wait()
+                logger.warning(f"Соединение подписки на канал {self.channel} потеряно")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка подписки на канал {self.channel}: {str(e)}")
+            finally:
+                if connection is not None:
+                    # Соединение с LISTEN не возвращаем в пул
+                    try:
+                        await connection.invalidate()
+                    except Exception:
+                        pass
+
+            await asyncio.sleep(self.reconnect_delay)
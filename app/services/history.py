@@ -0,0 +1,256 @@
+import csv
+import math
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, TextIO, Tuple
+from sqlalchemy import Select, or_, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.database.models import Divergence
+
+logger = logging.getLogger(__name__)
+
+# Количество дивергенций на одной странице истории
+HISTORY_PAGE_SIZE = 15
+
+# Строк, получаемых из серверного курсора за одно обращение при выгрузке
+EXPORT_BATCH_SIZE = 1000
+
+# Ограничение выгрузки (файлы больше 50 МБ Telegram не принимает)
+MAX_EXPORT_ROWS = 200000
+
+EXPORT_COLUMNS = (
+    'id', 'detected_at', 'pair1_symbol', 'pair2_symbol', 'pair1_price', 'pair2_price',
+    'divergence_percent', 'notification_sent', 'notified_at'
+)
+
+# Наибольший период фильтра hours (10 лет)
+MAX_HISTORY_HOURS = 24 * 365 * 10
+
+# Позиция в истории: (время обнаружения, id)
+HistoryCursor = Tuple[datetime, int]
+
+
+def parse_datetime(value: str) -> datetime:
+    """Разбирает дату (YYYY-MM-DD или YYYY-MM-DDTHH:MM) в UTC"""
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment
+
+
+def parse_number(name: str, value: str) -> float:
+    """Разбирает конечное число параметра фильтра (ValueError с текстом для пользователя)"""
+    try:
+        number = float(value.replace(',', '.'))
+    except ValueError:
+        raise ValueError(f"Параметр {name} должен быть числом") from None
+    if not math.isfinite(number):
+        raise ValueError(f"Параметр {name} должен быть конечным числом")
+    return number
+
+
+@dataclass
+class HistoryFilters:
+    """Фильтры истории дивергенций"""
+    symbol: Optional[str] = None
+    min_percent: Optional[float] = None
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+
+    @classmethod
+    def parse(cls, args: Optional[str], now: Optional[datetime] = None) -> 'HistoryFilters':
+        """
+        Разбирает аргументы команды: pair=BTCUSDT min=3 hours=24 from=2026-10-01 to=2026-10-19
+
+        Бросает ValueError с описанием ошибки для пользователя при неверном формате.
+        """
+        now = now or datetime.now(timezone.utc)
+        arguments = (args or '').split()
+        invalid = [arg for arg in arguments if '=' not in arg]
+        if invalid:
+            raise ValueError(f"Ожидается параметр=значение: {', '.join(invalid)}")
+        options = dict(arg.split('=', 1) for arg in arguments)
+        unknown = set(options) - {'pair', 'min', 'hours', 'from', 'to'}
+        if unknown:
+            raise ValueError(f"Неизвестные параметры: {', '.join(sorted(unknown))}")
+
+        filters = cls()
+        if options.get('pair'):
+            filters.symbol = options['pair'].strip().upper()
+        if options.get('min'):
+            filters.min_percent = parse_number('min', options['min'])
+        if options.get('hours'):
+            hours = parse_number('hours', options['hours'])
+            # Слишком большой период не помещается в timedelta/datetime (OverflowError)
+            if not 0 < hours <= MAX_HISTORY_HOURS:
+                raise ValueError(f"Параметр hours должен быть больше 0 и не больше {MAX_HISTORY_HOURS}")
+            filters.since = now - timedelta(hours=hours)
+        for name in ('from', 'to'):
+            if options.get(name):
+                try:
+                    moment = parse_datetime(options[name])
+                except ValueError:
+                    raise ValueError(f"Параметр {name}: ожидается дата YYYY-MM-DD или YYYY-MM-DDTHH:MM") from None
+                if name == 'from':
+                    filters.since = moment
+                else:
+                    filters.until = moment
+        return filters
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Представление для хранения в данных FSM (только JSON-совместимые типы)"""
+        return {
+            'symbol': self.symbol,
+            'min_percent': self.min_percent,
+            'since': self.since.isoformat() if self.since else None,
+            'until': self.until.isoformat() if self.until else None
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'HistoryFilters':
+        return cls(
+            symbol=data.get('symbol'),
+            min_percent=data.get('min_percent'),
+            since=parse_datetime(data['since']) if data.get('since') else None,
+            until=parse_datetime(data['until']) if data.get('until') else None
+        )
+
+    def describe(self) -> str:
+        """Описание фильтров для заголовка"""
+        parts = []
+        if self.symbol:
+            parts.append(f"пара {self.symbol}")
+        if self.min_percent is not None:
+            parts.append(f"от {self.min_percent:g}%")
+        if self.since:
+            parts.append(f"с {self.since:%d.%m.%Y %H:%M}")
+        if self.until:
+            parts.append(f"по {self.until:%d.%m.%Y %H:%M}")
+        return ', '.join(parts) or 'без фильтров'
+
+
+def cursor_to_data(cursor: Optional[HistoryCursor]) -> Optional[List]:
+    if cursor is None:
+        return None
+    return [cursor[0].isoformat(), cursor[1]]
+
+
+def cursor_from_data(data: Optional[List]) -> Optional[HistoryCursor]:
+    if not data:
+        return None
+    return parse_datetime(data[0]), int(data[1])
+
+
+def history_query(filters: HistoryFilters) -> Select:
+    """Запрос дивергенций по фильтрам (без сортировки)"""
+    query = select(Divergence)
+    if filters.symbol:
+        query = query.where(or_(
+            Divergence.pair1_symbol == filters.symbol,
+            Divergence.pair2_symbol == filters.symbol
+        ))
+    if filters.min_percent is not None:
+        query = query.where(or_(
+            Divergence.divergence_percent >= filters.min_percent,
+            Divergence.divergence_percent <= -filters.min_percent
+        ))
+    if filters.since is not None:
+        query = query.where(Divergence.detected_at >= filters.since)
+    if filters.until is not None:
+        query = query.where(Divergence.detected_at < filters.until)
+    return query
+
+
+def history_page_query(
+        filters: HistoryFilters,
+        after: Optional[HistoryCursor] = None,
+        before: Optional[HistoryCursor] = None,
+        limit: int = HISTORY_PAGE_SIZE
+) -> Select:
+    """
+    Страница истории от новых к старым (keyset-пагинация по (detected_at, id))
+
+    after - следующая (более старая) страница после позиции, before -
+    предыдущая (более новая) страница, выбирается в обратном порядке.
+    Запрос идет по индексу ix_divergences_detected_at без OFFSET.
+    """
+    position = tuple_(Divergence.detected_at, Divergence.id)
+    query = history_query(filters)
+    if before is not None:
+        return query.where(position > tuple_(*before)).order_by(
+            Divergence.detected_at, Divergence.id
+        ).limit(limit)
+    if after is not None:
+        query = query.where(position < tuple_(*after))
+    return query.order_by(Divergence.detected_at.desc(), Divergence.id.desc()).limit(limit)
+
+
+@dataclass
+class HistoryPage:
+    """Страница истории дивергенций"""
+    divergences: List[Divergence] = field(default_factory=list)
+    has_newer: bool = False
+    has_older: bool = False
+
+    @property
+    def first(self) -> Optional[HistoryCursor]:
+        if not self.divergences:
+            return None
+        return self.divergences[0].detected_at, self.divergences[0].id
+
+    @property
+    def last(self) -> Optional[HistoryCursor]:
+        if not self.divergences:
+            return None
+        return self.divergences[-1].detected_at, self.divergences[-1].id
+
+
+async def get_history_page(
+        session: AsyncSession,
+        filters: HistoryFilters,
+        after: Optional[HistoryCursor] = None,
+        before: Optional[HistoryCursor] = None,
+        page_size: int = HISTORY_PAGE_SIZE
+) -> HistoryPage:
+    """Возвращает страницу истории, выбирая из БД только ее строки (и одну лишнюю)"""
+    result = await session.execute(history_page_query(filters, after, before, page_size + 1))
+    divergences = list(result.scalars().all())
+    more = len(divergences) > page_size
+    divergences = divergences[:page_size]
+
+    if before is not None:
+        divergences.reverse()
+        return HistoryPage(divergences=divergences, has_newer=more, has_older=True)
+    return HistoryPage(divergences=divergences, has_newer=after is not None, has_older=more)
+
+
+async def export_history_csv(
+        session: AsyncSession,
+        filters: HistoryFilters,
+        output: TextIO,
+        max_rows: int = MAX_EXPORT_ROWS
+) -> int:
+    """
+    Выгружает историю по фильтрам в CSV, возвращает количество строк
+
+    Строки читаются серверным курсором пачками по EXPORT_BATCH_SIZE и сразу
+    пишутся в файл, поэтому вся выборка в памяти не держится.
+    """
+    columns = [getattr(Divergence, name) for name in EXPORT_COLUMNS]
+    query = history_query(filters).with_only_columns(*columns).order_by(
+        Divergence.detected_at, Divergence.id
+    ).limit(max_rows).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    writer = csv.writer(output)
+    writer.writerow(EXPORT_COLUMNS)
+    rows = 0
+    result = await session.stream(query)
+    async for partition in result.partitions():
+        writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row]
+            for row in partition
+        )
+        rows += len(partition)
+    return rows
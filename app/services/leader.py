@@ -0,0 +1,293 @@
+import asyncio
+import logging
+import zlib
+from typing import FrozenSet, Optional, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from app.config import (
+    DETECTOR_LOCK_ID,
+    DETECTOR_SHARDS,
+    LEADER_RENEW_INTERVAL,
+    LEADER_RETRY_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+
+def shard_of(symbol1: str, symbol2: str, shards_count: int) -> int:
+    """Возвращает номер шарда для комбинации двух валютных пар"""
+    # Сортируем символы, чтобы номер шарда не зависел от порядка пар
+    key = ':'.join(sorted((symbol1, symbol2)))
+    return zlib.crc32(key.encode('utf-8')) % shards_count
+
+
+class LeaderElector:
+    """
+    Выбор лидера детектора через advisory-lock PostgreSQL
+
+    Блокировки уровня сессии удерживаются на выделенном соединении, поэтому
+    при падении процесса или обрыве соединения они освобождаются сервером,
+    и другая реплика захватывает их на следующей попытке. Реплика периодически
+    продлевает аренду, проверяя, что соединение живо и блокировки за ним.
+
+    Каждая запущенная реплика держит блокировку участия (ключ lock_id + 1 и
+    pid соединения), по которым считаются все живые реплики, в том числе еще
+    без шардов. При DETECTOR_SHARDS > 1 шарды делятся между ними поровну:
+    на каждом продлении реплика отдает шарды сверх своей доли и забирает
+    свободные до нее, поэтому после перезапуска или rolling deploy нагрузка
+    снова распределяется по всем репликам, и ни одна комбинация не остается
+    без анализа. Реплики сверх числа шардов ждут в резерве.
+    """
+
+    def __init__(
+            self,
+            engine: AsyncEngine,
+            lock_id: int = DETECTOR_LOCK_ID,
+            shards_count: int = DETECTOR_SHARDS,
+            renew_interval: float = LEADER_RENEW_INTERVAL,
+            retry_interval: float = LEADER_RETRY_INTERVAL
+    ):
+        self.engine = engine
+        self.lock_id = lock_id
+        self.member_lock_id = lock_id + 1
+        self.shards_count = max(1, shards_count)
+        self.renew_interval = renew_interval
+        self.retry_interval = retry_interval
+
+        self.shard_indexes: FrozenSet[int] = frozenset()
+        self._connection: Optional[AsyncConnection] = None
+        self._member_key: Optional[int] = None
+        # Соединение с блокировками используют цикл продления и проверка перед записью
+        self._connection_lock = asyncio.Lock()
+        self._leader_event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_leader(self) -> bool:
+        """Удерживает ли реплика блокировку хотя бы одного шарда"""
+        return self._leader_event.is_set()
+
+    @property
+    def shards(self) -> Optional[Tuple[FrozenSet[int], int]]:
+        """Шарды реплики в виде (номера, количество) или None без шардирования"""
+        if not self.shard_indexes or self.shards_count == 1:
+            return None
+        return self.shard_indexes, self.shards_count
+
+    def holds(self, shards: Optional[Tuple[FrozenSet[int], int]]) -> bool:
+        """Удерживает ли реплика все шарды из shards (None - лидерство без шардирования)"""
+        if not self.is_leader:
+            return False
+        return shards is None or shards[0] <= self.shard_indexes
+
+    async def confirm(self, shards: Optional[Tuple[FrozenSet[int], int]]) -> bool:
+        """
+        Проверяет блокировки на сервере прямо сейчас
+
+        Вызывается перед записью результатов цикла: реплика, потерявшая
+        блокировку во время цикла, не должна записывать дивергенции чужого шарда.
+        """
+        if self.is_leader and not await self._renew():
+            logger.warning('Аренда лидера потеряна во время цикла проверки')
+            await self._release()
+        return self.holds(shards)
+
+    async def wait_for_leadership(self) -> None:
+        """Ожидает, пока реплика не станет лидером"""
+        await self._leader_event.wait()
+
+    def start(self) -> None:
+        """Запускает фоновый цикл выбора лидера"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает цикл и освобождает блокировки"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self._release()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if self._connection is None:
+                    await self._join()
+                elif not await self._renew():
+                    logger.warning('Аренда реплики потеряна, повторное подключение')
+                    await self._release()
+                    await asyncio.sleep(self.retry_interval)
+                    continue
+
+                was_leader = self.is_leader
+                await self._rebalance()
+                if self.is_leader and not was_leader:
+                    logger.info(
+                        f"Реплика стала лидером детектора "
+                        f"(шарды {sorted(index + 1 for index in self.shard_indexes)}/{self.shards_count})"
+                    )
+                elif was_leader and not self.is_leader:
+                    logger.info('Реплика отдала все шарды и ждет в резерве')
+                await asyncio.sleep(self.renew_interval if self.is_leader else self.retry_interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка при выборе лидера: {str(e)}")
+                await self._release()
+                await asyncio.sleep(self.retry_interval)
+
+    async def _join(self) -> None:
+        """Открывает соединение с блокировками и регистрирует реплику"""
+        if self.engine.dialect.name != 'postgresql':
+            # Без advisory-lock (SQLite) процесс считается единственным детектором
+            self.shard_indexes = frozenset({0})
+            self.shards_count = 1
+            self._leader_event.set()
+            return
+
+        connection = await self.engine.connect()
+        try:
+            # Блокировки уровня сессии не должны держать открытую транзакцию
+            connection = await connection.execution_options(isolation_level='AUTOCOMMIT')
+            result = await connection.execute(
+                text('SELECT pg_backend_pid(), pg_try_advisory_lock(:member_lock_id, pg_backend_pid())'),
+                {'member_lock_id': self.member_lock_id}
+            )
+            member_key, joined = result.one()
+            if not joined:
+                raise RuntimeError(f"блокировка участия реплики {member_key} уже занята")
+        except BaseException:
+            await connection.close()
+            raise
+        self._connection = connection
+        self._member_key = int(member_key)
+
+    async def _try_lock(self, shard_index: int) -> bool:
+        result = await self._connection.execute(
+            text('SELECT pg_try_advisory_lock(:lock_id, :shard)'),
+            {'lock_id': self.lock_id, 'shard': shard_index}
+        )
+        return bool(result.scalar())
+
+    async def _unlock(self, shard_index: int) -> None:
+        await self._connection.execute(
+            text('SELECT pg_advisory_unlock(:lock_id, :shard)'),
+            {'lock_id': self.lock_id, 'shard': shard_index}
+        )
+
+    async def _fair_share(self) -> int:
+        """
+        Доля шардов реплики среди всех живых реплик
+
+        Первые shards_count % реплик получают на один шард больше, поэтому сумма
+        долей равна числу шардов. Реплики упорядочиваются по числу удерживаемых
+        шардов, чтобы лишний шард оставался у текущего владельца и лидерство не
+        переходило к каждой новой реплике.
+        """
+        result = await self._connection.execute(
+            text(
+                'SELECT member.objid, count(shard.objid) AS held FROM pg_locks member '
+                'LEFT JOIN pg_locks shard ON shard.pid = member.pid '
+                "AND shard.locktype = 'advisory' AND shard.classid = :lock_id "
+                'AND shard.objsubid = 2 AND shard.granted '
+                "WHERE member.locktype = 'advisory' AND member.classid = :member_lock_id "
+                'AND member.objsubid = 2 AND member.granted '
+                'AND member.database = (SELECT oid FROM pg_database WHERE datname = current_database()) '
+                'GROUP BY member.objid ORDER BY held DESC, member.objid'
+            ),
+            {'lock_id': self.lock_id, 'member_lock_id': self.member_lock_id}
+        )
+        members = [int(objid) for objid in result.scalars()]
+        if self._member_key not in members:
+            raise RuntimeError('блокировка участия реплики потеряна')
+        rank = members.index(self._member_key)
+        return self.shards_count // len(members) + (1 if rank < self.shards_count % len(members) else 0)
+
+    async def _rebalance(self) -> None:
+        """Отдает шарды сверх равной доли реплики и забирает свободные до нее"""
+        if self.engine.dialect.name != 'postgresql':
+            return
+
+        async with self._connection_lock:
+            fair_share = await self._fair_share()
+            held = sorted(self.shard_indexes)
+
+            released = held[fair_share:]
+            for shard_index in released:
+                await self._unlock(shard_index)
+
+            adopted = []
+            for shard_index in range(self.shards_count):
+                if len(held) - len(released) + len(adopted) >= fair_share:
+                    break
+                if shard_index not in self.shard_indexes and await self._try_lock(shard_index):
+                    adopted.append(shard_index)
+
+        self.shard_indexes = (self.shard_indexes - frozenset(released)) | frozenset(adopted)
+        if self.shard_indexes:
+            self._leader_event.set()
+        else:
+            self._leader_event.clear()
+        if released or (adopted and held):
+            logger.info(
+                f"Перераспределение шардов: отданы {[index + 1 for index in released]}, "
+                f"забраны {[index + 1 for index in adopted]}, "
+                f"шарды реплики: {sorted(index + 1 for index in self.shard_indexes)}/{self.shards_count}"
+            )
+
+    async def _renew(self) -> bool:
+        """
+        Проверяет, что соединение живо и блокировка участия все еще удерживается
+
+        Шарды, блокировка которых пропала, исключаются из шардов реплики
+        """
+        if self.engine.dialect.name != 'postgresql':
+            return True
+        if self._connection is None:
+            return False
+        try:
+            async with self._connection_lock:
+                result = await asyncio.wait_for(
+                    self._connection.execute(
+                        text(
+                            'SELECT classid, objid FROM pg_locks '
+                            "WHERE locktype = 'advisory' AND pid = pg_backend_pid() "
+                            'AND classid IN (:lock_id, :member_lock_id) AND objsubid = 2 AND granted'
+                        ),
+                        {'lock_id': self.lock_id, 'member_lock_id': self.member_lock_id}
+                    ),
+                    timeout=self.renew_interval
+                )
+                locks = [(int(classid), int(objid)) for classid, objid in result]
+        except Exception as e:
+            logger.error(f"Ошибка продления аренды лидера: {str(e)}")
+            return False
+
+        if (self.member_lock_id, self._member_key) not in locks:
+            return False
+        held = frozenset(objid for classid, objid in locks if classid == self.lock_id)
+        lost = self.shard_indexes - held
+        if lost:
+            logger.warning(f"Потеряны блокировки шардов {sorted(index + 1 for index in lost)}")
+        self.shard_indexes = self.shard_indexes & held
+        if not self.shard_indexes:
+            self._leader_event.clear()
+        return True
+
+    async def _release(self) -> None:
+        """Снимает статус лидера и закрывает соединение с блокировками"""
+        self._leader_event.clear()
+        self.shard_indexes = frozenset()
+        self._member_key = None
+        connection, self._connection = self._connection, None
+        if connection is None:
+            return
+        try:
+            # Закрытие соединения освобождает все advisory-lock сессии
+            await connection.invalidate()
+        except Exception as e:
+            logger.error(f"Ошибка при освобождении блокировки лидера: {str(e)}")
@@ -1,45 +1,199 @@
+import asyncio
 import logging
-from typing import List, Optional
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Set, Tuple, Union
+from uuid import uuid4
 from aiogram import Bot
+from aiogram.types import BufferedInputFile
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import ColumnElement, Select, and_, delete, or_, update
 from sqlalchemy.future import select
-from app.database.models import Divergence, BotSettings
-from app.config import NOTIFICATION_GROUP_ID
+from app.database.dialect import upsert
+from app.database.query_counter import allow_repeats
+from app.database.models import Divergence, BotSettings, NotificationDelivery
+from app.config import (
+    NOTIFICATION_GROUP_ID,
+    NOTIFICATION_MODE,
+    DIGEST_WINDOW,
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_CLAIM_TIMEOUT,
+    OUTBOX_RETRY_DELAY,
+    NOTIFICATION_MAX_ATTEMPTS,
+    ATTACH_CHARTS,
+    CHART_WINDOW_HOURS,
+    PRICE_HISTORY_HOURS
+)
+from app.services.charts import chart_renderer
+from app.services.settings_cache import settings_cache
+from app.services.subscriptions import subscription_registry
+from app.services.telegram_queue import TelegramSendQueue, PRIORITY_ALERT, PRIORITY_DIGEST
+from app.utils.tracing import tracer
 
 logger = logging.getLogger(__name__)
 
+# Максимальная длина текста сообщения Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# Запас под заголовок и теги сводки
+DIGEST_HEADER_RESERVE = 200
+
+# Максимальная длина подписи к изображению
+TELEGRAM_CAPTION_LIMIT = 1024
+
+# Состояния доставки уведомления в чат
+DELIVERY_PENDING = 'pending'
+DELIVERY_SENT = 'sent'
+DELIVERY_FAILED = 'failed'
+
+
+def pending_notifications_filter(now: datetime) -> ColumnElement:
+    """Неотправленные уведомления, не захваченные обработчиком (или с истекшим захватом)"""
+    return and_(
+        Divergence.notification_sent == False,
+        or_(Divergence.claimed_until.is_(None), Divergence.claimed_until <= now)
+    )
+
+
+def pending_notifications_query(batch_size: int, now: Optional[datetime] = None) -> Select:
+    """Запрос пачки неотправленных уведомлений (частичный индекс ix_divergences_pending)"""
+    return (
+        select(Divergence)
+        .where(pending_notifications_filter(now or datetime.now(timezone.utc)))
+        .order_by(Divergence.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+
 
 class NotificationService:
     """Сервис для отправки уведомлений о дивергенциях в Telegram"""
 
-    def __init__(self, bot: Bot, session: AsyncSession):
+    def __init__(self, bot: Bot, session: AsyncSession, send_queue: Optional[TelegramSendQueue] = None):
         self.bot = bot
         self.session = session
+        self.send_queue = send_queue
+
+        # Результаты доставки пишутся короткими транзакциями по мере отправки;
+        # сессия одна, поэтому обращения к ней из параллельных отправок идут по очереди
+        self._db_lock = asyncio.Lock()
+        self._remaining: Dict[int, Set[str]] = {}
+        self._attempts: Dict[Tuple[int, str], int] = {}
+        self._unsaved: Dict[Tuple[int, str], Dict] = {}
+        self._saved: Set[int] = set()
+        self._marked: Set[int] = set()
+
+    async def _send_message(self, chat_id: Union[int, str], text: str, priority: int = PRIORITY_ALERT) -> bool:
+        """Отправляет сообщение через очередь с учетом лимитов Telegram (если она задана)"""
+        with tracer.span('telegram.send', method='sendMessage', chat_id=str(chat_id), queued=self.send_queue is not None) as span:
+            if self.send_queue is not None:
+                sent = await self.send_queue.send_message(chat_id, text, priority=priority, parse_mode='HTML')
+                span.set(sent=sent)
+                return sent
+
+            try:
+                await self.bot.send_message(
+                    chat_id=chat_id,
+                    text=text,
+                    parse_mode='HTML'
+                )
+                return True
+            except Exception as e:
+                span.record_error(e)
+                logger.error(f"Ошибка при отправке уведомления: {str(e)}")
+                return False
+
+    async def _send_photo(
+            self,
+            chat_id: Union[int, str],
+            photo: bytes,
+            caption: str,
+            priority: int = PRIORITY_ALERT
+    ) -> bool:
+        """Отправляет изображение с подписью через очередь (если она задана)"""
+        with tracer.span('telegram.send', method='sendPhoto', chat_id=str(chat_id), queued=self.send_queue is not None) as span:
+            if self.send_queue is not None:
+                sent = await self.send_queue.send_photo(chat_id, photo, caption, priority=priority, parse_mode='HTML')
+                span.set(sent=sent)
+                return sent
+
+            try:
+                await self.bot.send_photo(
+                    chat_id=chat_id,
+                    photo=BufferedInputFile(photo, filename='chart.png'),
+                    caption=caption,
+                    parse_mode='HTML'
+                )
+                return True
+            except Exception as e:
+                span.record_error(e)
+                logger.error(f"Ошибка при отправке графика: {str(e)}")
+                return False
 
     async def get_notification_group_id(self) -> str:
         """Получает ID группы для отправки уведомлений из настроек или конфига"""
-        query = select(BotSettings).where(BotSettings.key == 'notification_group_id')
-        result = await self.session.execute(query)
-        setting = result.scalar_one_or_none()
-
-        if setting and setting.value:
-            return setting.value
-        
         # Если настройка не найдена в БД, используем значение из конфига
-        return NOTIFICATION_GROUP_ID
+        return await settings_cache.get_str(self.session, 'notification_group_id', NOTIFICATION_GROUP_ID)
     
     async def get_bot_status(self) -> bool:
         """Проверяет, активен ли бот для отправки уведомлений"""
-        query = select(BotSettings).where(BotSettings.key == 'bot_active')
-        result = await self.session.execute(query)
-        setting = result.scalar_one_or_none()
-
         # По умолчанию бот активен
-        if setting is None or setting.value_bool is None:
-            return  True
-        
-        return setting.value_bool
+        return await settings_cache.get_bool(self.session, 'bot_active', True)
     
+    async def get_notification_mode(self) -> str:
+        """
+        Получает режим уведомлений: single - отдельное сообщение на каждую
+        дивергенцию, digest - одна сводка за окно времени
+        """
+        mode = await settings_cache.get_str(self.session, 'notification_mode', NOTIFICATION_MODE)
+        return mode if mode in ('single', 'digest') else 'single'
+
+    async def get_digest_window(self) -> int:
+        """Получает окно накопления дивергенций для сводки (в секундах)"""
+        return await settings_cache.get_int(self.session, 'digest_window', DIGEST_WINDOW)
+
+    async def get_chart_window(self) -> Optional[int]:
+        """Период графика к уведомлениям в часах или None, если графики отключены"""
+        if not await settings_cache.get_bool(self.session, 'attach_charts', ATTACH_CHARTS):
+            return None
+        hours = await settings_cache.get_int(self.session, 'chart_window_hours', CHART_WINDOW_HOURS)
+        # История старше PRICE_HISTORY_HOURS не хранится
+        return min(hours, PRICE_HISTORY_HOURS)
+
+    async def get_chart(self, divergence: Divergence, window_hours: int) -> Optional[bytes]:
+        """Возвращает график соотношения цен пар дивергенции"""
+        return await chart_renderer.get_chart(
+            divergence.pair1_symbol,
+            divergence.pair2_symbol,
+            divergence.detected_at,
+            window_hours,
+            (divergence.pair1_price, divergence.pair2_price)
+        )
+
+    async def _send_alert(
+            self,
+            chat_id: Union[int, str],
+            divergence: Divergence,
+            text: str,
+            chart_window: Optional[int]
+    ) -> bool:
+        """Отправляет уведомление о дивергенции, с графиком, если он включен и построен"""
+        if chart_window and len(text) <= TELEGRAM_CAPTION_LIMIT:
+            chart = await self.get_chart(divergence, chart_window)
+            if chart is not None and await self._send_photo(chat_id, chart, text):
+                return True
+        return await self._send_message(chat_id, text)
+
+    async def _send_digest_chart(self, chat_id: Union[int, str], divergence: Divergence, chart_window: int) -> bool:
+        """Отправляет график крупнейшей дивергенции сводки"""
+        chart = await self.get_chart(divergence, chart_window)
+        if chart is None:
+            return False
+        caption = (
+            f"📊 Крупнейшая дивергенция: <b>{divergence.pair1_symbol}/{divergence.pair2_symbol}</b> "
+            f"{abs(divergence.divergence_percent):.2f}%"
+        )
+        return await self._send_photo(chat_id, chart, caption, priority=PRIORITY_DIGEST)
+
     async def format_divergence_message(self, divergence: Divergence) -> str:
         """Форматирует сообщение о дивергенции для отправки"""
         message = (
@@ -60,54 +214,327 @@ class NotificationService:
 
         return message
     
-    async def send_divergence_notification(self, divergence: Divergence) -> bool:
-        """Отправляет уведомление о дивергенции в Telegram группу"""
-        # Проверяем, активен ли бот
-        if not await self.get_bot_status():
-            logger.info('Бот не активен, уведомления не отправляются')
-            return False
-        
+    def format_digest_messages(self, divergences: List[Divergence]) -> List[Tuple[str, List[Divergence]]]:
+        """
+        Форматирует сводку дивергенций в виде компактной таблицы
+
+        Таблица разбивается на несколько сообщений, чтобы каждое укладывалось
+        в лимит Telegram. Возвращает пары (текст сообщения, дивергенции в нем).
+        """
+        if not divergences:
+            return []
+
+        ordered = sorted(divergences, key=lambda d: abs(d.divergence_percent), reverse=True)
+        labels = [f"{d.pair1_symbol}/{d.pair2_symbol}" for d in ordered]
+        width = max(len(label) for label in labels)
+
+        chunks: List[List[Tuple[str, Divergence]]] = [[]]
+        size = 0
+        for label, divergence in zip(labels, ordered):
+            arrow = '▲' if divergence.divergence_percent > 0 else '▼'
+            line = f"{label.ljust(width)} {abs(divergence.divergence_percent):7.2f}% {arrow}"
+            if chunks[-1] and size + len(line) + 1 > TELEGRAM_MESSAGE_LIMIT - DIGEST_HEADER_RESERVE:
+                chunks.append([])
+                size = 0
+            chunks[-1].append((line, divergence))
+            size += len(line) + 1
+
+        started = min(d.detected_at for d in ordered).strftime('%H:%M')
+        finished = max(d.detected_at for d in ordered).strftime('%H:%M')
+        period = started if started == finished else f"{started}–{finished}"
+
+        messages = []
+        for index, chunk in enumerate(chunks, start=1):
+            part = f" (часть {index}/{len(chunks)})" if len(chunks) > 1 else ''
+            table = '\n'.join(line for line, _ in chunk)
+            text = (
+                f"🔔 <b>Дивергенции: {len(ordered)}</b>{part}\n"
+                f"<b>Время:</b> {period} UTC\n"
+                f"<pre>{'Пары'.ljust(width)} {'Δ':>8} \n{table}</pre>\n"
+                "▲ пары расходятся, ▼ пары сходятся"
+            )
+            messages.append((text, [divergence for _, divergence in chunk]))
+
+        return messages
+
+    async def get_recipients(self, divergences: List[Divergence]) -> Optional[Dict[str, List[Divergence]]]:
+        """
+        Распределяет дивергенции по чатам-получателям
+
+        Группа из настроек получает все дивергенции, подписки - только
+        подходящие по паре, порогу и тихим часам. Возвращает None, если
+        не настроено ни одного получателя.
+        """
         group_id = await self.get_notification_group_id()
-        if not group_id:
+        index = await subscription_registry.get_index(self.session)
+        if not group_id and not len(index):
+            return None
+
+        now = datetime.now(timezone.utc)
+        recipients: Dict[str, List[Divergence]] = {}
+        for divergence in divergences:
+            chat_ids = {str(rule.chat_id) for rule in index.match(divergence, now)}
+            if group_id:
+                chat_ids.add(str(group_id))
+            for chat_id in chat_ids:
+                recipients.setdefault(chat_id, []).append(divergence)
+        return recipients
+
+    async def get_deliveries(self, ids: List[int]) -> Dict[Tuple[int, str], NotificationDelivery]:
+        """Доставки дивергенций по чатам, записанные прошлыми попытками отправки"""
+        result = await self.session.execute(
+            select(NotificationDelivery).where(NotificationDelivery.divergence_id.in_(ids))
+        )
+        return {(delivery.divergence_id, delivery.chat_id): delivery for delivery in result.scalars()}
+
+    async def _deliver(self, divergences: List[Divergence], digest: bool) -> List[int]:
+        """
+        Отправляет дивергенции всем получателям одновременно
+
+        Сообщения в разные чаты ставятся в очередь разом, лимиты каждого чата
+        соблюдает очередь отправки. Доставка учитывается по каждому чату:
+        чаты, уже получившие дивергенцию при прошлой попытке, пропускаются, а
+        неудачные повторяются, пока не исчерпают NOTIFICATION_MAX_ATTEMPTS.
+        Дивергенция отмечается отправленной, когда все подходящие чаты получили
+        ее или исчерпали попытки. Возвращает ID таких дивергенций.
+        """
+        recipients = await self.get_recipients(divergences)
+        if recipients is None:
             logger.error('ID группы для уведомлений не найден')
-            return False
-        
-        message = await self.format_divergence_message(divergence)
+            return []
+
+        deliveries = await self.get_deliveries([divergence.id for divergence in divergences])
+        chart_window = await self.get_chart_window()
+        # Транзакция чтения настроек не должна оставаться открытой на время отправки
+        await self.session.commit()
+
+        self._remaining = {divergence.id: set() for divergence in divergences}
+        self._attempts = {key: delivery.attempts for key, delivery in deliveries.items()}
+        self._saved = {divergence_id for divergence_id, _ in deliveries}
+        for chat_id, items in recipients.items():
+            recipients[chat_id] = [
+                divergence for divergence in items
+                if deliveries.get((divergence.id, chat_id)) is None
+                or deliveries[(divergence.id, chat_id)].status == DELIVERY_PENDING
+            ]
+            for divergence in recipients[chat_id]:
+                self._remaining[divergence.id].add(chat_id)
+
+        # Дивергенции без оставшихся получателей отмечаются сразу
+        await self._save_deliveries()
+
+        async def send_and_record(chat_id: str, chunk: List[Divergence], send) -> None:
+            sent = await send
+            self._record_delivery(chat_id, chunk, sent)
+            await self._save_deliveries()
+
+        sends = []
+        for chat_id, items in recipients.items():
+            if not items:
+                continue
+            if digest:
+                if chart_window:
+                    # График не влияет на статус доставки сводки
+                    top = max(items, key=lambda d: abs(d.divergence_percent))
+                    sends.append(send_and_record(chat_id, [], self._send_digest_chart(chat_id, top, chart_window)))
+                for text, chunk in self.format_digest_messages(items):
+                    sends.append(send_and_record(chat_id, chunk, self._send_message(chat_id, text, priority=PRIORITY_DIGEST)))
+            else:
+                for divergence in items:
+                    text = await self.format_divergence_message(divergence)
+                    sends.append(send_and_record(chat_id, [divergence], self._send_alert(chat_id, divergence, text, chart_window)))
+
+        await asyncio.gather(*sends)
+        return [divergence.id for divergence in divergences if divergence.id in self._marked]
+
+    def _record_delivery(self, chat_id: str, chunk: List[Divergence], sent: bool) -> None:
+        """Учитывает результат отправки сообщения с дивергенциями chunk в чат"""
+        now = datetime.now(timezone.utc)
+        for divergence in chunk:
+            key = (divergence.id, chat_id)
+            attempts = self._attempts.get(key, 0) + 1
+            self._attempts[key] = attempts
+
+            if sent:
+                status = DELIVERY_SENT
+            elif attempts >= NOTIFICATION_MAX_ATTEMPTS:
+                status = DELIVERY_FAILED
+                logger.warning(f"Уведомление о дивергенции {divergence.id} не доставлено в чат {chat_id} за {attempts} попыток")
+            else:
+                status = DELIVERY_PENDING
+
+            if status != DELIVERY_PENDING:
+                self._remaining[divergence.id].discard(chat_id)
+            self._unsaved[key] = {
+                'divergence_id': divergence.id,
+                'chat_id': chat_id,
+                'status': status,
+                'attempts': attempts,
+                'updated_at': now
+            }
+
+    async def _save_deliveries(self) -> None:
+        """
+        Записывает результаты доставки в отдельной короткой транзакции
+
+        Дивергенции, доставленные всем получателям, отмечаются отправленными,
+        их строки доставки удаляются. Результаты, накопившиеся, пока пишется
+        предыдущая транзакция, записываются следующей одними запросами.
+        Запись по мере отправки намеренна (после сбоя доставленное не
+        отправляется повторно), поэтому ее повторы в пачке не считаются N+1.
+        """
+        async with self._db_lock:
+            with allow_repeats('notifications.save_deliveries'):
+                completed = {
+                    divergence_id for divergence_id, chats in self._remaining.items()
+                    if not chats and divergence_id not in self._marked
+                }
+                rows = [row for key, row in self._unsaved.items() if key[0] not in completed]
+                self._unsaved.clear()
+                if not rows and not completed:
+                    return
+
+                if rows:
+                    statement = upsert(self.session, NotificationDelivery).values(rows)
+                    await self.session.execute(statement.on_conflict_do_update(
+                        index_elements=['divergence_id', 'chat_id'],
+                        set_={
+                            'status': statement.excluded.status,
+                            'attempts': statement.excluded.attempts,
+                            'updated_at': statement.excluded.updated_at
+                        }
+                    ))
+                    self._saved.update(row['divergence_id'] for row in rows)
+                if completed:
+                    await self.session.execute(
+                        update(Divergence)
+                        .where(Divergence.id.in_(completed))
+                        .values(
+                            notification_sent=True,
+                            notified_at=datetime.now(timezone.utc),
+                            claimed_until=None,
+                            claimed_by=None
+                        )
+                        .execution_options(synchronize_session=False)
+                    )
+                    if completed & self._saved:
+                        await self.session.execute(
+                            delete(NotificationDelivery)
+                            .where(NotificationDelivery.divergence_id.in_(completed & self._saved))
+                        )
+                await self.session.commit()
+                self._marked.update(completed)
+
+    async def send_digest(self, divergences: List[Divergence]) -> List[int]:
+        """
+        Отправляет сводку дивергенций получателям, каждому - свою
+
+        Возвращает ID обработанных дивергенций
+        """
+        return await self._deliver(divergences, digest=True)
+
+    async def send_divergence_notifications(self, divergences: List[Divergence]) -> List[int]:
+        """
+        Отправляет уведомления о нескольких дивергенциях одновременно
+
+        Сообщения ставятся в очередь разом, поэтому всплеск уходит так быстро,
+        как позволяют лимиты Telegram. Возвращает ID обработанных дивергенций.
+        """
+        return await self._deliver(divergences, digest=False)
+
+    async def send_divergence_notification(self, divergence: Divergence) -> bool:
+        """Отправляет уведомление о дивергенции в Telegram группу и чаты подписок"""
+        return bool(await self.send_divergence_notifications([divergence]))
         
-        try:
-            await self.bot.send_message(
-                chat_id=group_id,
-                text=message,
-                parse_mode='HTML'
+    async def has_pending_notifications(self) -> bool:
+        """Есть ли уведомления, которые можно захватить сейчас"""
+        result = await self.session.execute(
+            select(Divergence.id).where(pending_notifications_filter(datetime.now(timezone.utc))).limit(1)
+        )
+        return result.first() is not None
+
+    async def claim_pending_notifications(self, batch_size: int, token: str) -> List[Divergence]:
+        """
+        Захватывает пачку уведомлений на OUTBOX_CLAIM_TIMEOUT секунд
+
+        Строки выбираются через FOR UPDATE SKIP LOCKED, помечаются захватом и
+        транзакция сразу завершается: блокировки строк не держатся на время
+        отправки, а другие обработчики пропускают захваченные строки.
+        """
+        now = datetime.now(timezone.utc)
+        result = await self.session.execute(pending_notifications_query(batch_size, now))
+        divergences = result.scalars().all()
+
+        if divergences:
+            await self.session.execute(
+                update(Divergence)
+                .where(Divergence.id.in_([divergence.id for divergence in divergences]))
+                .values(claimed_until=now + timedelta(seconds=OUTBOX_CLAIM_TIMEOUT), claimed_by=token)
+                .execution_options(synchronize_session=False)
             )
-            return True
-        except Exception as e:
-            logger.error(f"Ошибка при отправке уведомления: {str(e)}")
-            return False
-        
-    async def process_pending_notifications(self) -> int:
+        await self.session.commit()
+        return divergences
+
+    async def _update_claims(self, token: str, ids: List[int], delay: float, owner: Optional[str]) -> None:
+        """Переносит срок захвата еще не отправленных строк пачки"""
+        async with self._db_lock:
+            await self.session.execute(
+                update(Divergence)
+                .where(
+                    Divergence.id.in_(ids),
+                    Divergence.claimed_by == token,
+                    Divergence.notification_sent == False
+                )
+                .values(claimed_until=datetime.now(timezone.utc) + timedelta(seconds=delay), claimed_by=owner)
+                .execution_options(synchronize_session=False)
+            )
+            await self.session.commit()
+
+    async def _renew_claims(self, token: str, ids: List[int], finished: asyncio.Event) -> None:
+        """Продлевает захват, пока пачка отправляется (очередь Telegram может быть медленной)"""
+        while not finished.is_set():
+            try:
+                await asyncio.wait_for(finished.wait(), timeout=OUTBOX_CLAIM_TIMEOUT / 3)
+            except asyncio.TimeoutError:
+                await self._update_claims(token, ids, OUTBOX_CLAIM_TIMEOUT, token)
+
+    async def process_pending_notifications(self, batch_size: int = OUTBOX_BATCH_SIZE) -> int:
         """
-        Обрабатывает все ожидающие уведомления о дивергенциях
-        
+        Обрабатывает пачку ожидающих уведомлений о дивергенциях (outbox)
+
+        Пачка захватывается короткой транзакцией (claim_pending_notifications),
+        отправляется вне транзакции, а каждое доставленное уведомление сразу
+        отмечается отправленным. Несколько обработчиков разбирают очередь
+        параллельно, не беря чужие строки. Если процесс упадет, захват истечет
+        через OUTBOX_CLAIM_TIMEOUT и неотмеченные строки заберет другой
+        обработчик; повторно может уйти только сообщение, отправленное перед
+        самым падением. Неудавшиеся уведомления повторяются через OUTBOX_RETRY_DELAY.
+
         Возвращает количество успешно отправленных уведомлений
         """
-        # Получаем все неотправленные уведомления
-        query = select(Divergence).where(Divergence.notification_sent == False)
-        result = await self.session.execute(query)
-        pending_divergence = result.scalars().all()
+        if not await self.get_bot_status():
+            logger.info('Бот не активен, уведомления не отправляются')
+            await self.session.commit()
+            return 0
 
-        if not pending_divergence:
+        token = uuid4().hex
+        pending_divergences = await self.claim_pending_notifications(batch_size, token)
+        if not pending_divergences:
             return 0
-        
-        sent_count = 0
-        for divergence in pending_divergence:
-            success = await self.send_divergence_notification(divergence)
-            if success:
-                # Отмечаем как отправленное
-                divergence.notification_sent = True
-                sent_count += 1
-        
-        # Сохраняем изменения в БД
-        await self.session().commit()
-        return sent_count()
 
+        ids = [divergence.id for divergence in pending_divergences]
+        finished = asyncio.Event()
+        renewal = asyncio.create_task(self._renew_claims(token, ids, finished))
+        try:
+            if await self.get_notification_mode() == 'digest':
+                sent_ids = await self.send_digest(pending_divergences)
+            else:
+                sent_ids = await self.send_divergence_notifications(pending_divergences)
+        finally:
+            finished.set()
+            await renewal
+
+        # Неотправленные строки освобождаются для повтора после паузы
+        if len(sent_ids) < len(ids):
+            await self._update_claims(token, ids, OUTBOX_RETRY_DELAY, None)
+        return len(sent_ids)
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from typing import Optional
+from aiogram import Bot
+from app.config import OUTBOX_BATCH_SIZE, OUTBOX_POLL_INTERVAL
+from app.database.engine import get_session
+from app.database.query_counter import QueryCounter
+from app.services.notifications import NotificationService
+from app.services.telegram_queue import TelegramSendQueue
+from app.utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxWorker:
+    """
+    Обработчик outbox уведомлений о дивергенциях
+
+    Дивергенции записываются детектором с notification_sent = false, а
+    обработчик разбирает их пачками. Он просыпается по wake() (событие NOTIFY
+    или дивергенции в том же процессе) и периодически на случай пропущенных
+    событий. В режиме сводки обработчик ждет окно перед захватом, если есть
+    что отправлять, чтобы всплеск дивергенций ушел одним сообщением.
+    """
+
+    def __init__(
+            self,
+            bot: Bot,
+            send_queue: Optional[TelegramSendQueue] = None,
+            batch_size: int = OUTBOX_BATCH_SIZE,
+            poll_interval: float = OUTBOX_POLL_INTERVAL
+    ):
+        self.bot = bot
+        self.send_queue = send_queue
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+
+        self._wake_event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def wake(self, *args) -> None:
+        """Сигнализирует о появлении новых уведомлений"""
+        self._wake_event.set()
+
+    async def wake_async(self, *args) -> None:
+        """Асинхронный вариант wake() для обработчиков событий"""
+        self.wake()
+
+    def start(self) -> None:
+        """Запускает обработчик в фоне"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Останавливает обработчик"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        # При запуске дорабатываем уведомления, оставшиеся после остановки
+        self._wake_event.set()
+
+        while True:
+            try:
+                await asyncio.wait_for(self._wake_event.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake_event.clear()
+
+            try:
+                await self.drain()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка при обработке outbox уведомлений: {str(e)}")
+
+    async def drain(self) -> int:
+        """Отправляет ожидающие уведомления, пока очередь не опустеет"""
+        total_sent = 0
+        first_batch = True
+
+        while True:
+            async for session in get_session():
+                notification_service = NotificationService(self.bot, session, self.send_queue)
+
+                if first_batch and await notification_service.get_notification_mode() == 'digest':
+                    # Даем всплеску накопиться, чтобы отправить его одной сводкой
+                    # (пустой опрос окна не ждет)
+                    pending = await notification_service.has_pending_notifications()
+                    await session.commit()
+                    if pending:
+                        await asyncio.sleep(await notification_service.get_digest_window())
+                first_batch = False
+
+                with tracer.trace('outbox.batch', batch_size=self.batch_size) as span, QueryCounter('outbox.batch'):
+                    sent = await notification_service.process_pending_notifications(self.batch_size)
+                    span.set(sent=sent)
+
+            total_sent += sent
+            # Пустая или неудачная пачка - ждем следующего события
+            if sent == 0:
+                break
+
+        if total_sent:
+            logger.info(f"Отправлено уведомлений из outbox: {total_sent}")
+        return total_sent
@@ -0,0 +1,196 @@
+import csv
+import io
+import re
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.config import DEFAULT_DIVERGENCE_THRESHOLD
+from app.database.dialect import upsert
+from app.database.models import CurrencyPair
+from app.services.binance_api import BinanceAPI
+from app.services.settings_cache import settings_cache
+
+logger = logging.getLogger(__name__)
+
+# Не больше стольких символов за один импорт
+MAX_IMPORT_SYMBOLS = 2000
+
+TOKEN_SEPARATORS = re.compile(r'[\s,;]+')
+
+# (котируемый актив, минимальный объем за 24 часа в котируемом активе)
+QuotePattern = Tuple[str, Optional[float]]
+
+
+@dataclass
+class ImportRequest:
+    """Разобранный список для импорта: символы и шаблоны вида *USDT >1000000"""
+    symbols: List[str] = field(default_factory=list)
+    patterns: List[QuotePattern] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+
+    def add_symbol(self, token: str) -> None:
+        symbol = token.strip().upper()
+        if symbol and symbol not in self.symbols:
+            self.symbols.append(symbol)
+
+
+@dataclass
+class ImportSummary:
+    """Итог импорта (пропускаются уже активные пары и символы сверх MAX_IMPORT_SYMBOLS)"""
+    added: List[str] = field(default_factory=list)
+    activated: List[str] = field(default_factory=list)
+    skipped: List[str] = field(default_factory=list)
+    invalid: List[str] = field(default_factory=list)
+    # Фрагменты списка, которые не удалось разобрать (например, >abc)
+    errors: List[str] = field(default_factory=list)
+
+
+def parse_import_text(text: str) -> ImportRequest:
+    """
+    Разбирает вставленный список пар
+
+    Символы разделяются пробелами, запятыми или переводами строк. Шаблон
+    *USDT добавляет все торгуемые пары с котируемым активом USDT, а >X после
+    него в той же строке оставляет только пары с объемом за 24 часа больше X.
+    """
+    request = ImportRequest()
+    for line in text.splitlines():
+        pattern: Optional[str] = None
+        for token in TOKEN_SEPARATORS.split(line.strip()):
+            if not token:
+                continue
+            if token.startswith('*'):
+                pattern = token[1:].upper()
+                request.patterns.append((pattern, None))
+            elif token.startswith('>'):
+                try:
+                    min_volume = float(token[1:].replace('_', ''))
+                except ValueError:
+                    request.errors.append(token)
+                    continue
+                if pattern is None:
+                    request.errors.append(token)
+                    continue
+                request.patterns[-1] = (pattern, min_volume)
+            else:
+                request.add_symbol(token)
+    return request
+
+
+def parse_import_csv(content: bytes) -> ImportRequest:
+    """Разбирает CSV-файл: символ пары в первой колонке, строка заголовка пропускается"""
+    request = ImportRequest()
+    text = content.decode('utf-8-sig', errors='replace')
+    for row in csv.reader(io.StringIO(text)):
+        if not row or not row[0].strip():
+            continue
+        cell = row[0].strip()
+        if cell.lower() == 'symbol':
+            continue
+        if cell.startswith('*'):
+            request.patterns.extend(parse_import_text(cell).patterns)
+        else:
+            request.add_symbol(cell)
+    return request
+
+
+class PairImporter:
+    """
+    Массовый импорт валютных пар
+
+    Все символы проверяются по одному снимку exchangeInfo (и статистики за
+    24 часа, если в шаблонах задан объем), после чего новые пары добавляются,
+    а неактивные включаются одним INSERT ... ON CONFLICT.
+    """
+
+    def __init__(self, binance_api: Optional[BinanceAPI] = None):
+        self.binance_api = binance_api or BinanceAPI()
+
+    async def resolve(self, request: ImportRequest) -> Tuple[Dict[str, Dict], List[str]]:
+        """Возвращает описания найденных на бирже пар и список неизвестных символов"""
+        trading = {
+            pair['symbol']: pair
+            for pair in await self.binance_api.get_available_pairs()
+            if pair.get('status') == 'TRADING'
+        }
+
+        resolved: Dict[str, Dict] = {}
+        invalid: List[str] = []
+        for symbol in request.symbols:
+            if symbol in trading:
+                resolved[symbol] = trading[symbol]
+            else:
+                invalid.append(symbol)
+
+        if request.patterns:
+            volumes: Dict[str, float] = {}
+            if any(min_volume is not None for _, min_volume in request.patterns):
+                volumes = {
+                    ticker['symbol']: float(ticker.get('quoteVolume') or 0)
+                    for ticker in await self.binance_api.get_24hr_tickers()
+                }
+            for quote_asset, min_volume in request.patterns:
+                for symbol, pair in trading.items():
+                    if pair.get('quoteAsset') != quote_asset:
+                        continue
+                    if min_volume is not None and volumes.get(symbol, 0) <= min_volume:
+                        continue
+                    resolved.setdefault(symbol, pair)
+
+        return resolved, invalid
+
+    async def import_pairs(self, session: AsyncSession, request: ImportRequest) -> ImportSummary:
+        """Проверяет символы и добавляет или включает пары, commit выполняется здесь"""
+        resolved, invalid = await self.resolve(request)
+        summary = ImportSummary(invalid=invalid, errors=list(request.errors))
+        if not resolved:
+            return summary
+
+        symbols = sorted(resolved)[:MAX_IMPORT_SYMBOLS]
+        summary.skipped.extend(sorted(resolved)[MAX_IMPORT_SYMBOLS:])
+
+        result = await session.execute(
+            select(CurrencyPair.symbol, CurrencyPair.is_active).where(CurrencyPair.symbol.in_(symbols))
+        )
+        existing = {symbol: is_active for symbol, is_active in result.all()}
+        for symbol in symbols:
+            if symbol not in existing:
+                summary.added.append(symbol)
+            elif existing[symbol]:
+                summary.skipped.append(symbol)
+            else:
+                summary.activated.append(symbol)
+
+        changed = summary.added + summary.activated
+        if changed:
+            threshold = await settings_cache.get_float(
+                session, 'default_divergence_threshold', DEFAULT_DIVERGENCE_THRESHOLD
+            )
+            statement = upsert(session, CurrencyPair).values([
+                {
+                    'symbol': symbol,
+                    'base_asset': resolved[symbol]['baseAsset'],
+                    'quote_asset': resolved[symbol]['quoteAsset'],
+                    'is_active': True,
+                    'devergence_threshold': threshold
+                }
+                for symbol in changed
+            ])
+            statement = statement.on_conflict_do_update(
+                index_elements=['symbol'],
+                set_={'is_active': True}
+            )
+            await session.execute(statement)
+            await session.commit()
+
+        logger.info(
+            f"Импорт пар: добавлено {len(summary.added)}, включено {len(summary.activated)}, "
+            f"пропущено {len(summary.skipped)}, не найдено {len(summary.invalid)}, "
+            f"не разобрано {len(summary.errors)}"
+        )
+        return summary
+
+
+pair_importer = PairImporter()
@@ -0,0 +1,85 @@
+import re
+import logging
+from dataclasses import dataclass, field
+from typing import List, Optional
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.database.models import CurrencyPair
+
+logger = logging.getLogger(__name__)
+
+# Количество пар на одной странице списка в админ-панели
+PAIRS_PAGE_SIZE = 20
+
+# Префикс поиска попадает в callback_data кнопок (не больше 64 байт)
+MAX_PREFIX_LENGTH = 16
+
+
+def normalize_prefix(text: Optional[str]) -> str:
+    """Оставляет в префиксе поиска только символы, допустимые в названии пары"""
+    return re.sub(r'[^A-Z0-9]', '', (text or '').upper())[:MAX_PREFIX_LENGTH]
+
+
+@dataclass
+class PairsPage:
+    """Страница списка валютных пар"""
+    pairs: List[CurrencyPair] = field(default_factory=list)
+    prefix: str = ''
+    has_prev: bool = False
+    has_next: bool = False
+
+    @property
+    def first_symbol(self) -> Optional[str]:
+        return self.pairs[0].symbol if self.pairs else None
+
+    @property
+    def last_symbol(self) -> Optional[str]:
+        return self.pairs[-1].symbol if self.pairs else None
+
+
+def pairs_page_query(
+        prefix: str = '',
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+        limit: int = PAIRS_PAGE_SIZE
+) -> Select:
+    """
+    Запрос страницы пар по символу (keyset-пагинация)
+
+    after - следующая страница после символа, before - предыдущая страница
+    до символа (выбирается в обратном порядке). Поиск по префиксу использует
+    индекс ix_currency_pairs_symbol_pattern.
+    """
+    query = select(CurrencyPair)
+    if prefix:
+        query = query.where(CurrencyPair.symbol.like(f'{prefix}%'))
+    if before is not None:
+        return query.where(CurrencyPair.symbol < before).order_by(CurrencyPair.symbol.desc()).limit(limit)
+    if after is not None:
+        query = query.where(CurrencyPair.symbol > after)
+    return query.order_by(CurrencyPair.symbol).limit(limit)
+
+
+async def get_pairs_page(
+        session: AsyncSession,
+        prefix: str = '',
+        after: Optional[str] = None,
+        before: Optional[str] = None,
+        page_size: int = PAIRS_PAGE_SIZE
+) -> PairsPage:
+    """
+    Возвращает страницу пар, выбирая из БД только ее строки
+
+    Одна лишняя строка в запросе показывает, есть ли страница дальше в
+    направлении перехода, без подсчета общего количества.
+    """
+    result = await session.execute(pairs_page_query(prefix, after, before, page_size + 1))
+    pairs = list(result.scalars().all())
+    more = len(pairs) > page_size
+    pairs = pairs[:page_size]
+
+    if before is not None:
+        pairs.reverse()
+        return PairsPage(pairs=pairs, prefix=prefix, has_prev=more, has_next=True)
+    return PairsPage(pairs=pairs, prefix=prefix, has_prev=after is not None, has_next=more)
@@ -0,0 +1,178 @@
+import re
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from sqlalchemy import delete, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+from app.config import DIVERGENCE_RETENTION_DAYS, PARTITIONS_AHEAD
+from app.database.models import Divergence
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = 'divergences'
+DEFAULT_PARTITION = 'divergences_default'
+PARTITION_PATTERN = re.compile(r'^divergences_p(\d{4})(\d{2})$')
+
+
+def month_start(moment: datetime) -> datetime:
+    """Начало месяца (UTC)"""
+    moment = moment.astimezone(timezone.utc)
+    return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """Сдвигает начало месяца на указанное количество месяцев"""
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month: datetime) -> str:
+    return f'{PARENT_TABLE}_p{month:%Y%m}'
+
+
+class PartitionManager:
+    """
+    Обслуживание месячных секций таблицы дивергенций
+
+    Создает секции заранее и удаляет секции старше срока хранения целиком:
+    DROP секции не оставляет мертвых строк и не требует VACUUM, в отличие
+    от DELETE. Почасовая сводка при этом сохраняется. Если обслуживание
+    отстало, вставка попадает в секцию по умолчанию (DEFAULT_PARTITION), а
+    при создании месячной секции ее строки переносятся туда.
+    """
+
+    def __init__(
+            self,
+            engine: AsyncEngine,
+            retention_days: int = DIVERGENCE_RETENTION_DAYS,
+            months_ahead: int = PARTITIONS_AHEAD
+    ):
+        self.engine = engine
+        self.retention_days = retention_days
+        self.months_ahead = months_ahead
+
+    async def _is_partitioned(self, connection: AsyncConnection) -> bool:
+        result = await connection.execute(
+            # relkind имеет тип "char", который asyncpg возвращает как bytes, поэтому сравниваем в SQL
+            text("SELECT relkind = 'p' FROM pg_class WHERE relname = :name AND relkind IN ('p', 'r')"),
+            {'name': PARENT_TABLE}
+        )
+        return bool(result.scalar())
+
+    async def _partitions(self, connection: AsyncConnection) -> List[str]:
+        result = await connection.execute(
+            text(
+                "SELECT child.relname FROM pg_inherits "
+                "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+                "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                "WHERE parent.relname = :name"
+            ),
+            {'name': PARENT_TABLE}
+        )
+        return list(result.scalars().all())
+
+    async def _default_has_rows(self, connection: AsyncConnection, month: datetime) -> bool:
+        result = await connection.execute(
+            text(
+                f'SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} '
+                'WHERE detected_at >= :start AND detected_at < :end)'
+            ),
+            {'start': month, 'end': add_months(month, 1)}
+        )
+        return bool(result.scalar())
+
+    async def ensure_partitions(self, connection: AsyncConnection, now: datetime) -> List[str]:
+        """
+        Создает секции с текущего месяца на months_ahead вперед
+
+        Секцию, строки которой уже попали в секцию по умолчанию, нельзя
+        просто создать: секция по умолчанию на время переноса отсоединяется
+        (в той же транзакции), строки месяца переходят в новую секцию.
+        """
+        existing = set(await self._partitions(connection))
+        has_default = DEFAULT_PARTITION in existing
+        created = []
+        current = month_start(now)
+        for offset in range(self.months_ahead + 1):
+            month = add_months(current, offset)
+            name = partition_name(month)
+            if name in existing:
+                continue
+
+            moved = has_default and await self._default_has_rows(connection, month)
+            if moved:
+                await connection.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION {DEFAULT_PARTITION}'))
+            await connection.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT_TABLE} "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+            ))
+            if moved:
+                bounds = {'start': month, 'end': add_months(month, 1)}
+                result = await connection.execute(
+                    text(
+                        f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} '
+                        'WHERE detected_at >= :start AND detected_at < :end RETURNING *) '
+                        f'INSERT INTO {PARENT_TABLE} SELECT * FROM moved'
+                    ),
+                    bounds
+                )
+                await connection.execute(text(f'ALTER TABLE {PARENT_TABLE} ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT'))
+                logger.warning(f"Дивергенции из секции по умолчанию перенесены в {name}: {result.rowcount}")
+            created.append(name)
+        return created
+
+    async def drop_expired(self, connection: AsyncConnection, now: datetime) -> List[str]:
+        """Удаляет секции, все строки которых старше срока хранения"""
+        if self.retention_days <= 0:
+            return []
+
+        cutoff = now - timedelta(days=self.retention_days)
+        dropped = []
+        for name in await self._partitions(connection):
+            if name == DEFAULT_PARTITION:
+                # Строки секции по умолчанию удаляются построчно, их обычно единицы
+                await connection.execute(
+                    text(f'DELETE FROM {DEFAULT_PARTITION} WHERE detected_at < :cutoff'),
+                    {'cutoff': cutoff}
+                )
+                continue
+            match = PARTITION_PATTERN.match(name)
+            if match is None:
+                continue
+            month = datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)
+            if add_months(month, 1) > cutoff:
+                continue
+            await connection.execute(text(f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION {name}'))
+            await connection.execute(text(f'DROP TABLE {name}'))
+            dropped.append(name)
+        return dropped
+
+    async def delete_expired(self, connection: AsyncConnection, now: datetime) -> int:
+        """Удаляет устаревшие записи построчно (БД без секционирования, например SQLite)"""
+        if self.retention_days <= 0:
+            return 0
+        cutoff = now - timedelta(days=self.retention_days)
+        result = await connection.execute(delete(Divergence).where(Divergence.detected_at < cutoff))
+        return result.rowcount
+
+    async def run(self, now: Optional[datetime] = None) -> None:
+        """Создает недостающие секции и удаляет устаревшие"""
+        now = now or datetime.now(timezone.utc)
+        async with self.engine.begin() as connection:
+            if connection.dialect.name != 'postgresql':
+                deleted = await self.delete_expired(connection, now)
+                if deleted:
+                    logger.info(f"Удалено устаревших дивергенций: {deleted}")
+                return
+
+            if not await self._is_partitioned(connection):
+                logger.warning('Таблица дивергенций не секционирована, обслуживание секций пропущено')
+                return
+
+            created = await self.ensure_partitions(connection, now)
+            dropped = await self.drop_expired(connection, now)
+
+        if created:
+            logger.info(f"Созданы секции дивергенций: {', '.join(created)}")
+        if dropped:
+            logger.info(f"Удалены устаревшие секции дивергенций: {', '.join(dropped)}")
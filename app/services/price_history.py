@@ -0,0 +1,121 @@
+import time
+import logging
+from bisect import bisect_left, bisect_right
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from app.config import PRICE_HISTORY_HOURS
+from app.services.binance_api import BinanceAPI
+
+logger = logging.getLogger(__name__)
+
+# Интервалы свечей Binance для догрузки истории (в минутах)
+KLINE_INTERVALS = (('1m', 1), ('3m', 3), ('5m', 5), ('15m', 15), ('30m', 30), ('1h', 60), ('2h', 120))
+
+# Сколько точек догружать на график
+BACKFILL_POINTS = 500
+
+PricePoint = Tuple[float, float]
+
+
+def choose_kline_interval(hours: int) -> Tuple[str, int]:
+    """Подбирает интервал свечей, чтобы период уложился примерно в BACKFILL_POINTS точек"""
+    for interval, minutes in KLINE_INTERVALS:
+        if hours * 60 / minutes <= BACKFILL_POINTS:
+            return interval, minutes
+    return KLINE_INTERVALS[-1]
+
+
+class PriceHistory:
+    """
+    История цен валютных пар в памяти процесса
+
+    Детектор записывает цены каждого цикла проверки, а недостающий период
+    (после запуска или в процессе бота без детектора) догружается свечами
+    Binance. Точки хранятся по времени (unix timestamp), старше max_age
+    отбрасываются.
+    """
+
+    def __init__(self, max_age_hours: int = PRICE_HISTORY_HOURS):
+        self.max_age = max_age_hours * 3600
+        self._points: Dict[str, Deque[PricePoint]] = {}
+
+    def record(self, prices: Dict[str, float], timestamp: Optional[float] = None) -> None:
+        """Записывает цены цикла проверки"""
+        timestamp = timestamp or time.time()
+        for symbol, price in prices.items():
+            points = self._points.setdefault(symbol, deque())
+            if points and points[-1][0] >= timestamp:
+                continue
+            points.append((timestamp, price))
+            self._trim(points, timestamp)
+
+    def _trim(self, points: Deque[PricePoint], now: float) -> None:
+        while points and points[0][0] < now - self.max_age:
+            points.popleft()
+
+    def get(self, symbol: str, since: float, until: Optional[float] = None) -> List[PricePoint]:
+        """Возвращает точки цены за период"""
+        points = list(self._points.get(symbol, ()))
+        timestamps = [point[0] for point in points]
+        start = bisect_left(timestamps, since)
+        end = len(points) if until is None else bisect_right(timestamps, until)
+        return points[start:end]
+
+    def covers(self, symbol: str, since: float, until: float, step: float) -> bool:
+        """Есть ли в истории точки на весь период (с точностью до шага)"""
+        points = self._points.get(symbol)
+        if not points:
+            return False
+        return points[0][0] <= since + step and points[-1][0] >= until - 2 * step
+
+    async def backfill(self, binance_api: BinanceAPI, symbol: str, hours: int, until: Optional[float] = None) -> None:
+        """Догружает историю свечами Binance, если ее не хватает на период"""
+        until = until or time.time()
+        since = until - hours * 3600
+        interval, minutes = choose_kline_interval(hours)
+        if self.covers(symbol, since, until, minutes * 60):
+            return
+
+        klines = await binance_api.get_klines(
+            symbol,
+            interval=interval,
+            limit=min(1000, hours * 60 // minutes + 1),
+            end_time=int(until * 1000)
+        )
+        # Цена закрытия на момент закрытия свечи (у текущей свечи - на момент запроса)
+        loaded = [(min(kline[6] / 1000, until), float(kline[4])) for kline in klines]
+        if not loaded:
+            return
+
+        existing = self._points.get(symbol, deque())
+        merged = deque(point for point in existing if point[0] < loaded[0][0])
+        merged.extend(loaded)
+        merged.extend(point for point in existing if point[0] > loaded[-1][0])
+        self._trim(merged, time.time())
+        self._points[symbol] = merged
+        logger.info(f"Догружена история цен {symbol}: {len(loaded)} свечей {interval}")
+
+
+def align_series(
+        first: List[PricePoint],
+        second: List[PricePoint]
+) -> Tuple[List[float], List[float], List[float]]:
+    """
+    Сопоставляет две истории цен по времени первой
+
+    Для каждой точки первой пары берется последняя известная цена второй
+    пары. Возвращает списки времени и цен обеих пар.
+    """
+    second_times = [point[0] for point in second]
+    timestamps, prices1, prices2 = [], [], []
+    for timestamp, price in first:
+        index = bisect_right(second_times, timestamp) - 1
+        if index < 0:
+            continue
+        timestamps.append(timestamp)
+        prices1.append(price)
+        prices2.append(second[index][1])
+    return timestamps, prices1, prices2
+
+
+price_history = PriceHistory()
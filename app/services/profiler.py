@@ -0,0 +1,287 @@
+import io
+import os
+import sys
+import html
+import time
+import signal
+import asyncio
+import cProfile
+import pstats
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Awaitable, List, Optional, Set, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.config import BOT_TOKEN, SUPERADMIN_IDS, PROFILE_DIR, PROFILE_CYCLES, PROFILE_SAMPLE_INTERVAL
+from app.database.models import BotSettings
+from app.services.settings_cache import settings_cache
+
+logger = logging.getLogger(__name__)
+
+# Настройка с запросом профилирования от админ-панели: {'cycles', 'mode', 'chat_id'}
+PROFILE_REQUEST_KEY = 'profile_request'
+
+PROFILE_MODES = ('cprofile', 'sampling')
+
+# Сколько функций показывать в сводке
+SUMMARY_FUNCTIONS = 15
+
+# Ограничение длины сообщения Telegram
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+def _frame_label(code) -> str:
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """
+    Сэмплирующий профилировщик потока цикла событий
+
+    Отдельный поток каждые interval секунд снимает стек профилируемого
+    потока и считает одинаковые стеки. Результат - collapsed stacks для
+    flamegraph.pl / speedscope. Время ожидания сети и БД видно как стек
+    цикла событий в select.
+    """
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread_id = threading.get_ident()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+                self.samples += 1
+
+    def write_collapsed(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in self.stacks.most_common():
+                file.write(f'{stack} {count}\n')
+
+    def top_functions(self, limit: int = SUMMARY_FUNCTIONS) -> List[Tuple[str, int, int]]:
+        """(функция, собственные сэмплы, сэмплы со вложенными вызовами)"""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(';')
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return [(name, own[name], total[name]) for name, _ in own.most_common(limit)]
+
+
+class CycleProfiler:
+    """
+    Профилирование следующих N циклов проверки дивергенций
+
+    Запрос приходит из админ-панели (через настройку profile_request, чтобы
+    работало и с отдельным процессом детектора) или по сигналу SIGUSR1.
+    Пока запроса нет, цикл выполняется без профилировщика. Профили пишутся
+    в PROFILE_DIR (pstats или collapsed stacks), сводка по самым затратным
+    функциям отправляется в чат администратора.
+
+    Профилировщик видит весь поток цикла событий: если бот работает в том же
+    процессе (роль all), в профиль попадают и его обработчики, и отправка
+    уведомлений, о чем говорится в отчете.
+    """
+
+    def __init__(self, output_dir: str = PROFILE_DIR):
+        self.output_dir = output_dir
+        self._remaining = 0
+        self._mode = 'cprofile'
+        self._chat_ids: List[int] = []
+        self._cycles = 0
+        self._elapsed = 0.0
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+        # Очередь отправки бота, если он работает в том же процессе
+        self._send_queue: Optional[Any] = None
+        self._report_tasks: Set[asyncio.Task] = set()
+
+    def attach_send_queue(self, send_queue) -> None:
+        """Отчеты отправляются через очередь бота того же процесса (роль all)"""
+        self._send_queue = send_queue
+
+    @property
+    def active(self) -> bool:
+        return self._remaining > 0
+
+    def request(self, cycles: int = PROFILE_CYCLES, mode: str = 'cprofile', chat_ids: Optional[List[int]] = None) -> bool:
+        """Запрашивает профилирование следующих cycles циклов, False - если уже идет"""
+        if self.active:
+            return False
+        if mode not in PROFILE_MODES:
+            raise ValueError(f'Неизвестный режим профилирования: {mode}')
+        self._remaining = cycles
+        self._mode = mode
+        self._chat_ids = chat_ids or list(SUPERADMIN_IDS)
+        self._cycles = 0
+        self._elapsed = 0.0
+        self._profile = cProfile.Profile() if mode == 'cprofile' else None
+        self._sampler = StackSampler() if mode == 'sampling' else None
+        logger.info(f"Запрошено профилирование {cycles} циклов ({mode})")
+        return True
+
+    async def poll_request(self, session: AsyncSession) -> None:
+        """Забирает запрос профилирования из настроек (из кэша, без запроса к БД)"""
+        setting = await settings_cache.get(session, PROFILE_REQUEST_KEY)
+        if setting is None or not setting.value_json or self.active:
+            return
+
+        result = await session.execute(select(BotSettings).where(BotSettings.key == PROFILE_REQUEST_KEY))
+        stored = result.scalar_one_or_none()
+        if stored is None or not stored.value_json:
+            return
+        request = stored.value_json
+        stored.value_json = None
+        await session.commit()
+        settings_cache.invalidate()
+
+        chat_id = request.get('chat_id')
+        self.request(
+            cycles=int(request.get('cycles') or PROFILE_CYCLES),
+            mode=request.get('mode') or 'cprofile',
+            chat_ids=[chat_id] if chat_id else None
+        )
+
+    async def run(self, cycle: Awaitable):
+        """Выполняет цикл проверки под профилировщиком"""
+        started = time.perf_counter()
+        if self._profile is not None:
+            self._profile.enable()
+        else:
+            self._sampler.start()
+        try:
+            return await cycle
+        finally:
+            if self._profile is not None:
+                self._profile.disable()
+            else:
+                self._sampler.stop()
+            self._elapsed += time.perf_counter() - started
+            self._cycles += 1
+            self._remaining -= 1
+            if self._remaining == 0:
+                try:
+                    await self._finish()
+                except Exception as e:
+                    logger.error(f"Ошибка при сохранении профиля: {str(e)}")
+
+    async def _finish(self) -> None:
+        profile, sampler = self._profile, self._sampler
+        self._profile = None
+        self._sampler = None
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')
+        base = os.path.join(self.output_dir, f'cycle_{stamp}')
+
+        # Запись профиля на диск не должна останавливать цикл событий
+        loop = asyncio.get_running_loop()
+        if profile is not None:
+            path = f'{base}.pstats'
+            await loop.run_in_executor(None, profile.dump_stats, path)
+            summary = self._cprofile_summary(profile)
+        else:
+            path = f'{base}.collapsed'
+            await loop.run_in_executor(None, sampler.write_collapsed, path)
+            summary = self._sampling_summary(sampler)
+        logger.info(f"Профиль {self._cycles} циклов сохранен в {path}")
+
+        header = (
+            f"🔬 <b>Профиль циклов проверки</b>\n"
+            f"Циклов: {self._cycles}, всего {self._elapsed:.2f} с, режим {self._mode}\n"
+            f"Файл: <code>{html.escape(path)}</code>\n\n"
+        )
+        if self._send_queue is not None:
+            header += (
+                "⚠️ Бот работает в том же процессе: в профиль попали и его обработчики, "
+                "отправка уведомлений и другие задачи цикла событий во время проверки\n\n"
+            )
+        summary = html.escape(summary)
+        max_length = TELEGRAM_MESSAGE_LIMIT - len(header) - len('<pre></pre>')
+        if len(summary) > max_length:
+            # Обрезаем по строкам, чтобы не разорвать HTML-сущность
+            summary = summary[:max_length].rsplit('\n', 1)[0]
+        report = f"{header}<pre>{summary}</pre>"
+
+        # Цикл проверки не ждет доставки: отчет с низким приоритетом может
+        # долго стоять в очереди отправки бота
+        task = asyncio.create_task(self._send_report(report, self._chat_ids))
+        self._report_tasks.add(task)
+        task.add_done_callback(self._report_tasks.discard)
+
+    @staticmethod
+    def _cprofile_summary(profile: cProfile.Profile) -> str:
+        stats = pstats.Stats(profile, stream=io.StringIO())
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:SUMMARY_FUNCTIONS]
+        lines = ['всего с  собств. с  вызовов  функция']
+        for (filename, line, name), (_, calls, own_time, total_time, _) in rows:
+            lines.append(f'{total_time:7.3f}  {own_time:8.3f}  {calls:7d}  {name} ({os.path.basename(filename)}:{line})')
+        return '\n'.join(lines)
+
+    @staticmethod
+    def _sampling_summary(sampler: StackSampler) -> str:
+        samples = sampler.samples or 1
+        lines = [f'сэмплов: {sampler.samples}', 'собств. %  всего %  функция']
+        for name, own, total in sampler.top_functions():
+            lines.append(f'{own / samples:8.1%}  {total / samples:7.1%}  {name}')
+        return '\n'.join(lines)
+
+    async def _send_report(self, text: str, chat_ids: List[int]) -> None:
+        if self._send_queue is not None:
+            from app.services.telegram_queue import PRIORITY_LOW
+
+            for chat_id in chat_ids:
+                if not await self._send_queue.send_message(chat_id, text, priority=PRIORITY_LOW, parse_mode='HTML'):
+                    logger.error(f"Не удалось отправить профиль в чат {chat_id}")
+            return
+
+        # aiogram импортируется только при отправке: процессу детектора он не нужен
+        from aiogram import Bot
+
+        bot = Bot(token=BOT_TOKEN)
+        try:
+            for chat_id in chat_ids:
+                try:
+                    await bot.send_message(chat_id, text, parse_mode='HTML')
+                except Exception as e:
+                    logger.error(f"Не удалось отправить профиль в чат {chat_id}: {str(e)}")
+        finally:
+            await bot.session.close()
+
+    def install_signal_handler(self) -> None:
+        """SIGUSR1 запускает профилирование следующих PROFILE_CYCLES циклов"""
+        if not hasattr(signal, 'SIGUSR1'):
+            return
+        try:
+            asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, self.request)
+        except (NotImplementedError, RuntimeError):
+            logger.warning('Не удалось установить обработчик SIGUSR1 для профилирования')
+
+
+cycle_profiler = CycleProfiler()
@@ -0,0 +1,55 @@
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database.dialect import greatest, upsert
+from app.database.models import Divergence, DivergenceHourly
+
+logger = logging.getLogger(__name__)
+
+
+def hour_of(moment: datetime) -> datetime:
+    """Начало часа (UTC), к которому относится момент времени"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+async def update_hourly_rollup(session: AsyncSession, divergences: List[Divergence]) -> None:
+    """
+    Добавляет дивергенции в почасовую сводку одним запросом
+
+    Строки сводки обновляются через INSERT ... ON CONFLICT, поэтому несколько
+    шардов детектора могут писать в один час одновременно. Commit выполняет
+    вызывающий код.
+    """
+    rows: Dict[Tuple[int, int, datetime], dict] = {}
+    for divergence in divergences:
+        key = (divergence.pair1_id, divergence.pair2_id, hour_of(divergence.detected_at))
+        row = rows.get(key)
+        if row is None:
+            rows[key] = {
+                'pair1_id': divergence.pair1_id,
+                'pair2_id': divergence.pair2_id,
+                'hour': key[2],
+                'pair1_symbol': divergence.pair1_symbol,
+                'pair2_symbol': divergence.pair2_symbol,
+                'divergences_count': 1,
+                'max_divergence': abs(divergence.divergence_percent)
+            }
+        else:
+            row['divergences_count'] += 1
+            row['max_divergence'] = max(row['max_divergence'], abs(divergence.divergence_percent))
+
+    if not rows:
+        return
+
+    statement = upsert(session, DivergenceHourly).values(list(rows.values()))
+    statement = statement.on_conflict_do_update(
+        index_elements=['pair1_id', 'pair2_id', 'hour'],
+        set_={
+            'divergences_count': DivergenceHourly.divergences_count + statement.excluded.divergences_count,
+            'max_divergence': greatest(session, DivergenceHourly.max_divergence, statement.excluded.max_divergence)
+        }
+    )
+    await session.execute(statement)
@@ -0,0 +1,78 @@
+import logging
+import time
+from typing import Dict, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.database.models import BotSettings
+from app.config import SETTINGS_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+
+def _snapshot(setting: BotSettings) -> BotSettings:
+    """Копия настройки, не привязанная к сессии, в которой она загружена"""
+    return BotSettings(
+        key=setting.key,
+        value=setting.value,
+        value_int=setting.value_int,
+        value_bool=setting.value_bool,
+        value_float=setting.value_float,
+        value_json=setting.value_json
+    )
+
+
+class SettingsCache:
+    """
+    Кэш настроек бота из таблицы bot_settings
+
+    Все настройки загружаются одним запросом и обновляются по TTL.
+    Обработчики, изменяющие настройки, сбрасывают кэш через invalidate().
+    """
+
+    def __init__(self, ttl: float = SETTINGS_CACHE_TTL):
+        self.ttl = ttl
+        self._settings: Dict[str, BotSettings] = {}
+        self._loaded_at: Optional[float] = None
+
+    def invalidate(self) -> None:
+        """Сбрасывает кэш, следующее обращение загрузит настройки заново"""
+        self._loaded_at = None
+
+    async def load(self, session: AsyncSession) -> None:
+        """Загружает все настройки из БД"""
+        result = await session.execute(select(BotSettings))
+        self._settings = {setting.key: _snapshot(setting) for setting in result.scalars().all()}
+        self._loaded_at = time.monotonic()
+
+    async def get(self, session: AsyncSession, key: str) -> Optional[BotSettings]:
+        """Возвращает настройку по ключу, при необходимости обновляя кэш"""
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            await self.load(session)
+        return self._settings.get(key)
+
+    async def get_int(self, session: AsyncSession, key: str, default: int) -> int:
+        setting = await self.get(session, key)
+        if setting and setting.value_int:
+            return setting.value_int
+        return default
+
+    async def get_bool(self, session: AsyncSession, key: str, default: bool) -> bool:
+        setting = await self.get(session, key)
+        if setting is not None and setting.value_bool is not None:
+            return setting.value_bool
+        return default
+
+    async def get_float(self, session: AsyncSession, key: str, default: float) -> float:
+        setting = await self.get(session, key)
+        if setting and setting.value_float:
+            return setting.value_float
+        return default
+
+    async def get_str(self, session: AsyncSession, key: str, default: Optional[str]) -> Optional[str]:
+        setting = await self.get(session, key)
+        if setting and setting.value:
+            return setting.value
+        return default
+
+
+settings_cache = SettingsCache()
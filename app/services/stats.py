@@ -0,0 +1,132 @@
+import time
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.database.dialect import seconds_between
+from app.database.models import CurrencyPair, Divergence, DivergenceHourly
+from app.services.rollups import hour_of
+from app.config import STATS_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+# Период для рейтинга пар по количеству дивергенций
+TOP_PAIRS_DAYS = 30
+TOP_PAIRS_LIMIT = 5
+
+
+@dataclass
+class BotStats:
+    """Снимок статистики бота"""
+    active_pairs: int = 0
+    total_pairs: int = 0
+    total_divergences: int = 0
+    divergences_24h: int = 0
+    pending_notifications: int = 0
+    # Среднее время от обнаружения до отправки уведомления за сутки (в секундах)
+    avg_latency_24h: Optional[float] = None
+    last_divergence_at: Optional[datetime] = None
+    # (пара 1, пара 2, количество, максимальная дивергенция) за TOP_PAIRS_DAYS
+    top_pairs: List[Tuple[str, str, int, float]] = field(default_factory=list)
+    collected_at: Optional[datetime] = None
+
+
+class StatsService:
+    """
+    Статистика для админ-панели
+
+    Все показатели считаются агрегатными запросами: количество и сводки по
+    дивергенциям берутся из почасовой сводки, по сырым записям считаются
+    только задержка за сутки, очередь уведомлений и неполный первый час
+    суток, чтобы количество за 24 часа было точным (по индексам). Снимок
+    кэшируется на STATS_CACHE_TTL, поэтому повторные нажатия не нагружают БД.
+    """
+
+    def __init__(self, ttl: float = STATS_CACHE_TTL):
+        self.ttl = ttl
+        self._stats: Optional[BotStats] = None
+        self._loaded_at: Optional[float] = None
+
+    def invalidate(self) -> None:
+        """Сбрасывает снимок статистики"""
+        self._loaded_at = None
+
+    async def collect(self, session: AsyncSession) -> BotStats:
+        """Считает статистику запросами к БД"""
+        now = datetime.now(timezone.utc)
+        day_ago = now - timedelta(days=1)
+        stats = BotStats(collected_at=now)
+
+        result = await session.execute(
+            select(func.count(), func.count().filter(CurrencyPair.is_active == True))
+        )
+        stats.total_pairs, stats.active_pairs = result.one()
+
+        # Полные часы суток берутся из сводки, начало первого часа - из сырых записей
+        first_full_hour = hour_of(day_ago) + timedelta(hours=1)
+        result = await session.execute(
+            select(
+                func.coalesce(func.sum(DivergenceHourly.divergences_count), 0),
+                func.coalesce(
+                    func.sum(DivergenceHourly.divergences_count).filter(DivergenceHourly.hour >= first_full_hour), 0
+                )
+            )
+        )
+        stats.total_divergences, stats.divergences_24h = result.one()
+
+        result = await session.execute(
+            select(func.count()).select_from(Divergence).where(
+                Divergence.detected_at >= day_ago,
+                Divergence.detected_at < first_full_hour
+            )
+        )
+        stats.divergences_24h += result.scalar()
+
+        # max по индексу (detected_at, id) читает одну строку с конца индекса
+        result = await session.execute(select(func.max(Divergence.detected_at)))
+        stats.last_divergence_at = result.scalar()
+
+        result = await session.execute(
+            select(func.count()).select_from(Divergence).where(Divergence.notification_sent == False)
+        )
+        stats.pending_notifications = result.scalar()
+
+        latency = seconds_between(session, Divergence.detected_at, Divergence.notified_at)
+        result = await session.execute(
+            select(func.avg(latency)).where(
+                Divergence.detected_at >= day_ago,
+                Divergence.notified_at != None
+            )
+        )
+        avg_latency = result.scalar()
+        stats.avg_latency_24h = float(avg_latency) if avg_latency is not None else None
+
+        pairs_count = func.sum(DivergenceHourly.divergences_count)
+        result = await session.execute(
+            select(
+                DivergenceHourly.pair1_symbol,
+                DivergenceHourly.pair2_symbol,
+                pairs_count,
+                func.max(DivergenceHourly.max_divergence)
+            )
+            .where(DivergenceHourly.hour >= now - timedelta(days=TOP_PAIRS_DAYS))
+            .group_by(DivergenceHourly.pair1_symbol, DivergenceHourly.pair2_symbol)
+            .order_by(pairs_count.desc())
+            .limit(TOP_PAIRS_LIMIT)
+        )
+        stats.top_pairs = [tuple(row) for row in result.all()]
+
+        return stats
+
+    async def get(self, session: AsyncSession) -> BotStats:
+        """Возвращает снимок статистики, при необходимости пересчитывая его"""
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            self._stats = await self.collect(session)
+            self._loaded_at = time.monotonic()
+        return self._stats
+
+
+stats_service = StatsService()
@@ -0,0 +1,140 @@
+import time
+import logging
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.database.models import Divergence, Subscription
+from app.config import SUBSCRIPTIONS_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SubscriptionRule:
+    """Подписка чата в виде, не привязанном к сессии БД"""
+    id: int
+    chat_id: int
+    symbols: Tuple[str, ...]
+    min_divergence: float
+    quiet_hours_start: Optional[int]
+    quiet_hours_end: Optional[int]
+
+    @classmethod
+    def from_model(cls, subscription: Subscription) -> 'SubscriptionRule':
+        symbols = tuple(
+            symbol.strip().upper()
+            for symbol in (subscription.symbols or '').split(',')
+            if symbol.strip()
+        )
+        return cls(
+            id=subscription.id,
+            chat_id=subscription.chat_id,
+            symbols=symbols,
+            min_divergence=subscription.min_divergence or 0.0,
+            quiet_hours_start=subscription.quiet_hours_start,
+            quiet_hours_end=subscription.quiet_hours_end
+        )
+
+    def is_quiet(self, now: datetime) -> bool:
+        """Попадает ли момент времени в тихие часы подписки (UTC)"""
+        start, end = self.quiet_hours_start, self.quiet_hours_end
+        if start is None or end is None or start == end:
+            return False
+        hour = now.hour
+        if start < end:
+            return start <= hour < end
+        # Интервал через полночь, например 22-7
+        return hour >= start or hour < end
+
+
+class _ThresholdBucket:
+    """Подписки, отсортированные по минимальной дивергенции"""
+
+    def __init__(self, rules: Iterable[SubscriptionRule]):
+        ordered = sorted(rules, key=lambda rule: rule.min_divergence)
+        self.thresholds = [rule.min_divergence for rule in ordered]
+        self.rules = ordered
+
+    def matching(self, value: float) -> List[SubscriptionRule]:
+        """Подписки с порогом не выше значения (бинарный поиск)"""
+        return self.rules[:bisect_right(self.thresholds, value)]
+
+
+class SubscriptionIndex:
+    """
+    Индекс подписок для быстрого поиска получателей дивергенции
+
+    Подписки сгруппированы по символу пары, внутри группы отсортированы по
+    порогу, поэтому поиск получателей - это обращение к словарю и бинарный
+    поиск, а не перебор всех подписок.
+    """
+
+    def __init__(self, rules: Iterable[SubscriptionRule]):
+        rules = list(rules)
+        by_symbol: Dict[str, List[SubscriptionRule]] = {}
+        wildcard = []
+        for rule in rules:
+            if rule.symbols:
+                for symbol in rule.symbols:
+                    by_symbol.setdefault(symbol, []).append(rule)
+            else:
+                wildcard.append(rule)
+
+        self.size = len(rules)
+        self._by_symbol = {symbol: _ThresholdBucket(items) for symbol, items in by_symbol.items()}
+        self._wildcard = _ThresholdBucket(wildcard)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def match(self, divergence: Divergence, now: Optional[datetime] = None) -> List[SubscriptionRule]:
+        """Возвращает подписки, которым нужно отправить дивергенцию"""
+        now = now or datetime.now(timezone.utc)
+        value = abs(divergence.divergence_percent)
+
+        candidates = self._wildcard.matching(value)
+        for symbol in (divergence.pair1_symbol, divergence.pair2_symbol):
+            bucket = self._by_symbol.get(symbol)
+            if bucket is not None:
+                candidates = candidates + bucket.matching(value)
+
+        matched = {}
+        for rule in candidates:
+            if rule.id not in matched and not rule.is_quiet(now):
+                matched[rule.id] = rule
+        return list(matched.values())
+
+
+class SubscriptionRegistry:
+    """Кэш скомпилированного индекса подписок с обновлением по TTL"""
+
+    def __init__(self, ttl: float = SUBSCRIPTIONS_CACHE_TTL):
+        self.ttl = ttl
+        self._index = SubscriptionIndex([])
+        self._loaded_at: Optional[float] = None
+
+    def invalidate(self) -> None:
+        """Сбрасывает индекс, следующее обращение загрузит подписки заново"""
+        self._loaded_at = None
+
+    async def load(self, session: AsyncSession) -> SubscriptionIndex:
+        """Загружает активные подписки и компилирует индекс"""
+        query = select(Subscription).where(Subscription.is_active == True)
+        result = await session.execute(query)
+        self._index = SubscriptionIndex(
+            SubscriptionRule.from_model(subscription) for subscription in result.scalars().all()
+        )
+        self._loaded_at = time.monotonic()
+        return self._index
+
+    async def get_index(self, session: AsyncSession) -> SubscriptionIndex:
+        """Возвращает индекс подписок, при необходимости обновляя его"""
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            return await self.load(session)
+        return self._index
+
+
+subscription_registry = SubscriptionRegistry()
@@ -0,0 +1,254 @@
+import asyncio
+import itertools
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Optional, Union
+from aiogram import Bot
+from aiogram.types import BufferedInputFile
+from aiogram.exceptions import (
+    TelegramRetryAfter,
+    TelegramNetworkError,
+    TelegramServerError
+)
+from app.config import (
+    TELEGRAM_GLOBAL_RATE,
+    TELEGRAM_GROUP_RATE_PER_MINUTE,
+    TELEGRAM_PRIVATE_RATE,
+    TELEGRAM_SEND_CONCURRENCY,
+    TELEGRAM_SEND_MAX_ATTEMPTS
+)
+from app.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты сообщений (меньше - важнее)
+PRIORITY_ALERT = 0
+PRIORITY_DIGEST = 5
+PRIORITY_LOW = 10
+
+QUEUE_DEPTH = REGISTRY.gauge('telegram_send_queue_depth', 'Сообщения в очереди на отправку')
+MESSAGES_SENT = REGISTRY.counter('telegram_messages_sent_total', 'Отправленные сообщения')
+MESSAGES_RETRIED = REGISTRY.counter('telegram_send_retries_total', 'Повторные попытки отправки')
+MESSAGES_DROPPED = REGISTRY.counter('telegram_messages_dropped_total', 'Сообщения, которые не удалось отправить')
+SEND_SECONDS = REGISTRY.histogram('telegram_send_seconds', 'Длительность запросов отправки в Telegram')
+
+ChatId = Union[int, str]
+
+
+class TokenBucket:
+    """Ограничитель частоты по алгоритму token bucket"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def delay(self) -> float:
+        """Через сколько секунд будет доступен токен (0 - доступен сейчас)"""
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self) -> None:
+        self._refill(time.monotonic())
+        self.tokens -= 1
+
+    def block(self, seconds: float) -> None:
+        """Запрещает отправку на указанное время (ответ retry_after от Telegram)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0
+
+
+@dataclass(order=True)
+class QueuedMessage:
+    priority: int
+    sequence: int
+    chat_id: ChatId = field(compare=False)
+    call: Callable[[], Awaitable[Any]] = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    attempts: int = field(default=0, compare=False)
+
+
+class TelegramSendQueue:
+    """
+    Очередь исходящих сообщений Telegram с учетом лимитов
+
+    Общий bucket ограничивает частоту отправки всем ботом (~30 сообщений в секунду),
+    отдельные bucket - частоту в каждый чат (~20 в минуту для групп). Ответ
+    retry_after приостанавливает отправку в чат, и сообщение ставится в очередь
+    повторно, поэтому всплеск уведомлений уходит так быстро, как позволяет
+    Telegram, а не теряется.
+    """
+
+    def __init__(
+            self,
+            bot: Bot,
+            global_rate: float = TELEGRAM_GLOBAL_RATE,
+            group_rate_per_minute: float = TELEGRAM_GROUP_RATE_PER_MINUTE,
+            private_rate: float = TELEGRAM_PRIVATE_RATE,
+            concurrency: int = TELEGRAM_SEND_CONCURRENCY,
+            max_attempts: int = TELEGRAM_SEND_MAX_ATTEMPTS
+    ):
+        self.bot = bot
+        self.group_rate = group_rate_per_minute / 60
+        self.private_rate = private_rate
+        self.max_attempts = max_attempts
+
+        self._global_bucket = TokenBucket(global_rate, global_rate)
+        self._chat_buckets: Dict[str, TokenBucket] = {}
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._sequence = itertools.count()
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._delayed = 0
+        self._task: Optional[asyncio.Task] = None
+        self._send_tasks: set = set()
+
+        QUEUE_DEPTH.set_function(self.depth)
+
+    def depth(self) -> int:
+        """Количество сообщений, ожидающих отправки"""
+        return self._queue.qsize() + self._delayed
+
+    def _chat_bucket(self, chat_id: ChatId) -> TokenBucket:
+        key = str(chat_id)
+        bucket = self._chat_buckets.get(key)
+        if bucket is None:
+            # ID групп и каналов отрицательные
+            if key.startswith('-'):
+                bucket = TokenBucket(self.group_rate, 1)
+            else:
+                bucket = TokenBucket(self.private_rate, 1)
+            self._chat_buckets[key] = bucket
+        return bucket
+
+    def enqueue(
+            self,
+            chat_id: ChatId,
+            call: Callable[[], Awaitable[Any]],
+            priority: int = PRIORITY_ALERT
+    ) -> asyncio.Future:
+        """Ставит вызов API в очередь, future завершится результатом отправки"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(QueuedMessage(priority, next(self._sequence), chat_id, call, future))
+        return future
+
+    async def send_message(self, chat_id: ChatId, text: str, priority: int = PRIORITY_ALERT, **kwargs) -> bool:
+        """Отправляет сообщение через очередь, возвращает успешность отправки"""
+        future = self.enqueue(
+            chat_id,
+            lambda: self.bot.send_message(chat_id=chat_id, text=text, **kwargs),
+            priority
+        )
+        return await future
+
+    async def send_photo(
+            self,
+            chat_id: ChatId,
+            photo: bytes,
+            caption: Optional[str] = None,
+            priority: int = PRIORITY_ALERT,
+            **kwargs
+    ) -> bool:
+        """Отправляет PNG-изображение через очередь, возвращает успешность отправки"""
+        future = self.enqueue(
+            chat_id,
+            lambda: self.bot.send_photo(
+                chat_id=chat_id,
+                photo=BufferedInputFile(photo, filename='chart.png'),
+                caption=caption,
+                **kwargs
+            ),
+            priority
+        )
+        return await future
+
+    async def stop(self) -> None:
+        """Останавливает обработку очереди"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _requeue_later(self, item: QueuedMessage, delay: float) -> None:
+        self._delayed += 1
+
+        def put():
+            self._delayed -= 1
+            self._queue.put_nowait(item)
+
+        asyncio.get_running_loop().call_later(delay, put)
+
+    async def _run(self) -> None:
+        while True:
+            item: QueuedMessage = await self._queue.get()
+
+            # Чат временно недоступен - откладываем, не блокируя остальные чаты
+            chat_bucket = self._chat_bucket(item.chat_id)
+            chat_delay = chat_bucket.delay()
+            if chat_delay > 0:
+                self._requeue_later(item, chat_delay)
+                continue
+
+            global_delay = self._global_bucket.delay()
+            while global_delay > 0:
+                await asyncio.sleep(global_delay)
+                global_delay = self._global_bucket.delay()
+
+            self._global_bucket.consume()
+            chat_bucket.consume()
+
+            await self._semaphore.acquire()
+            task = asyncio.create_task(self._send(item, chat_bucket))
+            self._send_tasks.add(task)
+            task.add_done_callback(self._send_tasks.discard)
+
+    async def _send(self, item: QueuedMessage, chat_bucket: TokenBucket) -> None:
+        try:
+            item.attempts += 1
+            started = time.perf_counter()
+            try:
+                await item.call()
+            finally:
+                SEND_SECONDS.observe(time.perf_counter() - started)
+            MESSAGES_SENT.inc()
+            if not item.future.done():
+                item.future.set_result(True)
+        except TelegramRetryAfter as e:
+            # Telegram просит подождать - приостанавливаем чат и повторяем
+            MESSAGES_RETRIED.inc(reason='retry_after')
+            logger.warning(f"Превышен лимит отправки в чат {item.chat_id}, повтор через {e.retry_after} с")
+            chat_bucket.block(e.retry_after)
+            self._requeue_later(item, e.retry_after)
+        except (TelegramNetworkError, TelegramServerError) as e:
+            if item.attempts < self.max_attempts:
+                MESSAGES_RETRIED.inc(reason='network')
+                self._requeue_later(item, min(2 ** item.attempts, 60))
+            else:
+                self._fail(item, 'network', e)
+        except Exception as e:
+            self._fail(item, 'error', e)
+        finally:
+            self._semaphore.release()
+
+    def _fail(self, item: QueuedMessage, reason: str, error: Exception) -> None:
+        MESSAGES_DROPPED.inc(reason=reason)
+        logger.error(f"Не удалось отправить сообщение в чат {item.chat_id} после {item.attempts} попыток: {str(error)}")
+        if not item.future.done():
+            item.future.set_result(False)
@@ -0,0 +1,189 @@
+import time
+import uuid
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from sqlalchemy import delete, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.config import FSM_STATE_TTL, FSM_CACHE_TTL, FSM_CHANNEL
+from app.database.dialect import upsert
+from app.database.models import FsmState
+from app.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+FSM_CACHE_HITS = REGISTRY.counter('fsm_cache_hits_total', 'Чтения состояний FSM из локального кэша')
+FSM_CACHE_MISSES = REGISTRY.counter('fsm_cache_misses_total', 'Чтения состояний FSM из БД')
+
+# Не больше стольких диалогов в локальном кэше
+FSM_CACHE_SIZE = 10000
+
+# Интервал удаления заброшенных диалогов из БД (в секундах)
+FSM_CLEANUP_INTERVAL = 3600
+
+
+def storage_key_to_str(key: StorageKey) -> str:
+    """Строковый ключ записи в таблице fsm_states"""
+    return ':'.join(str(part) if part is not None else '' for part in (
+        key.bot_id, key.chat_id, key.user_id, key.thread_id, key.business_connection_id, key.destiny
+    ))
+
+
+def parse_fsm_payload(payload: str) -> List[Tuple[str, str]]:
+    """Разбирает payload NOTIFY: (экземпляр хранилища, ключ)"""
+    origin, _, key = payload.partition(' ')
+    if not key:
+        raise ValueError(payload)
+    return [(origin, key)]
+
+
+class SQLAlchemyStorage(BaseStorage):
+    """
+    Хранилище FSM aiogram в таблице fsm_states с локальным кэшем
+
+    Запись идет сразу в кэш и в БД (write-through), чтение - из кэша, а при
+    промахе или по истечении cache_ttl - из БД. Другие реплики узнают об
+    изменении диалога через NOTIFY и сбрасывают свою копию, поэтому
+    следующее обновление пользователя на любой реплике видит актуальное
+    состояние. Диалоги без изменений дольше state_ttl считаются пустыми и
+    удаляются периодической очисткой.
+    """
+
+    def __init__(
+            self,
+            session_factory: async_sessionmaker,
+            state_ttl: float = FSM_STATE_TTL,
+            cache_ttl: float = FSM_CACHE_TTL,
+            channel: str = FSM_CHANNEL
+    ):
+        self.session_factory = session_factory
+        self.state_ttl = state_ttl
+        self.cache_ttl = cache_ttl
+        self.channel = channel
+        self.instance_id = uuid.uuid4().hex
+
+        # ключ -> (состояние, данные, время изменения, время загрузки в кэш)
+        self._cache: 'OrderedDict[str, Tuple[Optional[str], Dict[str, Any], datetime, float]]' = OrderedDict()
+        self._cleanup_task: Optional[asyncio.Task] = None
+
+    async def _load(self, key: str) -> Tuple[Optional[str], Dict[str, Any]]:
+        cached = self._cache.get(key)
+        now = time.monotonic()
+        if cached is not None and now - cached[3] < self.cache_ttl:
+            state, data, updated_at, _ = cached
+            if updated_at >= datetime.now(timezone.utc) - timedelta(seconds=self.state_ttl):
+                FSM_CACHE_HITS.inc()
+                self._cache.move_to_end(key)
+                return state, data
+            return None, {}
+
+        FSM_CACHE_MISSES.inc()
+        async with self.session_factory() as session:
+            row = await session.get(FsmState, key)
+
+        if row is None:
+            state, data, updated_at = None, {}, datetime.now(timezone.utc)
+        else:
+            state, data, updated_at = row.state, dict(row.data or {}), row.updated_at
+            if updated_at.tzinfo is None:
+                updated_at = updated_at.replace(tzinfo=timezone.utc)
+            if updated_at < datetime.now(timezone.utc) - timedelta(seconds=self.state_ttl):
+                # Заброшенный диалог начинается заново
+                state, data = None, {}
+        self._remember(key, state, data, updated_at)
+        return state, data
+
+    def _remember(self, key: str, state: Optional[str], data: Dict[str, Any], updated_at: datetime) -> None:
+        self._cache[key] = (state, data, updated_at, time.monotonic())
+        self._cache.move_to_end(key)
+        while len(self._cache) > FSM_CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    async def _save(self, key: str, state: Optional[str], data: Dict[str, Any]) -> None:
+        updated_at = datetime.now(timezone.utc)
+        async with self.session_factory() as session:
+            if state is None and not data:
+                # Пустой диалог не храним
+                await session.execute(delete(FsmState).where(FsmState.key == key))
+            else:
+                statement = upsert(session, FsmState).values(
+                    key=key, state=state, data=data, updated_at=updated_at
+                )
+                statement = statement.on_conflict_do_update(
+                    index_elements=['key'],
+                    set_={
+                        'state': statement.excluded.state,
+                        'data': statement.excluded.data,
+                        'updated_at': statement.excluded.updated_at
+                    }
+                )
+                await session.execute(statement)
+            await self._publish(session, key)
+            await session.commit()
+        self._remember(key, state, data, updated_at)
+
+    async def _publish(self, session: AsyncSession, key: str) -> None:
+        """Сообщает другим репликам об изменении диалога (доставляется после commit)"""
+        if session.get_bind().dialect.name != 'postgresql':
+            return
+        await session.execute(
+            text('SELECT pg_notify(:channel, :payload)'),
+            {'channel': self.channel, 'payload': f'{self.instance_id} {key}'}
+        )
+
+    async def on_notify(self, changes: List[Tuple[str, str]]) -> None:
+        """Обработчик NOTIFY: сбрасывает копии диалогов, измененных другими репликами"""
+        for origin, key in changes:
+            if origin != self.instance_id:
+                self._cache.pop(key, None)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        storage_key = storage_key_to_str(key)
+        _, data = await self._load(storage_key)
+        await self._save(storage_key, state.state if isinstance(state, State) else state, data)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._load(storage_key_to_str(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        storage_key = storage_key_to_str(key)
+        state, _ = await self._load(storage_key)
+        await self._save(storage_key, state, dict(data))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._load(storage_key_to_str(key))
+        return data.copy()
+
+    async def cleanup(self) -> int:
+        """Удаляет заброшенные диалоги, возвращает количество удаленных"""
+        expired_before = datetime.now(timezone.utc) - timedelta(seconds=self.state_ttl)
+        async with self.session_factory() as session:
+            result = await session.execute(delete(FsmState).where(FsmState.updated_at < expired_before))
+            await session.commit()
+        return result.rowcount or 0
+
+    async def _cleanup_loop(self) -> None:
+        while True:
+            try:
+                removed = await self.cleanup()
+                if removed:
+                    logger.info(f"Удалено заброшенных диалогов FSM: {removed}")
+            except Exception as e:
+                logger.error(f"Ошибка при очистке диалогов FSM: {str(e)}")
+            await asyncio.sleep(FSM_CLEANUP_INTERVAL)
+
+    def start_cleanup(self) -> None:
+        """Запускает периодическую очистку заброшенных диалогов"""
+        if self._cleanup_task is None:
+            self._cleanup_task = asyncio.create_task(self._cleanup_loop())
+
+    async def close(self) -> None:
+        if self._cleanup_task is not None:
+            self._cleanup_task.cancel()
+            self._cleanup_task = None
+        self._cache.clear()
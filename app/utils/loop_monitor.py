@@ -0,0 +1,59 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+from app.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG_SECONDS = REGISTRY.histogram(
+    'event_loop_lag_seconds',
+    'Задержка пробуждения задачи в цикле событий',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+LOOP_LAG_MAX = REGISTRY.gauge('event_loop_lag_max_seconds', 'Максимальная задержка цикла событий с прошлого сбора метрик')
+
+# Задержка, начиная с которой блокировка цикла событий попадает в лог
+LAG_WARNING_SECONDS = 0.5
+
+
+class LoopMonitor:
+    """
+    Замер задержки цикла событий
+
+    Задача засыпает на interval и измеряет, насколько позже она проснулась.
+    Задержка означает, что цикл был занят синхронным кодом и остальные
+    задачи (обработка обновлений, отправка, проверка) ждали.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self._max_lag = 0.0
+        LOOP_LAG_MAX.set_function(self._collect_max_lag)
+
+    def _collect_max_lag(self) -> float:
+        lag, self._max_lag = self._max_lag, 0.0
+        return lag
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            LOOP_LAG_SECONDS.observe(lag)
+            self._max_lag = max(self._max_lag, lag)
+            if lag >= LAG_WARNING_SECONDS:
+                logger.warning(f"Цикл событий был заблокирован на {lag * 1000:.0f} мс")
+
+
+loop_monitor = LoopMonitor()
@@ -0,0 +1,171 @@
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+LabelsKey = Tuple[Tuple[str, str], ...]
+
+
+def _labels_key(labels: Dict[str, object]) -> LabelsKey:
+    if not labels:
+        # Быстрый путь для метрик без меток (большинство вызовов)
+        return ()
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key: LabelsKey) -> str:
+    if not key:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(name, value.replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in key
+    )
+    return '{' + pairs + '}'
+
+
+class Metric:
+    """Базовый класс метрики в формате Prometheus"""
+    metric_type = 'untyped'
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[LabelsKey, float] = {}
+
+    def get(self, **labels) -> float:
+        return self._values.get(_labels_key(labels), 0.0)
+
+    def samples(self) -> List[Tuple[str, LabelsKey, float]]:
+        if not self._values:
+            return [(self.name, (), 0.0)]
+        return [(self.name, key, value) for key, value in self._values.items()]
+
+    def render(self) -> List[str]:
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.metric_type}'
+        ]
+        for name, key, value in self.samples():
+            lines.append(f'{name}{_format_labels(key)} {value}')
+        return lines
+
+
+class Counter(Metric):
+    """Монотонно возрастающий счетчик"""
+    metric_type = 'counter'
+
+    def inc(self, value: float = 1.0, **labels) -> None:
+        key = _labels_key(labels)
+        self._values[key] = self._values.get(key, 0.0) + value
+
+
+class Gauge(Metric):
+    """Текущее значение, которое может расти и уменьшаться"""
+    metric_type = 'gauge'
+
+    def __init__(self, name: str, documentation: str):
+        super().__init__(name, documentation)
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, **labels) -> None:
+        self._values[_labels_key(labels)] = value
+
+    def inc(self, value: float = 1.0, **labels) -> None:
+        key = _labels_key(labels)
+        self._values[key] = self._values.get(key, 0.0) + value
+
+    def dec(self, value: float = 1.0, **labels) -> None:
+        self.inc(-value, **labels)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Значение вычисляется в момент сбора метрик"""
+        self._function = function
+
+    def samples(self) -> List[Tuple[str, LabelsKey, float]]:
+        if self._function is not None:
+            return [(self.name, (), float(self._function()))]
+        return super().samples()
+
+
+# Границы корзин по умолчанию (в секундах): от миллисекунды до минуты
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram(Metric):
+    """
+    Распределение значений по корзинам (например, длительности запросов)
+
+    Наблюдение - поиск корзины и увеличение одного счетчика, накопленные
+    значения корзин считаются только при сборе метрик.
+    """
+    metric_type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets))
+        # Метки -> (количество в каждой корзине и сверх последней, сумма)
+        self._observations: Dict[LabelsKey, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _labels_key(labels)
+        observations = self._observations.get(key)
+        if observations is None:
+            observations = self._observations[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = observations
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def get_count(self, **labels) -> int:
+        observations = self._observations.get(_labels_key(labels))
+        return sum(observations[0]) if observations else 0
+
+    def get_sum(self, **labels) -> float:
+        observations = self._observations.get(_labels_key(labels))
+        return observations[1][0] if observations else 0.0
+
+    def samples(self) -> List[Tuple[str, LabelsKey, float]]:
+        samples = []
+        for key, (counts, total) in self._observations.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append((f'{self.name}_bucket', key + (('le', repr(float(bound))),), cumulative))
+            cumulative += counts[-1]
+            samples.append((f'{self.name}_bucket', key + (('le', '+Inf'),), cumulative))
+            samples.append((f'{self.name}_sum', key, total[0]))
+            samples.append((f'{self.name}_count', key, cumulative))
+        return samples
+
+
+class MetricsRegistry:
+    """Реестр метрик приложения"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric_class, name: str, documentation: str, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            metric = metric_class(name, documentation, **kwargs)
+            self._metrics[name] = metric
+        elif type(metric) is not metric_class:
+            raise ValueError(f'Метрика {name} уже зарегистрирована как {type(metric).__name__}')
+        return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(Counter, name, documentation)
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._register(Gauge, name, documentation)
+
+    def histogram(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, buckets=buckets)
+
+    def render(self) -> str:
+        """Возвращает все метрики в текстовом формате Prometheus"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Общий реестр метрик процесса
+REGISTRY = MetricsRegistry()
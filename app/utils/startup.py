@@ -0,0 +1,71 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Dict, Optional, TypeVar
+from app.utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Момент запуска процесса (модуль импортируется первым в run.py)
+PROCESS_STARTED_AT = time.perf_counter()
+
+STARTUP_PHASE_SECONDS = REGISTRY.gauge('startup_phase_seconds', 'Длительность фаз запуска')
+STARTUP_READY_SECONDS = REGISTRY.gauge('startup_ready_seconds', 'Время от запуска процесса до готовности')
+TIME_TO_FIRST_CHECK_SECONDS = REGISTRY.gauge(
+    'startup_time_to_first_check_seconds',
+    'Время от запуска процесса до завершения первой проверки дивергенций'
+)
+
+
+class StartupTracker:
+    """Замеряет фазы запуска и сигнализирует о готовности приложения"""
+
+    def __init__(self, started_at: float = PROCESS_STARTED_AT):
+        self.started_at = started_at
+        self.phases: Dict[str, float] = {}
+        self.ready = asyncio.Event()
+        self.time_to_ready: Optional[float] = None
+        self.time_to_first_check: Optional[float] = None
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    @contextmanager
+    def phase(self, name: str):
+        """Замеряет длительность фазы запуска"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started
+            self.phases[name] = duration
+            STARTUP_PHASE_SECONDS.set(duration, phase=name)
+            logger.info(f"Фаза запуска '{name}' заняла {duration * 1000:.0f} мс")
+
+    async def run_phase(self, name: str, awaitable: Awaitable[T]) -> T:
+        """Выполняет корутину как фазу запуска (удобно для asyncio.gather)"""
+        with self.phase(name):
+            return await awaitable
+
+    def mark_ready(self) -> None:
+        """Отмечает, что кэши прогреты и приложение готово к работе"""
+        if self.ready.is_set():
+            return
+        self.time_to_ready = self.elapsed()
+        STARTUP_READY_SECONDS.set(self.time_to_ready)
+        self.ready.set()
+        logger.info(f"Приложение готово через {self.time_to_ready:.2f} с после запуска")
+
+    def mark_first_check(self) -> None:
+        """Фиксирует время до завершения первой проверки дивергенций"""
+        if self.time_to_first_check is not None:
+            return
+        self.time_to_first_check = self.elapsed()
+        TIME_TO_FIRST_CHECK_SECONDS.set(self.time_to_first_check)
+        logger.info(f"Первая проверка завершена через {self.time_to_first_check:.2f} с после запуска")
+
+
+startup = StartupTracker()
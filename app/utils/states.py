@@ -5,6 +5,10 @@ class AdminStates(StatesGroup):
     # Добавление валютной пары
     add_pair_symbol = State()
     add_pair_threshold = State()
+    bulk_import_pairs = State()
+
+    # Поиск валютной пары
+    search_pairs = State()
 
     # Редактирование валютной пары
     edit_threshold = State()
@@ -12,4 +16,6 @@ class AdminStates(StatesGroup):
     # Настройки бота
     set_group_id = State()
     set_check_interval = State()
-    set_default_threshold = State()
\ No newline at end of file
+    set_default_threshold = State()
+    set_digest_window = State()
+    set_chart_window = State()
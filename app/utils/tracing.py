@@ -0,0 +1,212 @@
+import os
+import json
+import time
+import random
+import asyncio
+import logging
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+from app.config import TRACE_FILE, TRACE_SAMPLE_RATE, TRACE_MAX_SPANS
+
+logger = logging.getLogger(__name__)
+
+# Текущий span задачи (задачи, созданные внутри span, наследуют его как родителя)
+_current_span: ContextVar[Optional['Span']] = ContextVar('current_span', default=None)
+
+
+class Span:
+    """
+    Отрезок работы внутри трассы: имя, время начала и окончания, атрибуты
+
+    Используется как контекстный менеджер (вложенные span становятся
+    дочерними) или через start()/end(), когда начало и конец находятся в
+    разных обработчиках (например, события SQLAlchemy).
+    """
+
+    __slots__ = ('trace', 'name', 'span_id', 'parent_id', 'attributes', 'start_ns', 'end_ns', 'status', '_token')
+
+    def __init__(self, trace: Optional['Trace'], name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = f'{random.getrandbits(64):016x}'
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start_ns = 0
+        self.end_ns = 0
+        self.status = 'ok'
+        self._token = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def start(self) -> 'Span':
+        self.start_ns = time.time_ns()
+        return self
+
+    def record_error(self, error: BaseException) -> None:
+        self.status = 'error'
+        self.attributes['error'] = type(error).__name__
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.record_error(error)
+        self.trace.finish(self)
+
+    def __enter__(self) -> 'Span':
+        self.start()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        _current_span.reset(self._token)
+        self.end(exc)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Запись span в JSONL (имена полей как в OTLP JSON)"""
+        return {
+            'traceId': self.trace.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent_id,
+            'name': self.name,
+            'startTimeUnixNano': self.start_ns,
+            'endTimeUnixNano': self.end_ns,
+            'durationMs': round((self.end_ns - self.start_ns) / 1e6, 3),
+            'status': self.status,
+            'attributes': self.attributes
+        }
+
+
+class _NoopSpan:
+    """Span вне выбранной трассы: ничего не записывает"""
+
+    def set(self, **attributes) -> None:
+        pass
+
+    def record_error(self, error: BaseException) -> None:
+        pass
+
+    def start(self) -> '_NoopSpan':
+        return self
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        pass
+
+    def __enter__(self) -> '_NoopSpan':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """
+    Завершенные span одной трассы; записываются в файл вместе с корневым
+
+    Span, не завершенные к концу корневого (например, задачи, созданные в
+    цикле и пережившие его), в файл не попадают: их количество записывается
+    в атрибут late_spans корневого span.
+    """
+
+    def __init__(self, tracer: 'Tracer', max_spans: int):
+        self.tracer = tracer
+        self.trace_id = f'{random.getrandbits(128):032x}'
+        self.max_spans = max_spans
+        self.spans: List[Span] = []
+        self.started = 0
+        self.root: Optional[Span] = None
+        self.exported = False
+
+    def child(self, name: str, parent: Span, attributes: Dict[str, Any]):
+        if self.started >= self.max_spans:
+            # Ограничиваем размер трассы, отброшенные span считаются в корневом
+            self.root.attributes['dropped_spans'] = self.root.attributes.get('dropped_spans', 0) + 1
+            return NOOP_SPAN
+        self.started += 1
+        return Span(self, name, parent.span_id, attributes)
+
+    def finish(self, span: Span) -> None:
+        if self.exported:
+            # Трасса уже записана, span учтен в late_spans корневого
+            return
+        if span is self.root:
+            late = self.started - len(self.spans)
+            if late:
+                span.attributes['late_spans'] = late
+            self.spans.append(span)
+            self.exported = True
+            self.tracer.export(self)
+            return
+        self.spans.append(span)
+
+
+class Tracer:
+    """
+    Трассировка отдельных циклов проверки
+
+    trace() начинает трассу (корневой span) с вероятностью sample_rate,
+    span() добавляет дочерний span только внутри выбранной трассы, иначе
+    возвращает пустой span без затрат на запись. Трасса пишется в файл
+    одной порцией строк JSONL после завершения корневого span, поэтому по
+    файлу можно восстановить дерево любого выбранного цикла. Запись
+    выполняется в потоке, чтобы не блокировать цикл событий.
+    """
+
+    def __init__(self, path: str = TRACE_FILE, sample_rate: float = TRACE_SAMPLE_RATE, max_spans: int = TRACE_MAX_SPANS):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_spans = max_spans
+        # Трассы из разных потоков записи не должны перемешиваться в файле
+        self._write_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path) and self.sample_rate > 0
+
+    def trace(self, name: str, **attributes):
+        """Корневой span новой трассы (или пустой, если трасса не выбрана)"""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return NOOP_SPAN
+        trace = Trace(self, self.max_spans)
+        trace.root = Span(trace, name, None, attributes)
+        return trace.root
+
+    def span(self, name: str, **attributes):
+        """Дочерний span текущего span (или пустой вне выбранной трассы)"""
+        parent = _current_span.get()
+        if parent is None:
+            return NOOP_SPAN
+        return parent.trace.child(name, parent, attributes)
+
+    def start_span(self, name: str, **attributes):
+        """Дочерний span, уже начатый; завершается вызовом end()"""
+        return self.span(name, **attributes).start()
+
+    def export(self, trace: Trace) -> None:
+        """Записывает трассу в потоке (или сразу, если цикл событий не запущен)"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(trace.spans)
+            return
+        loop.run_in_executor(None, self._write, trace.spans)
+
+    def _write(self, spans: List[Span]) -> None:
+        lines = [json.dumps(span.to_dict(), ensure_ascii=False, default=str) + '\n' for span in spans]
+        try:
+            with self._write_lock:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as file:
+                    file.writelines(lines)
+        except OSError as e:
+            logger.error(f"Не удалось записать трассу в {self.path}: {str(e)}")
+
+
+tracer = Tracer()
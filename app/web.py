@@ -0,0 +1,64 @@
+import logging
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+from aiohttp import web
+from app.config import WEBHOOK_PATH, WEBHOOK_SECRET, WEBAPP_HOST, WEBAPP_PORT
+from app.utils.metrics import REGISTRY
+
+if TYPE_CHECKING:
+    from aiogram import Bot, Dispatcher
+
+logger = logging.getLogger(__name__)
+
+
+def create_web_app(
+        dp: Optional['Dispatcher'] = None,
+        bot: Optional['Bot'] = None,
+        webhook: bool = False,
+        health_info: Optional[Callable[[], Dict]] = None
+) -> web.Application:
+    """
+    Создает aiohttp-приложение с маршрутами health и metrics
+
+    В режиме webhook дополнительно регистрирует обработчик обновлений Telegram
+    """
+    app = web.Application()
+
+    async def health(request: web.Request) -> web.Response:
+        payload = {'status': 'ok'}
+        if health_info is not None:
+            payload.update(health_info())
+        return web.json_response(payload)
+
+    async def metrics(request: web.Request) -> web.Response:
+        return web.Response(
+            text=REGISTRY.render(),
+            content_type='text/plain',
+            charset='utf-8'
+        )
+
+    app.router.add_get('/health', health)
+    app.router.add_get('/metrics', metrics)
+
+    if webhook:
+        from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+
+        # Обновления обрабатываются в фоне, ответ Telegram отдается сразу
+        SimpleRequestHandler(
+            dispatcher=dp,
+            bot=bot,
+            secret_token=WEBHOOK_SECRET or None,
+            handle_in_background=True
+        ).register(app, path=WEBHOOK_PATH)
+        setup_application(app, dp, bot=bot)
+
+    return app
+
+
+async def start_web_app(app: web.Application) -> web.AppRunner:
+    """Запускает HTTP-сервер, не блокируя цикл событий"""
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=WEBAPP_HOST, port=WEBAPP_PORT)
+    await site.start()
+    logger.info(f"HTTP-сервер запущен на {WEBAPP_HOST}:{WEBAPP_PORT}")
+    return runner
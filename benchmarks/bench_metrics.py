@@ -0,0 +1,91 @@
+"""
+Бенчмарк накладных расходов метрик
+
+Замеряет стоимость одной операции метрик (счетчик, гистограмма с метками,
+замер времени вокруг вызова) и время отдачи /metrics. Из стоимости
+операций оценивается доля инструментации в цикле детектора. Метрики
+пишутся на каждый SQL-запрос (счетчик и гистограмма) и запрос к Binance
+(счетчик и гистограмма с метками), а не на комбинацию пар: повторы всех
+комбинаций проверяются одним запросом, поэтому за цикл их несколько
+независимо от числа пар (см. check_queries).
+
+    python -m benchmarks.bench_metrics
+    python -m benchmarks.bench_metrics --max-ns 5000
+"""
+import argparse
+import json
+import sys
+import time
+from typing import Callable, Dict
+from app.utils.metrics import MetricsRegistry
+
+OPERATIONS = 200000
+
+
+def measure(operation: Callable[[], None], operations: int = OPERATIONS) -> float:
+    """Среднее время одной операции (в наносекундах)"""
+    started = time.perf_counter_ns()
+    for _ in range(operations):
+        operation()
+    return (time.perf_counter_ns() - started) / operations
+
+
+def run(queries: int, requests: int, cycle_seconds: float) -> Dict[str, float]:
+    registry = MetricsRegistry()
+    counter = registry.counter('bench_total', 'Счетчик')
+    histogram = registry.histogram('bench_seconds', 'Гистограмма')
+    gauge = registry.gauge('bench_gauge', 'Значение')
+
+    def timed_call():
+        started = time.perf_counter()
+        histogram.observe(time.perf_counter() - started, endpoint='/api/v3/ticker/price')
+
+    results = {
+        'noop_ns': measure(lambda: None),
+        'counter_inc_ns': measure(lambda: counter.inc()),
+        'counter_inc_labels_ns': measure(lambda: counter.inc(endpoint='/api/v3/ticker/price', status=200)),
+        'gauge_set_ns': measure(lambda: gauge.set(1.0)),
+        'histogram_observe_ns': measure(lambda: histogram.observe(0.042)),
+        'histogram_observe_labels_ns': measure(lambda: histogram.observe(0.042, endpoint='/api/v3/ticker/price')),
+        'timed_call_ns': measure(timed_call),
+    }
+
+    # Отдача /metrics с сотней наборов меток
+    for index in range(100):
+        histogram.observe(0.01, endpoint=f'/endpoint/{index}')
+    results['render_ms'] = measure(registry.render, 200) / 1e6
+
+    # Оценка: метрики SQL-запросов и запросов к Binance за цикл
+    per_query = results['counter_inc_ns'] + results['histogram_observe_ns']
+    per_request = results['counter_inc_labels_ns'] + results['timed_call_ns']
+    cycle_overhead = (queries * per_query + requests * per_request) / 1e9
+    results['cycle_overhead_ms'] = cycle_overhead * 1000
+    results['cycle_overhead_share'] = cycle_overhead / cycle_seconds
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--queries', type=int, default=4, help='SQL-запросов за цикл для оценки')
+    parser.add_argument('--requests', type=int, default=1, help='Запросов к Binance за цикл для оценки')
+    parser.add_argument('--cycle-seconds', type=float, default=1.0, help='Длительность цикла без метрик для оценки доли')
+    parser.add_argument('--max-ns', type=float, default=0, help='Код выхода 1, если операция дороже (нс)')
+    parser.add_argument('--output', help='Файл для сохранения результата в JSON')
+    args = parser.parse_args()
+
+    results = run(args.queries, args.requests, args.cycle_seconds)
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.max_ns:
+        slow = [name for name, value in results.items() if name.endswith('_ns') and value > args.max_ns]
+        if slow:
+            print(f"Дороже {args.max_ns:g} нс: {', '.join(slow)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
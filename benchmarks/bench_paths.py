@@ -0,0 +1,306 @@
+"""
+Бенчмарк горячих путей детектора, уведомлений и обработчиков
+
+Запускает код приложения на SQLite в памяти с фиктивным Binance API
+(цены без сети) и фиктивной сессией Telegram (ответы без сети) и замеряет:
+
+- check_all_pairs: первый цикл (дивергенции записываются) и повторный
+  (все найденные дивергенции - повторы за последний час);
+- record_divergence и _is_recent_duplicate: одна операция;
+- process_pending_notifications: одно уведомление в режимах single и digest;
+- обработку обновления диспетчером: /start и /history (FSM в БД).
+
+Сценарии перебираются по размерам набора пар и доле комбинаций с
+дивергенцией. Все значения - секунды на операцию (меньше - лучше), ключи
+вида check_all_pairs_first@100x0.1. Результат пишется в JSON, с --baseline
+сравнивается с сохраненным результатом.
+
+    python -m benchmarks.bench_paths --pairs 20,100 --rates 0.01,0.1 --output paths.json
+    python -m benchmarks.bench_paths --pairs 20,100 --rates 0.01,0.1 --baseline paths.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from benchmarks.bench_startup import DEFAULT_ENV
+
+# База в памяти и фиктивные настройки задаются до импорта конфига приложения
+os.environ['DATABASE_URL'] = 'sqlite+aiosqlite://'
+for name, value in {**DEFAULT_ENV, 'NOTIFICATION_GROUP_ID': '-100123'}.items():
+    os.environ.setdefault(name, value)
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.methods import SendMessage, SendPhoto, EditMessageText
+from aiogram.types import Chat, Message, Update, User
+from app.config import SUPERADMIN_IDS
+from app.database.base import Base
+from app.database.engine import async_session, create_schema, engine
+from app.database.models import BotSettings, CurrencyPair
+from app.services.divergence import DivergenceAnalyzer
+from app.services.notifications import NotificationService
+from app.services.settings_cache import settings_cache
+
+# Порог дивергенции всех пар (в процентах)
+THRESHOLD = 1.0
+
+
+class FakeBinanceAPI:
+    """
+    Цены без обращения к Binance
+
+    Цена пары с номером i - g^i, поэтому дивергенция комбинации зависит
+    только от расстояния между номерами пар. Множитель g подобран так, что
+    порог превышают ровно комбинации с расстоянием не меньше distance:
+    их доля среди всех комбинаций близка к заданной rate.
+    """
+
+    def __init__(self, symbols: List[str], rate: float):
+        count = len(symbols)
+        combinations = count * (count - 1) // 2
+        target = rate * combinations
+        distance = count
+        # Комбинаций с расстоянием не меньше d: (n - d) * (n - d + 1) / 2
+        while distance > 1 and (count - distance + 1) * (count - distance + 2) // 2 <= target:
+            distance -= 1
+        self.divergent = (count - distance) * (count - distance + 1) // 2
+        factor = (1 + THRESHOLD / 100) ** (-1 / (distance - 0.5))
+        self.prices = {symbol: factor ** index for index, symbol in enumerate(symbols)}
+
+    async def get_multiple_ticker_prices(self, symbols: List[str]) -> List[Dict]:
+        return [{'symbol': symbol, 'price': str(self.prices[symbol])} for symbol in symbols]
+
+
+class FakeTelegramSession(BaseSession):
+    """Сессия aiogram, отвечающая на методы Telegram без сети"""
+
+    def __init__(self):
+        super().__init__()
+        self.requests = 0
+
+    async def make_request(self, bot: Bot, method, timeout: Optional[int] = None) -> Any:
+        self.requests += 1
+        if isinstance(method, (SendMessage, SendPhoto, EditMessageText)):
+            return Message(
+                message_id=self.requests,
+                date=datetime.now(timezone.utc),
+                chat=Chat(id=int(method.chat_id or 1), type='private'),
+                text=getattr(method, 'text', None)
+            )
+        return True
+
+    async def stream_content(self, url: str, headers=None, timeout: int = 30, chunk_size: int = 65536, raise_for_status: bool = True):
+        yield b''
+
+    async def close(self) -> None:
+        pass
+
+
+def make_bot() -> Bot:
+    return Bot(token=DEFAULT_ENV['BOT_TOKEN'], session=FakeTelegramSession())
+
+
+async def reset_database(pairs: int) -> List[str]:
+    """Пересоздает схему и добавляет pairs активных пар"""
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.drop_all)
+    await create_schema()
+    settings_cache.invalidate()
+
+    symbols = [f'C{index:04d}USDT' for index in range(pairs)]
+    async with async_session() as session:
+        session.add_all(
+            CurrencyPair(symbol=symbol, base_asset=symbol[:-4], quote_asset='USDT', devergence_threshold=THRESHOLD)
+            for symbol in symbols
+        )
+        await session.commit()
+    return symbols
+
+
+async def bench_detector(pairs: int, rate: float, cycles: int) -> Dict[str, float]:
+    symbols = await reset_database(pairs)
+    binance = FakeBinanceAPI(symbols, rate)
+    results = {}
+
+    async with async_session() as session:
+        analyzer = DivergenceAnalyzer(session, binance)
+
+        started = time.perf_counter()
+        found = await analyzer.check_all_pairs()
+        results['check_all_pairs_first'] = time.perf_counter() - started
+        assert len(found) == binance.divergent, (len(found), binance.divergent)
+
+        timings = []
+        for _ in range(cycles):
+            started = time.perf_counter()
+            await analyzer.check_all_pairs()
+            timings.append(time.perf_counter() - started)
+        results['check_all_pairs_repeat'] = statistics.median(timings)
+
+        active = await analyzer.get_active_pairs()
+        prices = await analyzer.get_current_prices(active)
+        calls = min(len(active) - 1, 200)
+
+        started = time.perf_counter()
+        for index in range(calls):
+            await analyzer._is_recent_duplicate(active[index].id, active[-1].id)
+        results['is_recent_duplicate'] = (time.perf_counter() - started) / calls
+
+        started = time.perf_counter()
+        for index in range(calls):
+            await analyzer.record_divergence(active[index], active[index + 1], THRESHOLD, prices)
+        results['record_divergence'] = (time.perf_counter() - started) / calls
+
+    return results
+
+
+async def bench_notifications(pairs: int, rate: float, batch_size: int) -> Dict[str, float]:
+    results = {}
+    for mode in ('single', 'digest'):
+        symbols = await reset_database(pairs)
+        binance = FakeBinanceAPI(symbols, rate)
+        async with async_session() as session:
+            session.add(BotSettings(key='notification_mode', value=mode))
+            await session.commit()
+            found = await DivergenceAnalyzer(session, binance).check_all_pairs()
+        if not found:
+            continue
+
+        bot = make_bot()
+        sent = 0
+        started = time.perf_counter()
+        while True:
+            async with async_session() as session:
+                processed = await NotificationService(bot, session).process_pending_notifications(batch_size)
+            if not processed:
+                break
+            sent += processed
+        results[f'process_pending_notifications_{mode}'] = (time.perf_counter() - started) / sent
+    return results
+
+
+def make_message_update(update_id: int, text: str) -> Update:
+    user_id = SUPERADMIN_IDS[0]
+    return Update(
+        update_id=update_id,
+        message=Message(
+            message_id=update_id,
+            date=datetime.now(timezone.utc),
+            chat=Chat(id=user_id, type='private'),
+            from_user=User(id=user_id, is_bot=False, first_name='Bench'),
+            text=text
+        )
+    )
+
+
+async def bench_handlers(pairs: int, rate: float, updates: int) -> Dict[str, float]:
+    from app.bot import dp, setup_dispatcher
+
+    symbols = await reset_database(pairs)
+    async with async_session() as session:
+        await DivergenceAnalyzer(session, FakeBinanceAPI(symbols, rate)).check_all_pairs()
+
+    if not dp.sub_routers:
+        setup_dispatcher()
+    bot = make_bot()
+
+    results = {}
+    for name, text in (('handle_start', '/start'), ('handle_history', '/history min=1')):
+        started = time.perf_counter()
+        for update_id in range(updates):
+            await dp.feed_update(bot, make_message_update(update_id, text))
+        results[name] = (time.perf_counter() - started) / updates
+    return results
+
+
+async def run(pair_sizes: List[int], rates: List[float], cycles: int, batch_size: int, updates: int) -> Dict[str, float]:
+    # Прогрев: кэш скомпилированных запросов SQLAlchemy и импорт модулей
+    await bench_detector(min(pair_sizes), rates[0], 1)
+
+    results = {}
+    for pairs in pair_sizes:
+        for rate in rates:
+            scenario = {}
+            scenario.update(await bench_detector(pairs, rate, cycles))
+            scenario.update(await bench_notifications(pairs, rate, batch_size))
+            scenario.update(await bench_handlers(pairs, rate, updates))
+            for name, value in scenario.items():
+                results[f'{name}@{pairs}x{rate:g}'] = value
+    await engine.dispose()
+    return results
+
+
+def format_seconds(value: float) -> str:
+    if value >= 1:
+        return f'{value:.2f} с'
+    if value >= 1e-3:
+        return f'{value * 1e3:.2f} мс'
+    return f'{value * 1e6:.0f} мкс'
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> bool:
+    """Печатает сравнение с базовым результатом, возвращает False при регрессии"""
+    ok = True
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f'{name}: {format_seconds(value)} (нет в базовом результате)')
+            continue
+        change = (value - base) / base if base else 0.0
+        regression = change > tolerance
+        ok = ok and not regression
+        mark = 'РЕГРЕССИЯ' if regression else 'ok'
+        print(f'{name}: {format_seconds(value)} vs {format_seconds(base)} ({change:+.0%}) {mark}')
+    return ok
+
+
+def parse_list(value: str, cast) -> List:
+    return [cast(item) for item in value.split(',') if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pairs', default='20,100', help='Размеры набора активных пар через запятую')
+    parser.add_argument('--rates', default='0.01,0.1', help='Доли комбинаций с дивергенцией через запятую')
+    parser.add_argument('--cycles', type=int, default=3, help='Количество повторных циклов проверки')
+    parser.add_argument('--batch-size', type=int, default=100, help='Размер пачки outbox')
+    parser.add_argument('--updates', type=int, default=200, help='Количество обновлений для каждого обработчика')
+    parser.add_argument('--output', help='Файл для сохранения результата в JSON')
+    parser.add_argument('--baseline', help='JSON с базовым результатом для сравнения')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Допустимое замедление (доля)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    # Повторы и пропуски в отчете ожидаемы, их логирование искажает замер
+    logging.getLogger('app').setLevel(logging.ERROR)
+
+    results = asyncio.run(run(
+        parse_list(args.pairs, int),
+        parse_list(args.rates, float),
+        args.cycles,
+        args.batch_size,
+        args.updates
+    ))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if not compare(results, baseline, args.tolerance):
+            sys.exit(1)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Бенчмарк холодного запуска
+
+Замеряет в отдельных процессах время импорта модулей детектора и бота,
+время регистрации обработчиков диспетчера и время до первой проверки:
+от запуска процесса детектора (run.py --role detector) до завершения его
+первого цикла проверки дивергенций с фиктивным Binance и базой из настроек.
+Если база недоступна, последний замер пропускается. Результат пишется в
+JSON, с --baseline сравнивается с сохраненным результатом.
+
+    python -m benchmarks.bench_startup --output startup.json
+    python -m benchmarks.bench_startup --baseline startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, Optional
+
+# Фиктивные настройки, чтобы конфиг загружался без .env
+DEFAULT_ENV = {
+    'BOT_TOKEN': '123456:benchmark',
+    'SUPERADMIN_IDS': '1',
+    'DB_USER': 'bench',
+    'DB_PASS': 'bench',
+    'DB_HOST': 'localhost',
+    'DB_PORT': '5432',
+    'DB_NAME': 'bench',
+}
+
+SCENARIOS = {
+    'import_detector': 'import app.detector',
+    'import_bot': 'import app.bot',
+    'import_bot_and_setup_dispatcher': 'import app.bot as b; b.setup_dispatcher()',
+}
+
+MEASURE_TEMPLATE = (
+    'import time; started = time.perf_counter(); {code}; '
+    'print(time.perf_counter() - started)'
+)
+
+# Процесс детектора, завершающийся сразу после первой проверки дивергенций.
+# Binance подменяется: цены всех пар одинаковы, exchangeInfo пуст
+FIRST_CHECK_CODE = """
+import asyncio
+import os
+import sys
+sys.argv = ['run.py', '--role', 'detector']
+from app.utils.startup import startup
+from app.services.binance_api import BinanceAPI
+
+async def get_exchange_info(self, use_cache=True):
+    return {'symbols': []}
+
+async def get_multiple_ticker_prices(self, symbols):
+    return [{'symbol': symbol, 'price': '1'} for symbol in symbols]
+
+BinanceAPI.get_exchange_info = get_exchange_info
+BinanceAPI.get_multiple_ticker_prices = get_multiple_ticker_prices
+
+mark_first_check = startup.mark_first_check
+
+def first_check_done():
+    mark_first_check()
+    sys.stdout.flush()
+    os._exit(0)
+
+startup.mark_first_check = first_check_done
+exec(compile(open('run.py').read(), 'run.py', 'exec'), {'__name__': '__main__'})
+os._exit(1)
+"""
+
+# Ограничение ожидания первой проверки (в секундах)
+FIRST_CHECK_TIMEOUT = 60
+
+
+def measure(code: str, runs: int) -> float:
+    """Медиана времени выполнения кода в новом интерпретаторе (в секундах)"""
+    env = {**DEFAULT_ENV, **os.environ}
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    timings = []
+    for _ in range(runs):
+        output = subprocess.check_output(
+            [sys.executable, '-c', MEASURE_TEMPLATE.format(code=code)],
+            cwd=root,
+            env=env,
+            text=True
+        )
+        timings.append(float(output.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+
+def measure_first_check(runs: int) -> Optional[float]:
+    """
+    Медиана времени от запуска процесса детектора до завершения первой
+    проверки (в секундах) или None, если детектор не дошел до проверки
+    """
+    env = {**DEFAULT_ENV, **os.environ}
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        try:
+            result = subprocess.run(
+                [sys.executable, '-c', FIRST_CHECK_CODE],
+                cwd=root,
+                env=env,
+                capture_output=True,
+                text=True,
+                timeout=FIRST_CHECK_TIMEOUT
+            )
+        except subprocess.TimeoutExpired:
+            print(f'time_to_first_check: пропущено, проверка не завершилась за {FIRST_CHECK_TIMEOUT} с')
+            return None
+        if result.returncode != 0:
+            error = (result.stderr.strip().splitlines() or ['нет вывода'])[-1]
+            print(f'time_to_first_check: пропущено, детектор завершился с ошибкой ({error})')
+            return None
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> bool:
+    """Печатает сравнение с базовым результатом, возвращает False при регрессии"""
+    ok = True
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f'{name}: {value * 1000:.0f} мс (нет в базовом результате)')
+            continue
+        change = (value - base) / base if base else 0.0
+        regression = change > tolerance
+        ok = ok and not regression
+        mark = 'РЕГРЕССИЯ' if regression else 'ok'
+        print(f'{name}: {value * 1000:.0f} мс vs {base * 1000:.0f} мс ({change:+.0%}) {mark}')
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Количество запусков каждого сценария')
+    parser.add_argument('--output', help='Файл для сохранения результата в JSON')
+    parser.add_argument('--baseline', help='JSON с базовым результатом для сравнения')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Допустимое замедление (доля)')
+    args = parser.parse_args()
+
+    results = {name: measure(code, args.runs) for name, code in SCENARIOS.items()}
+    time_to_first_check = measure_first_check(args.runs)
+    if time_to_first_check is not None:
+        results['time_to_first_check'] = time_to_first_check
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if not compare(results, baseline, args.tolerance):
+            sys.exit(1)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
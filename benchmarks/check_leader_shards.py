@@ -0,0 +1,128 @@
+"""
+Проверка распределения шардов детектора между двумя репликами
+
+Запускает два LeaderElector с общим ключом блокировок в базе PostgreSQL из
+настроек (DATABASE_URL или DB_*) и проверяет, что шарды делятся между
+репликами поровну, в том числе когда вторая реплика запускается позже
+первой (перезапуск, rolling deploy), и что после остановки одной реплики
+все шарды переходят к другой. Код выхода 1, если какой-то шаг не сошелся
+за отведенное время. Без PostgreSQL (не настроен, SQLite или сервер
+недоступен) проверка пропускается с кодом выхода 0.
+
+    python -m benchmarks.check_leader_shards
+    python -m benchmarks.check_leader_shards --shards 8
+"""
+import argparse
+import asyncio
+import os
+import sys
+from typing import Callable, List, Optional
+
+# Настройки бота не нужны для проверки, но без них конфиг не загружается
+os.environ.setdefault('BOT_TOKEN', '123456:check')
+os.environ.setdefault('SUPERADMIN_IDS', '1')
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.config import DATABASE_URL, DB_HOST, DETECTOR_LOCK_ID
+from app.services.leader import LeaderElector
+
+# Интервал продления аренды в проверке (в секундах)
+INTERVAL = 0.1
+
+
+def get_database_url() -> Optional[str]:
+    """URL PostgreSQL для проверки или None, если PostgreSQL не настроен"""
+    if not os.getenv('DATABASE_URL') and not DB_HOST:
+        return None
+    if make_url(DATABASE_URL).get_backend_name() != 'postgresql':
+        return None
+    return DATABASE_URL
+
+
+def is_balanced(electors: List[LeaderElector], shards_count: int) -> bool:
+    """Шарды разделены между репликами без пересечений и поровну (с точностью до одного)"""
+    held = [elector.shard_indexes for elector in electors]
+    sizes = [len(shards) for shards in held]
+    return (
+        sum(sizes) == shards_count
+        and frozenset().union(*held) == frozenset(range(shards_count))
+        and max(sizes) - min(sizes) <= 1
+    )
+
+
+async def wait_for(condition: Callable[[], bool], timeout: float) -> bool:
+    """Ожидает выполнения условия не дольше timeout секунд"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        if loop.time() > deadline:
+            return False
+        await asyncio.sleep(INTERVAL / 2)
+    return True
+
+
+async def main(shards_count: int, lock_id: int, timeout: float) -> bool:
+    url = get_database_url()
+    if url is None:
+        print('Пропущено: PostgreSQL не настроен (DATABASE_URL или DB_*)')
+        return True
+
+    engine = create_async_engine(url)
+    try:
+        try:
+            connection = await engine.connect()
+            await connection.close()
+        except (OSError, ConnectionError) as e:
+            print(f'Пропущено: PostgreSQL недоступен ({e})')
+            return True
+
+        def make_elector() -> LeaderElector:
+            return LeaderElector(engine, lock_id, shards_count, INTERVAL, INTERVAL)
+
+        first, second = make_elector(), make_elector()
+
+        async def restart_first() -> None:
+            await first.stop()
+            first.start()
+
+        # Шаги: (название, действие, ожидаемое состояние)
+        steps = [
+            ('первая реплика забирает все шарды', first.start, lambda: len(first.shard_indexes) == shards_count),
+            ('поздно запущенная вторая получает половину', second.start, lambda: is_balanced([first, second], shards_count)),
+            ('после остановки первой все шарды у второй', first.stop, lambda: len(second.shard_indexes) == shards_count),
+            ('перезапущенная первая получает половину', restart_first, lambda: is_balanced([first, second], shards_count)),
+        ]
+
+        ok = True
+        try:
+            for name, action, condition in steps:
+                if asyncio.iscoroutine(result := action()):
+                    await result
+                passed = await wait_for(condition, timeout)
+                ok = ok and passed
+                print(
+                    f"{name}: {'ok' if passed else 'НЕ СОШЛОСЬ'} "
+                    f"(шарды: {sorted(first.shard_indexes)} / {sorted(second.shard_indexes)})"
+                )
+                if not passed:
+                    break
+        finally:
+            await first.stop()
+            await second.stop()
+        return ok
+    finally:
+        await engine.dispose()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shards', type=int, default=4, help='Количество шардов')
+    parser.add_argument(
+        '--lock-id', type=int, default=DETECTOR_LOCK_ID + 100,
+        help='Ключ блокировок (отличается от рабочего, чтобы не мешать запущенному боту)'
+    )
+    parser.add_argument('--timeout', type=float, default=10.0, help='Время на каждый шаг (в секундах)')
+    args = parser.parse_args()
+    if not asyncio.run(main(args.shards, args.lock_id, args.timeout)):
+        sys.exit(1)
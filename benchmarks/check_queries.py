@@ -0,0 +1,111 @@
+"""
+Проверка количества SQL-запросов на горячих путях (поиск N+1)
+
+Запускает цикл детектора, обработку outbox и обработчики на SQLite в памяти
+с фиктивными Binance и Telegram (как bench_paths) и проверяет через
+assert_max_queries, что число запросов не растет с количеством пар и
+дивергенций. Код выхода 1, если какой-то путь превысил лимит.
+
+    python -m benchmarks.check_queries
+    python -m benchmarks.check_queries --pairs 200 --rate 0.2
+"""
+import argparse
+import asyncio
+import logging
+import math
+import sys
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+from benchmarks.bench_paths import FakeBinanceAPI, make_bot, make_message_update, reset_database
+from app.database.engine import async_session, engine
+from app.database.query_counter import assert_max_queries
+from app.services.divergence import DivergenceAnalyzer
+from app.services.notifications import NotificationService
+
+# Лимиты запросов по сценариям
+LIMITS = {
+    # активные пары, повторы за час, INSERT дивергенций, почасовая сводка
+    # (INSERT больше insertmanyvalues_page_size строк делится на страницы)
+    'check_all_pairs_first': 4,
+    # активные пары, повторы за час
+    'check_all_pairs_repeat': 2,
+    # настройки, захват пачки (SELECT и UPDATE), подписки, доставки прошлых
+    # попыток, отметки отправленных: первая доставка и все, завершившиеся,
+    # пока она записывалась
+    'process_pending_notifications': 7,
+    # состояние FSM
+    'handle_start': 1,
+    # страница истории, запись состояния FSM
+    'handle_history': 2,
+}
+
+
+def get_limits(divergences: int) -> Dict[str, int]:
+    """Лимиты с учетом страниц INSERT дивергенций первого цикла"""
+    page_size = engine.sync_engine.dialect.insertmanyvalues_page_size
+    limits = dict(LIMITS)
+    limits['check_all_pairs_first'] += max(1, math.ceil(divergences / page_size)) - 1
+    return limits
+
+
+async def run(pairs: int, rate: float) -> List[Tuple[str, int, int, bool]]:
+    from app.bot import dp, setup_dispatcher
+
+    symbols = await reset_database(pairs)
+    binance = FakeBinanceAPI(symbols, rate)
+    limits = get_limits(binance.divergent)
+    bot = make_bot()
+    if not dp.sub_routers:
+        setup_dispatcher()
+
+    async def check_all_pairs():
+        async with async_session() as session:
+            await DivergenceAnalyzer(session, binance).check_all_pairs()
+
+    async def process_pending_notifications():
+        async with async_session() as session:
+            await NotificationService(bot, session).process_pending_notifications()
+
+    def handle(text: str) -> Callable[[], Awaitable]:
+        return lambda: dp.feed_update(bot, make_message_update(1, text))
+
+    scenarios = [
+        ('check_all_pairs_first', check_all_pairs),
+        ('check_all_pairs_repeat', check_all_pairs),
+        ('process_pending_notifications', process_pending_notifications),
+        ('handle_start', handle('/start')),
+        ('handle_history', handle('/history min=1')),
+    ]
+
+    results = []
+    for name, scenario in scenarios:
+        try:
+            with assert_max_queries(limits[name], unit=name) as counter:
+                await scenario()
+            results.append((name, counter.statements, limits[name], True))
+        except AssertionError as e:
+            print(e)
+            results.append((name, counter.statements, limits[name], False))
+    await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pairs', type=int, default=100, help='Количество активных пар')
+    parser.add_argument('--rate', type=float, default=0.1, help='Доля комбинаций с дивергенцией')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger('app').setLevel(logging.ERROR)
+
+    results = asyncio.run(run(args.pairs, args.rate))
+    for name, statements, limit, ok in results:
+        print(f"{name}: {statements} запросов (лимит {limit}) {'ok' if ok else 'ПРЕВЫШЕН'}")
+
+    if not all(ok for _, _, _, ok in results):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+Проверка использования индексов горячими запросами
+
+Выполняет EXPLAIN для запросов детектора, outbox уведомлений, списка пар и
+выборок за период в базе из настроек (DATABASE_URL или DB_*) и проверяет, что
+в плане есть ожидаемый индекс (для секционированной таблицы divergences -
+его копия в любой из секций). Последовательное сканирование отключается,
+иначе на маленькой таблице планировщик всегда выбирает его. Код выхода 1,
+если какой-то запрос не использует свой индекс. Без PostgreSQL (не настроен,
+SQLite или сервер недоступен) проверка пропускается с кодом выхода 0, поэтому
+ее можно запускать в любом окружении вместе с check_queries.
+
+    alembic upgrade head
+    python -m benchmarks.explain_indexes
+"""
+import asyncio
+import json
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterator, List, Optional, Set, Tuple
+
+from benchmarks.bench_startup import DEFAULT_ENV
+
+# Настройки бота не нужны для проверки, но без них конфиг не загружается;
+# параметры БД не подставляются, чтобы не подключаться к несуществующей базе
+for name in ('BOT_TOKEN', 'SUPERADMIN_IDS'):
+    os.environ.setdefault(name, DEFAULT_ENV[name])
+
+from sqlalchemy import Select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+from sqlalchemy.future import select
+from app.config import DATABASE_URL, DB_HOST
+from app.database.models import Divergence
+from app.services.divergence import active_pairs_query, recent_divergence_query, recent_divergences_query
+from app.services.history import HistoryFilters, history_page_query
+from app.services.notifications import pending_notifications_query
+from app.services.pairs import pairs_page_query
+
+
+def get_checks() -> List[Tuple[str, Select, str]]:
+    """Проверяемые запросы: (название, запрос, ожидаемый индекс)"""
+    hour_ago = datetime.now(timezone.utc) - timedelta(hours=1)
+    return [
+        ('recent_duplicate', recent_divergence_query(1, 2, hour_ago), 'ix_divergences_pair_detected'),
+        ('recent_duplicates', recent_divergences_query(range(1, 51), hour_ago), 'ix_divergences_pair_detected'),
+        ('pending_notifications', pending_notifications_query(100), 'ix_divergences_pending'),
+        ('active_pairs', active_pairs_query(), 'ix_currency_pairs_active'),
+        (
+            'history_older_page',
+            history_page_query(HistoryFilters(min_percent=3), after=(hour_ago, 1000)),
+            'ix_divergences_detected_at'
+        ),
+        ('pairs_next_page', pairs_page_query(after='BTCUSDT'), 'currency_pairs_symbol_key'),
+        ('pairs_prefix_search', pairs_page_query('BTC'), 'ix_currency_pairs_symbol_pattern'),
+        (
+            'divergences_by_period',
+            select(Divergence.id)
+            .where(Divergence.detected_at >= hour_ago)
+            .order_by(Divergence.detected_at, Divergence.id),
+            'ix_divergences_detected_at'
+        ),
+    ]
+
+
+def iter_index_names(plan: Any) -> Iterator[str]:
+    """Имена индексов во всех узлах плана"""
+    if isinstance(plan, dict):
+        if 'Index Name' in plan:
+            yield plan['Index Name']
+        for value in plan.values():
+            yield from iter_index_names(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from iter_index_names(item)
+
+
+async def explain(connection: AsyncConnection, query: Select) -> Any:
+    """Возвращает план запроса в JSON"""
+    # Списки IN раскрываются в отдельные параметры, как при обычном выполнении
+    compiled = query.compile(dialect=connection.dialect, compile_kwargs={'render_postcompile': True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    result = await connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {compiled.string}', params)
+    plan = result.scalar()
+    return json.loads(plan) if isinstance(plan, str) else plan
+
+
+async def partition_indexes(connection: AsyncConnection, index: str) -> Set[str]:
+    """Индекс и его копии в секциях (в плане секционированной таблицы - имена секций)"""
+    result = await connection.execute(
+        text(
+            'SELECT child.relname FROM pg_inherits '
+            'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE parent.relname = :index'
+        ),
+        {'index': index}
+    )
+    return {index, *result.scalars().all()}
+
+
+def get_database_url() -> Optional[str]:
+    """URL PostgreSQL для проверки или None, если PostgreSQL не настроен"""
+    if not os.getenv('DATABASE_URL') and not DB_HOST:
+        return None
+    if make_url(DATABASE_URL).get_backend_name() != 'postgresql':
+        return None
+    return DATABASE_URL
+
+
+async def main() -> bool:
+    url = get_database_url()
+    if url is None:
+        print('Пропущено: PostgreSQL не настроен (DATABASE_URL или DB_*)')
+        return True
+
+    engine = create_async_engine(url)
+    ok = True
+    try:
+        try:
+            connection = await engine.connect()
+        except (OSError, ConnectionError) as e:
+            print(f'Пропущено: PostgreSQL недоступен ({e})')
+            return True
+
+        try:
+            await connection.exec_driver_sql('SET enable_seqscan = off')
+            for name, query, index in get_checks():
+                indexes = set(iter_index_names(await explain(connection, query)))
+                used = bool(indexes & await partition_indexes(connection, index))
+                ok = ok and used
+                print(f"{name}: {'ok' if used else 'НЕ ИСПОЛЬЗУЕТ'} {index} (индексы в плане: {', '.join(sorted(indexes)) or 'нет'})")
+            await connection.rollback()
+        finally:
+            await connection.close()
+    finally:
+        await engine.dispose()
+    return ok
+
+
+if __name__ == '__main__':
+    if not asyncio.run(main()):
+        sys.exit(1)
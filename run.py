@@ -1,6 +1,9 @@
+import argparse
 import asyncio
 import logging
-from app.bot import main
+# Импортируется первым, чтобы зафиксировать момент запуска процесса
+from app.utils.startup import startup
+from app.config import APP_ROLE
 
 if __name__ == '__main__':
     logging.basicConfig(
@@ -8,7 +11,25 @@ if __name__ == '__main__':
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
 
+    parser = argparse.ArgumentParser(description='Бот для отслеживания дивергенций')
+    parser.add_argument(
+        '--role',
+        choices=['all', 'detector', 'bot'],
+        default=APP_ROLE,
+        help='Роль процесса: бот и детектор вместе, только детектор или только бот'
+    )
+    args = parser.parse_args()
+
+    # Детектору не нужен aiogram, поэтому модуль бота импортируем только при необходимости
+    with startup.phase('imports'):
+        if args.role == 'detector':
+            from app.detector import run_detector as entrypoint
+        else:
+            from app.bot import main
+
+            entrypoint = lambda: main(args.role)
+
     try:
-        asyncio.run(main())
+        asyncio.run(entrypoint())
     except (KeyboardInterrupt, SystemExit):
-        logging.info('Бот остановлен')
\ No newline at end of file
+        logging.info('Бот остановлен')